@@ -0,0 +1,124 @@
+import time
+
+import numpy as np
+import pandas as pd
+
+# --- Cubo de Agregados da Planilha ---
+#
+# Calculado uma vez por upload: para cada dimensão principal (e para cada dimensão
+# combinada com o mês previsto de fechamento), número de oportunidades, valor total
+# e ticket médio do VALOR_SUGERIDO e média dos dias previstos. As perguntas de
+# agregação do chat são respondidas por consulta a essas tabelas, sem o agente.
+
+# Dimensões (colunas já padronizadas) e como aparecem nas respostas, na ordem canônica
+DIMENSIONS = {
+    'ETAPA_ATUAL': 'etapa',
+    'ESN': 'ESN',
+    'GSN': 'GSN',
+    'PRODUTO_SUGERIDO': 'produto sugerido',
+    'PRODUTO_DA_OPORTUNIDADE': 'produto da oportunidade',
+    'ORIGEM': 'origem',
+    'TIPO_DE_ATUACAO': 'tipo de atuação',
+    'MES_PREVISTO': 'mês previsto de fechamento',
+}
+MONTH_DIMENSION = 'MES_PREVISTO'
+
+# Medidas de cada célula do cubo
+MEASURES = {
+    'OPORTUNIDADES': 'número de oportunidades',
+    'VALOR_TOTAL': 'valor total sugerido',
+    'TICKET_MEDIO': 'ticket médio (valor sugerido)',
+    'DIAS_PREVISTOS_MEDIO': 'média de dias previstos até o fechamento',
+}
+OPEN_ONLY_MEASURES = {'DIAS_PREVISTOS_MEDIO'}  # Só as oportunidades em aberto têm previsão
+
+# Escopos: todas as linhas da planilha ou só as oportunidades em aberto (DATA_DA_VENDA vazia)
+SCOPES = ('todas', 'abertas')
+
+def _aggregate(frame, dims):
+    """Uma tabela do cubo: medidas agregadas por `dims` (vazio = total geral)."""
+    if not dims:
+        return pd.DataFrame({
+            'OPORTUNIDADES': [len(frame)],
+            'VALOR_TOTAL': [frame['VALOR'].sum()],
+            'TICKET_MEDIO': [frame['VALOR'].mean()],
+            'DIAS_PREVISTOS_MEDIO': [frame['DIAS'].mean()],
+        })
+    grouped = frame.groupby(list(dims), observed=True, sort=True)
+    return pd.DataFrame({
+        'OPORTUNIDADES': grouped.size(),
+        'VALOR_TOTAL': grouped['VALOR'].sum(),
+        'TICKET_MEDIO': grouped['VALOR'].mean(),
+        'DIAS_PREVISTOS_MEDIO': grouped['DIAS'].mean(),
+    })
+
+class AnalyticsCube:
+    """Tabelas de agregados indexadas por (dimensões em ordem canônica, escopo)."""
+
+    def __init__(self, cuboids, labels, n_rows, n_open, seconds):
+        self.cuboids = cuboids
+        self.labels = labels          # {dimensão: [valores]}, para o roteador reconhecer filtros
+        self.n_rows = n_rows
+        self.n_open = n_open
+        self.seconds = seconds
+
+    @property
+    def dimensions(self):
+        return list(self.labels)
+
+    def query(self, measures, by=(), filters=None, scope='todas'):
+        """Consulta o cubo; retorna um DataFrame com as `measures` (índice = `by`) ou None se não houver a tabela.
+
+        `filters` ({dimensão: valor}) seleciona uma célula de cada dimensão filtrada.
+        Medidas de previsão e o mês previsto usam sempre o escopo 'abertas'.
+        """
+        filters = filters or {}
+        if MONTH_DIMENSION in by or MONTH_DIMENSION in filters or OPEN_ONLY_MEASURES & set(measures):
+            scope = 'abertas'
+        dims = tuple(dim for dim in DIMENSIONS if dim in set(by) | set(filters))
+        table = self.cuboids.get((dims, scope))
+        if table is None:
+            return None
+        for dim, value in filters.items():
+            level = table.index.get_level_values(dim) if isinstance(table.index, pd.MultiIndex) else table.index
+            table = table[level.astype(str) == str(value)]
+            if isinstance(table.index, pd.MultiIndex):
+                table = table.droplevel(dim)
+        if not by and filters:
+            # Filtro sem agrupamento: uma linha (ou nenhuma, se o valor não tiver oportunidades no escopo)
+            if table.empty:
+                table = _aggregate(pd.DataFrame({'VALOR': pd.Series(dtype=float), 'DIAS': pd.Series(dtype=float)}), ())
+            table = table.reset_index(drop=True)
+        return table[list(measures)]
+
+def build_cube(df, df_abertas=None):
+    """Monta o cubo a partir da planilha completa (colunas padronizadas) e das previsões.
+
+    `df_abertas` (saída de predict_and_project) fornece DIAS_PREVISTOS e
+    DATA_PROVAVEL_FECHAMENTO das oportunidades em aberto, alinhadas pelo índice.
+    """
+    start = time.perf_counter()
+    frame = pd.DataFrame(index=df.index)
+    for dim in DIMENSIONS:
+        if dim in df.columns:
+            frame[dim] = df[dim].astype('category')
+    frame['VALOR'] = pd.to_numeric(df['VALOR_SUGERIDO'], errors='coerce').astype('float64')
+    frame['DIAS'] = np.nan
+    if df_abertas is not None and 'DIAS_PREVISTOS' in df_abertas.columns and not df_abertas.empty:
+        frame['DIAS'] = df_abertas['DIAS_PREVISTOS'].reindex(df.index).astype('float64')
+        months = pd.to_datetime(df_abertas['DATA_PROVAVEL_FECHAMENTO']).dt.strftime('%Y-%m')
+        frame[MONTH_DIMENSION] = months.reindex(df.index).astype('category')
+    is_open = df['DATA_DA_VENDA'].isna().to_numpy() if 'DATA_DA_VENDA' in df.columns else np.ones(len(df), bool)
+
+    dims = [dim for dim in DIMENSIONS if dim in frame.columns]
+    plain = [dim for dim in dims if dim != MONTH_DIMENSION]
+    cuboids = {}
+    for scope, rows in (('todas', frame), ('abertas', frame[is_open])):
+        groupings = [()] + [(dim,) for dim in plain]
+        if MONTH_DIMENSION in dims and scope == 'abertas':
+            groupings += [(MONTH_DIMENSION,)] + [(dim, MONTH_DIMENSION) for dim in plain]
+        for grouping in groupings:
+            cuboids[(grouping, scope)] = _aggregate(rows, grouping)
+
+    labels = {dim: [str(value) for value in frame[dim].cat.categories] for dim in dims}
+    return AnalyticsCube(cuboids, labels, len(frame), int(is_open.sum()), time.perf_counter() - start)
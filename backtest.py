@@ -0,0 +1,340 @@
+import argparse
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+import pandas as pd
+
+from compiled_model import try_compile
+from data_io import read_table, write_table
+from instrumentation import timed
+from parallel_scoring import START_METHOD
+from projection import MONTHS, month_labels, monthly_totals
+from schema import apply_dtypes
+from scoring import FEATURES_PATH, default_model_path, load_model, predict_days
+
+# --- Backtest Histórico ---
+#
+# Reconstitui, em uma série de datas de corte, as oportunidades que estavam em aberto
+# naquela data (DATA_CICLO_DE_BUSCA até o corte e DATA_DA_VENDA depois dele ou vazia),
+# aplica a regra da aplicação (data provável = corte + dias previstos; projeção mensal
+# do VALOR_SUGERIDO em 12 meses) e compara com o que aconteceu de fato: o mês em que
+# cada uma foi vendida e a receita vendida em cada mês.
+#
+# A planilha só tem os valores atuais das features, então os dias previstos de uma
+# oportunidade são os mesmos em todos os cortes: o modelo roda uma única vez sobre o
+# histórico inteiro, e cada corte é só filtragem e somas sobre arrays numpy.
+#
+# Com o modelo entregue, o backtest é DENTRO DA AMOSTRA: o modelo foi treinado com as
+# mesmas vendas que o backtest avalia, e o resultado é otimista. `walk_forward` mede
+# fora da amostra: re-treina o modelo (mesmo Pipeline do treinamento) a cada janela de
+# cortes, só com as vendas anteriores ao início da janela.
+
+STEP_DAYS = 7       # Intervalo padrão entre os cortes (dias)
+REFIT_DAYS = 90     # walk_forward: o modelo é re-treinado a cada 90 dias de cortes
+MIN_TRAIN_ROWS = 30 # walk_forward: janelas com menos vendas anteriores para treinar ficam de fora
+CHUNK_CUTOFFS = 16  # Cortes por tarefa no pool de processos
+NEVER = np.iinfo(np.int32).max  # DATA_DA_VENDA vazia: em aberto até hoje
+
+# Um elemento por oportunidade com DATA_CICLO_DE_BUSCA: primeiro as nunca vendidas, depois as
+# vendidas, cada grupo ordenado por DATA_CICLO_DE_BUSCA.
+# Datas em dias e meses desde 1970; `value` é o VALOR_SUGERIDO (projeção) e `sold` o VALOR_VENDIDO (realizado).
+HISTORY_DTYPE = np.dtype([('ciclo', '<i4'), ('venda', '<i4'), ('venda_month', '<i4'), ('days', '<i4'),
+                          ('value', '<f8'), ('sold', '<f8')])
+
+# --- Histórico e Datas de Corte ---
+
+def _day_numbers(dates):
+    return np.asarray(dates, dtype='datetime64[D]').astype('int64')
+
+def cutoff_dates(df, step_days=STEP_DAYS, start=None, end=None):
+    """Datas de corte a cada `step_days` dias entre o primeiro DATA_CICLO_DE_BUSCA e a última data da planilha."""
+    first = df['DATA_CICLO_DE_BUSCA'].min()
+    last = max(df['DATA_CICLO_DE_BUSCA'].max(), df['DATA_DA_VENDA'].max())
+    start = pd.Timestamp(start) if start is not None else first + pd.Timedelta(days=step_days)
+    end = pd.Timestamp(end) if end is not None else last
+    return pd.date_range(start.normalize(), end.normalize(), freq=f'{step_days}D')
+
+def snapshot_as_of(df, cutoff):
+    """Planilha como estaria na data de corte: oportunidades já criadas, sem as vendas posteriores.
+
+    É o caminho da aplicação, linha a linha (usado como referência pelo benchmark);
+    `run_backtest` faz o mesmo de forma vetorizada.
+    """
+    cutoff = pd.Timestamp(cutoff)
+    ciclo, venda = df['DATA_CICLO_DE_BUSCA'], df['DATA_DA_VENDA']
+    snapshot = df[(ciclo <= cutoff) & ~(venda <= cutoff)].copy()
+    snapshot['DATA_DA_VENDA'] = pd.NaT
+    return snapshot
+
+def prepare_history(df, model, features_list):
+    """Arrays do backtest (HISTORY_DTYPE), com os dias previstos de cada oportunidade calculados uma vez."""
+    df = df[df['DATA_CICLO_DE_BUSCA'].notna()]
+    order = np.lexsort((_day_numbers(df['DATA_CICLO_DE_BUSCA']), df['DATA_DA_VENDA'].notna().to_numpy()))
+    df = df.iloc[order]
+    history = np.empty(len(df), dtype=HISTORY_DTYPE)
+    if history.size == 0:
+        return history
+
+    with timed('backtest.previsao', rows=len(df)):
+        X = apply_dtypes(df.reindex(columns=list(features_list)))
+        history['days'] = predict_days(X, model, features_list)
+    venda = df['DATA_DA_VENDA'].to_numpy(dtype='datetime64[D]')
+    sold = ~np.isnat(venda)
+    history['ciclo'] = _day_numbers(df['DATA_CICLO_DE_BUSCA'])
+    history['venda'] = np.where(sold, venda.astype('int64'), NEVER)
+    history['venda_month'] = np.where(sold, venda.astype('datetime64[M]').astype('int64'), NEVER)
+    history['value'] = df['VALOR_SUGERIDO'].to_numpy(dtype='float64', na_value=np.nan)
+    realized = (df['VALOR_VENDIDO'].to_numpy(dtype='float64', na_value=np.nan)
+                if 'VALOR_VENDIDO' in df.columns else np.full(len(df), np.nan))
+    # Venda sem VALOR_VENDIDO: conta o valor sugerido
+    history['sold'] = np.where(np.isnan(realized), history['value'], realized)
+    return history
+
+# --- Avaliação de um Corte ---
+
+def _columns(history):
+    """Campos do histórico em arrays contíguos e a tabela dia -> mês das datas previstas.
+
+    Filtrar arrays contíguos é bem mais barato que filtrar os registros inteiros, e a
+    tabela troca a conversão de datas de cada corte por uma busca em um vetor de inteiros.
+    """
+    columns = {name: np.ascontiguousarray(history[name]) for name in HISTORY_DTYPE.names}
+    columns['split'] = int(np.searchsorted(columns['venda'] != NEVER, True))  # Início das vendidas
+    first = int(history['ciclo'].min()) if history.size else 0
+    last = int(history['ciclo'].max() + history['days'].max()) if history.size else 0
+    # Cortes podem cair depois do último ciclo: a tabela cobre até dez anos além dele
+    days = np.arange(first, last + 3660).astype('datetime64[D]')
+    columns['first_day'] = first
+    columns['month_of_day'] = days.astype('datetime64[M]').astype('int64')
+    return columns
+
+def _evaluate(columns, cutoff, months):
+    cutoff = pd.Timestamp(cutoff)
+    day = int(_day_numbers([cutoff])[0])
+    cutoff_month = int(np.datetime64(day, 'D').astype('datetime64[M]').astype('int64'))
+    split, ciclo = columns['split'], columns['ciclo']
+
+    # Nunca vendidas, criadas até o corte: um prefixo do primeiro grupo (sem filtro)
+    never = slice(0, np.searchsorted(ciclo[:split], day, side='right'))
+    # Vendidas: criadas até o corte (prefixo do segundo grupo) e vendidas depois dele
+    sold = split + np.flatnonzero(columns['venda'][split:split + np.searchsorted(ciclo[split:], day, side='right')]
+                                  > day)
+    venda = columns['venda'][sold]
+    days = columns['days'][sold]
+
+    # Mesma regra de projection.forecast: data provável = corte + dias, mês relativo ao mês do corte
+    month_of_day, offset = columns['month_of_day'], day - columns['first_day']
+    predicted_never = month_of_day[offset + columns['days'][never]] - cutoff_month
+    predicted = month_of_day[offset + days] - cutoff_month
+    actual = columns['venda_month'][sold].astype('int64') - cutoff_month
+    projected = (monthly_totals(predicted_never, columns['value'][never], months)
+                 + monthly_totals(predicted, columns['value'][sold], months))
+    realized = monthly_totals(actual, columns['sold'][sold], months)
+
+    error = predicted - actual
+    n_closed = len(sold)
+    abs_days = np.abs(day + days.astype('int64') - venda)
+    metrics = {
+        'CORTE': cutoff,
+        'ABERTAS': len(predicted_never) + n_closed,
+        'VENDIDAS_DEPOIS': n_closed,
+        'ACERTO_MES': float(np.mean(error == 0)) if n_closed else np.nan,
+        'ACERTO_MES_1': float(np.mean(np.abs(error) <= 1)) if n_closed else np.nan,
+        'VIES_MESES': float(np.mean(error)) if n_closed else np.nan,
+        'MAE_DIAS': float(np.mean(abs_days)) if n_closed else np.nan,
+    }
+    return metrics, projected, realized
+
+def evaluate_cutoff(history, cutoff, months=MONTHS):
+    """Métricas de um corte e as receitas projetada e realizada de cada mês do horizonte.
+
+    Retorna (dicionário com as métricas do corte, projeção, realizado), com os dois
+    vetores de `months` posições a partir do mês do corte.
+    """
+    return _evaluate(_columns(history), cutoff, months)
+
+def _evaluate_many(history, cutoffs, months):
+    columns = _columns(history)
+    return [_evaluate(columns, cutoff, months) for cutoff in cutoffs]
+
+# --- Cortes em Paralelo ---
+
+_worker = {}
+
+def _init_worker(name, size):
+    _worker['segment'] = shared_memory.SharedMemory(name=name)
+    _worker['history'] = np.ndarray(size, dtype=HISTORY_DTYPE, buffer=_worker['segment'].buf)
+
+def _evaluate_chunk(cutoffs, months):
+    return _evaluate_many(_worker['history'], cutoffs, months)
+
+def _evaluate_parallel(history, cutoffs, months, workers, start_method=START_METHOD):
+    """Avalia os cortes em um pool de processos; o histórico vai uma vez para a memória compartilhada."""
+    segment = shared_memory.SharedMemory(create=True, size=max(1, history.nbytes))
+    try:
+        np.ndarray(history.shape, dtype=HISTORY_DTYPE, buffer=segment.buf)[:] = history
+        chunks = [cutoffs[i:i + CHUNK_CUTOFFS] for i in range(0, len(cutoffs), CHUNK_CUTOFFS)]
+        with ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context(start_method),
+                                 initializer=_init_worker, initargs=(segment.name, len(history))) as executor:
+            futures = [executor.submit(_evaluate_chunk, chunk, months) for chunk in chunks]
+            return [result for future in futures for result in future.result()]
+    finally:
+        segment.close()
+        segment.unlink()
+
+def run_backtest(history, cutoffs, months=MONTHS, workers=1):
+    """Avalia todos os cortes. Retorna (métricas por corte, projeção x realizado por corte e mês).
+
+    A projeção tem uma linha por corte e mês do horizonte (HORIZONTE 0 = mês do corte);
+    COMPLETO indica os meses já encerrados na planilha, os únicos com realizado definitivo.
+    """
+    cutoffs = list(pd.DatetimeIndex(cutoffs))
+    with timed('backtest.cortes', rows=len(cutoffs)):
+        if workers > 1 and len(cutoffs) > CHUNK_CUTOFFS:
+            results = _evaluate_parallel(history, cutoffs, months, workers)
+        else:
+            results = _evaluate_many(history, cutoffs, months)
+
+    metrics = pd.DataFrame([result[0] for result in results],
+                           columns=['CORTE', 'ABERTAS', 'VENDIDAS_DEPOIS', 'ACERTO_MES', 'ACERTO_MES_1',
+                                    'VIES_MESES', 'MAE_DIAS'])
+    last_day = history['ciclo'].max() if history.size else 0
+    if history.size and (history['venda'] != NEVER).any():
+        last_day = max(last_day, history['venda'][history['venda'] != NEVER].max())
+    last_month = np.datetime64(int(last_day), 'D').astype('datetime64[M]')
+    frames = []
+    for (info, projected, realized) in results:
+        labels = month_labels(info['CORTE'], months)
+        frames.append(pd.DataFrame({
+            'CORTE': info['CORTE'], 'HORIZONTE': np.arange(months), 'MES_ANO_PROVAVEL': labels,
+            'VALOR_PROJETADO': projected, 'VALOR_REALIZADO': realized,
+            'COMPLETO': labels.astype('datetime64[M]') < last_month,
+        }))
+    projection = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(
+        columns=['CORTE', 'HORIZONTE', 'MES_ANO_PROVAVEL', 'VALOR_PROJETADO', 'VALOR_REALIZADO', 'COMPLETO'])
+    return metrics, projection
+
+# --- Fora da Amostra (re-treino por janela) ---
+
+def walk_forward(df, cutoffs, refit_days=REFIT_DAYS, model_type='gbr', months=MONTHS, workers=1,
+                 min_rows=MIN_TRAIN_ROWS):
+    """Backtest fora da amostra: a cada `refit_days` dias de cortes, treina um modelo novo
+    (model_trainer2.build_pipeline) só com as vendas até o primeiro corte da janela.
+
+    Janelas com menos de `min_rows` vendas para treinar ficam de fora. Retorna (métricas,
+    projeção) como run_backtest; nas métricas, TREINO_ATE é a data da última venda que
+    o modelo do corte pode ter visto. As features continuam sendo as atuais da planilha.
+    """
+    from model_trainer2 import build_pipeline, prepare_training_data
+
+    cutoffs = pd.DatetimeIndex(cutoffs)
+    results = []
+    start = cutoffs.min() if len(cutoffs) else None
+    while start is not None and start <= cutoffs.max():
+        end = start + pd.Timedelta(days=refit_days)
+        window = cutoffs[(cutoffs >= start) & (cutoffs < end)]
+        X, y, features = prepare_training_data(df[df['DATA_DA_VENDA'] <= start])
+        if len(window) and len(X) >= min_rows:
+            with timed('backtest.retreino', rows=len(X)):
+                model = try_compile(build_pipeline(features, model_type).fit(X, y))
+            metrics, projection = run_backtest(prepare_history(df, model, features), window, months, workers)
+            metrics.insert(1, 'TREINO_ATE', start)
+            results.append((metrics, projection))
+        start = end
+    if not results:
+        metrics, projection = run_backtest(np.empty(0, dtype=HISTORY_DTYPE), [], months)
+        metrics.insert(1, 'TREINO_ATE', pd.NaT)
+        return metrics, projection
+    return (pd.concat([metrics for metrics, _ in results], ignore_index=True),
+            pd.concat([projection for _, projection in results], ignore_index=True))
+
+# --- Resumo ---
+
+def summarize(metrics, projection):
+    """Resumo geral (acerto do mês e MAE ponderados pelas vendas) e erro da receita por horizonte.
+
+    Retorna (dicionário, DataFrame por HORIZONTE com projetado, realizado, WAPE e viés),
+    usando só os meses já encerrados.
+    """
+    weights = metrics['VENDIDAS_DEPOIS']
+    valid = weights > 0
+    total = weights[valid].sum()
+    overall = {
+        'cortes': len(metrics),
+        'vendas_avaliadas': int(total),
+        'acerto_mes': float((metrics['ACERTO_MES'][valid] * weights[valid]).sum() / total) if total else np.nan,
+        'acerto_mes_1': float((metrics['ACERTO_MES_1'][valid] * weights[valid]).sum() / total) if total else np.nan,
+        'mae_dias': float((metrics['MAE_DIAS'][valid] * weights[valid]).sum() / total) if total else np.nan,
+    }
+    complete = projection[projection['COMPLETO']].copy()
+    complete['ERRO_ABS'] = (complete['VALOR_PROJETADO'] - complete['VALOR_REALIZADO']).abs()
+    by_horizon = complete.groupby('HORIZONTE').agg(
+        CORTES=('CORTE', 'size'), VALOR_PROJETADO=('VALOR_PROJETADO', 'sum'),
+        VALOR_REALIZADO=('VALOR_REALIZADO', 'sum'), ERRO_ABS=('ERRO_ABS', 'sum'))
+    realized = by_horizon['VALOR_REALIZADO'].where(by_horizon['VALOR_REALIZADO'] > 0)
+    by_horizon['WAPE'] = by_horizon['ERRO_ABS'] / realized
+    by_horizon['VIES'] = (by_horizon['VALOR_PROJETADO'] - by_horizon['VALOR_REALIZADO']) / realized
+    return overall, by_horizon.drop(columns='ERRO_ABS').reset_index()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Backtest histórico da data provável de fechamento e da projeção mensal."
+    )
+    parser.add_argument('input', help="Planilha com o histórico (.xlsx, .csv ou .parquet).")
+    parser.add_argument('--model', default=default_model_path(),
+                        help="Caminho do modelo treinado (.bundle ou .pkl; padrão: o pacote, se existir).")
+    parser.add_argument('--features', default=FEATURES_PATH, help="Caminho da lista de features (ignorado com .bundle).")
+    parser.add_argument('--step-days', type=int, default=STEP_DAYS, help="Dias entre as datas de corte.")
+    parser.add_argument('--start', default=None, help="Primeiro corte AAAA-MM-DD (padrão: início do histórico).")
+    parser.add_argument('--end', default=None, help="Último corte AAAA-MM-DD (padrão: última data da planilha).")
+    parser.add_argument('--months', type=int, default=MONTHS, help="Horizonte da projeção (meses).")
+    parser.add_argument('--workers', type=int, default=1, help="Processos para avaliar os cortes.")
+    parser.add_argument('--refit-days', type=int, default=None,
+                        help="Fora da amostra: re-treina o modelo a cada N dias de cortes, só com as vendas "
+                             f"anteriores (ex: {REFIT_DAYS}; padrão: usa --model, dentro da amostra).")
+    parser.add_argument('--model-type', choices=['gbr', 'hgb'], default='gbr',
+                        help="Tipo de modelo re-treinado com --refit-days.")
+    parser.add_argument('--no-compile', action='store_true',
+                        help="Usa o Pipeline do scikit-learn em vez do modelo compilado (mesmas previsões).")
+    parser.add_argument('--output', default=None, help="Grava as métricas por corte (.csv ou .parquet).")
+    parser.add_argument('--projection-output', default=None,
+                        help="Grava a projeção x realizado por corte e mês (.csv ou .parquet).")
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    df = read_table(args.input)
+    cutoffs = cutoff_dates(df, args.step_days, args.start, args.end)
+    if args.refit_days:
+        metrics, projection = walk_forward(df, cutoffs, args.refit_days, args.model_type, args.months, args.workers)
+        windows = metrics['TREINO_ATE'].nunique()
+        sample_note = (f"FORA DA AMOSTRA: {windows} modelos re-treinados (a cada {args.refit_days} dias), cada um "
+                       f"só com as vendas até o início da sua janela; {len(cutoffs) - len(metrics)} cortes sem "
+                       f"vendas anteriores suficientes ficaram de fora.")
+    else:
+        model, features_list = load_model(args.model, args.features)
+        if not args.no_compile:
+            model = try_compile(model)
+        metrics, projection = run_backtest(prepare_history(df, model, features_list), cutoffs, args.months,
+                                           args.workers)
+        sample_note = (f"DENTRO DA AMOSTRA: o modelo ({args.model}) foi treinado com estas mesmas vendas, então "
+                       f"o resultado é otimista e não mede previsões futuras. Use --refit-days {REFIT_DAYS} para "
+                       f"re-treinar só com as vendas anteriores a cada corte.")
+    overall, by_horizon = summarize(metrics, projection)
+    print(f"{overall['cortes']} cortes avaliados em {time.perf_counter() - start:.1f}s.")
+    print(f"Atenção: {sample_note} As features são as atuais da planilha (ex: a etapa final das vendidas), "
+          f"o que também favorece o resultado.")
+    print(f"Mês de fechamento: {overall['acerto_mes']:.1%} de acerto exato, {overall['acerto_mes_1']:.1%} com até "
+          f"1 mês de diferença; MAE de {overall['mae_dias']:.1f} dias ({overall['vendas_avaliadas']} vendas avaliadas).")
+    print("\nReceita por horizonte (meses encerrados):")
+    print(by_horizon.to_string(index=False, float_format=lambda v: f"{v:,.2f}"))
+    if args.output:
+        write_table(metrics, args.output)
+    if args.projection_output:
+        write_table(projection, args.projection_output)
+    return metrics, projection
+
+if __name__ == '__main__':
+    main()
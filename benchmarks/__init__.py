@@ -0,0 +1 @@
+"""Scripts de benchmark do projeto. Execute a partir da raiz com `python -m benchmarks.<script>`."""
@@ -0,0 +1,105 @@
+"""Carga do modelo: pickle do joblib x pacote (model_bundle) com arrays mapeados do arquivo.
+
+Treina os modelos ('gbr' e 'hgb') em uma base sintética enriquecida, grava cada um nos
+dois formatos e sobe `--processes` processos por formato ao mesmo tempo, como vários
+workers de um serviço. Cada processo mede o tempo da carga (com as bibliotecas já
+importadas) e, com todos os processos vivos, a memória acrescida pela carga: RSS
+(páginas residentes) e PSS (páginas compartilhadas divididas entre os processos).
+O modelo entregue com o projeto (modelo_fechamento.pkl), se existir, também é medido.
+
+    python -m benchmarks.bench_bundle --rows 5000 --processes 4
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+import joblib
+
+from benchmarks.synthetic import make_vendas
+from model_bundle import save_bundle
+from schema import apply_dtypes, normalize_columns
+
+RUNNER = """
+import json, sys, time
+import joblib
+import sklearn.compose, sklearn.ensemble, sklearn.pipeline, sklearn.preprocessing  # noqa: F401
+from model_bundle import load_bundle
+
+def memory_mb():
+    values = {}
+    with open('/proc/self/smaps_rollup') as f:
+        for line in f:
+            key, *rest = line.split()
+            if key in ('Rss:', 'Pss:'):
+                values[key[:-1].lower()] = int(rest[0]) / 1024
+    return values
+
+fmt, path = sys.argv[1], sys.argv[2]
+before = memory_mb()
+start = time.perf_counter()
+if fmt == 'pkl':
+    model = joblib.load(path)
+else:
+    model = load_bundle(path, verify=fmt == 'bundle').model
+load_s = time.perf_counter() - start
+print(json.dumps({'load_s': load_s}), flush=True)
+sys.stdin.readline()  # espera todos os processos carregarem antes de medir a memória
+after = memory_mb()
+print(json.dumps({key: after[key] - before[key] for key in after}), flush=True)
+sys.stdin.read()
+"""
+
+FORMATS = [('pkl', 'pickle (joblib)'), ('bundle', 'pacote'), ('bundle-noverify', 'pacote sem hash')]
+
+def measure(fmt, path, processes):
+    """Sobe `processes` processos que carregam o modelo; retorna (tempo médio de carga, RSS, PSS) por processo."""
+    procs = [subprocess.Popen([sys.executable, '-c', RUNNER, fmt, path], stdin=subprocess.PIPE,
+                              stdout=subprocess.PIPE, text=True, cwd=os.getcwd())
+             for _ in range(processes)]
+    try:
+        loads = [json.loads(proc.stdout.readline()) for proc in procs]
+        for proc in procs:
+            proc.stdin.write('\n')
+            proc.stdin.flush()
+        memory = [json.loads(proc.stdout.readline()) for proc in procs]
+    finally:
+        for proc in procs:
+            proc.stdin.close()
+            proc.wait()
+    return (sum(r['load_s'] for r in loads) / processes,
+            sum(m['rss'] for m in memory) / processes,
+            sum(m['pss'] for m in memory) / processes)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rows', type=int, default=5_000)
+    parser.add_argument('--processes', type=int, default=4)
+    parser.add_argument('--models', nargs='+', default=['gbr', 'hgb'])
+    args = parser.parse_args()
+
+    from model_trainer2 import build_pipeline, prepare_training_data
+
+    df = apply_dtypes(normalize_columns(make_vendas(args.rows, enriched=True)))
+    X, y, features = prepare_training_data(df)
+    models = {model_type: (build_pipeline(features, model_type).fit(X, y), features) for model_type in args.models}
+    if os.path.exists('modelo_fechamento.pkl') and os.path.exists('features_list.pkl'):
+        models['entregue'] = (joblib.load('modelo_fechamento.pkl'), joblib.load('features_list.pkl'))
+
+    print(f"{args.processes} processos por formato; memória acrescida pela carga, média por processo\n")
+    print(f"{'modelo':<10} {'formato':<16} {'arquivo (KB)':>13} {'carga (ms)':>11} {'RSS (MB)':>9} {'PSS (MB)':>9}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for name, (model, model_features) in models.items():
+            paths = {'pkl': os.path.join(tmp, f"{name}.pkl"), 'bundle': os.path.join(tmp, f"{name}.bundle")}
+            joblib.dump(model, paths['pkl'])
+            save_bundle(paths['bundle'], model, model_features)
+            for fmt, label in FORMATS:
+                path = paths['pkl' if fmt == 'pkl' else 'bundle']
+                load_s, rss, pss = measure(fmt, path, args.processes)
+                print(f"{name:<10} {label:<16} {os.path.getsize(path) / 1024:>13.0f} {load_s * 1000:>11.1f} "
+                      f"{rss:>9.1f} {pss:>9.1f}")
+
+if __name__ == '__main__':
+    main()
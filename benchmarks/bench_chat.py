@@ -0,0 +1,103 @@
+"""Aba de chat: agente recriado a cada rerun x agente da sessão com cache x cubo de agregados.
+
+Simula uma sessão do Streamlit com o LLM falso local (benchmarks/fake_llm.py, com
+`--latency` segundos por chamada): a cada rerun o script roda de novo e, em parte
+deles, o usuário faz uma pergunta. As perguntas se repetem com variações de caixa,
+espaços e pontuação. Compara o comportamento antigo (create_agent a cada rerun e
+uma rodada do agente por pergunta) com AgentSession, sem e com o cubo de agregados
+(analytics_cube.py) respondendo antes do agente às perguntas que o roteador reconhece.
+
+    python -m benchmarks.bench_chat --reruns 60 --latency 0.3
+"""
+import argparse
+import contextlib
+import functools
+import io
+import time
+
+import numpy as np
+
+from benchmarks.fake_llm import FakeToolChatModel
+from analytics_cube import build_cube
+from benchmarks.synthetic import make_vendas
+from langchain_agent import AgentSession, create_agent, dataframe_hash, route_question, run_agent
+from schema import apply_dtypes, normalize_columns
+
+QUESTIONS = [
+    "Qual o valor total sugerido por etapa?",
+    "Quantas oportunidades cada ESN tem?",
+    "Qual o ticket médio por produto sugerido?",
+    "Quais clientes têm mais oportunidades?",
+    "Quantas oportunidades estão em negociação?",
+    "Qual GSN tem o maior valor em aberto?",
+]
+
+def session_script(reruns, seed=0):
+    """Sequência de reruns: None (rerun sem pergunta, ex: clique em outro widget) ou a pergunta feita."""
+    rng = np.random.default_rng(seed)
+    script = []
+    for _ in range(reruns):
+        if rng.random() < 0.5:
+            script.append(None)
+            continue
+        question = QUESTIONS[rng.integers(len(QUESTIONS))]
+        variant = rng.integers(3)
+        script.append(question if variant == 0 else question.lower() if variant == 1 else f"  {question.upper()}  ")
+    return script
+
+def run_legacy(df, script, llm):
+    builds = 0
+    for prompt in script:
+        agent = create_agent(df, None, 0.0, llm=llm)
+        builds += 1
+        if prompt is not None:
+            run_agent(agent, prompt)
+    return builds, None, 0
+
+def run_session(df, script, llm, cube=None):
+    session = AgentSession(functools.partial(create_agent, llm=llm))
+    # Na aplicação, o hash é o do arquivo enviado (calculado uma vez por upload)
+    data_hash = dataframe_hash(df)
+    for prompt in script:
+        if prompt is not None:
+            session.ask(df, prompt, None, 0.0, data_hash=data_hash, cube=cube)
+        else:
+            session.get_agent(df, None, 0.0, data_hash=data_hash)
+    return session.builds, session.answers.stats(), session.routed
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--reruns', type=int, default=60)
+    parser.add_argument('--latency', type=float, default=0.3, help="Segundos por chamada ao LLM falso.")
+    parser.add_argument('--rows', type=int, default=5_000, help="Linhas da planilha sintética.")
+    args = parser.parse_args()
+
+    df = apply_dtypes(normalize_columns(make_vendas(args.rows)))  # Como read_table entrega à aplicação
+    script = session_script(args.reruns)
+    start = time.perf_counter()
+    cube = build_cube(df)  # Na aplicação, uma vez por upload (aqui sem as previsões: sem o mês previsto)
+    cube_seconds = time.perf_counter() - start
+    routed = [q for q in QUESTIONS if route_question(q, cube) is not None]
+    start = time.perf_counter()
+    for q in QUESTIONS * 20:
+        route_question(q, cube)
+    route_ms = (time.perf_counter() - start) / (len(QUESTIONS) * 20) * 1000
+    print(f"{args.reruns} reruns, {sum(p is not None for p in script)} perguntas "
+          f"({len(QUESTIONS)} distintas), {args.latency:.2f} s por chamada ao LLM")
+    print(f"cubo: montado em {cube_seconds * 1000:.1f} ms; {len(routed)}/{len(QUESTIONS)} perguntas distintas "
+          f"respondidas pelo roteador, {route_ms:.1f} ms por pergunta\n")
+    print(f"{'modo':<26} {'agentes criados':>16} {'chamadas ao LLM':>16} {'acertos no cache':>17} "
+          f"{'pelo cubo':>10} {'tempo (s)':>10}")
+    modes = (('recriado a cada rerun', run_legacy), ('sessão + cache', run_session),
+             ('sessão + cache + cubo', functools.partial(run_session, cube=cube)))
+    for name, runner in modes:
+        llm = FakeToolChatModel(latency=args.latency)
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):  # O agente imprime cada passo (verbose)
+            builds, stats, routed = runner(df, script, llm)
+        elapsed = time.perf_counter() - start
+        hits = f"{stats['hits']}/{stats['hits'] + stats['misses']}" if stats else '-'
+        print(f"{name:<26} {builds:>16} {llm.calls:>16} {hits:>17} {routed:>10} {elapsed:>10.2f}")
+
+if __name__ == '__main__':
+    main()
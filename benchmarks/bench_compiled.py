@@ -0,0 +1,76 @@
+"""Previsão com o Pipeline do scikit-learn x modelo compilado (compiled_model.py).
+
+Mede a latência de `model.predict` e de `CompiledModel.predict` em lotes de 1, 100
+e 100 mil oportunidades, e confere que as previsões são idênticas bit a bit em
+cada lote (inclusive com categorias desconhecidas). Usa o modelo entregue com o
+projeto (com oportunidades reamostradas de vendas.xlsx) e um 'gbr' treinado na
+base sintética com os parâmetros do treinamento (300 árvores, profundidade 4).
+
+    python -m benchmarks.bench_compiled --batches 1 100 100000
+"""
+import argparse
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.synthetic import make_vendas
+from compiled_model import compile_model
+from schema import apply_dtypes, normalize_columns
+from scoring import load_model, preprocess_data
+
+def median_seconds(func, repeats):
+    func()
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    return float(np.median(times))
+
+def sample_rows(df, n_rows, seed=0):
+    """`n_rows` linhas reamostradas de `df`; 1% com categorias que o modelo nunca viu."""
+    rng = np.random.default_rng(seed)
+    sample = df.iloc[rng.integers(0, len(df), size=n_rows)].reset_index(drop=True)
+    unknown = rng.random(n_rows) < 0.01
+    sample.loc[unknown, 'ETAPA_ATUAL'] = 'Etapa nova'
+    return sample
+
+def compare(name, model, features, source, batches):
+    compiled = compile_model(model)
+    data = preprocess_data(sample_rows(source, max(batches)), features)[features]
+    for n_rows in batches:
+        X = data.iloc[:n_rows]
+        identical = np.array_equal(model.predict(X), compiled.predict(X))
+        assert identical, f"{name}: previsões diferentes em lote de {n_rows}"
+        repeats = 200 if n_rows <= 100 else 3
+        pipeline_s = median_seconds(lambda: model.predict(X), repeats)
+        compiled_s = median_seconds(lambda: compiled.predict(X), repeats)
+        print(f"{name:<10} {n_rows:>8,} {pipeline_s * 1000:>14.3f} {compiled_s * 1000:>16.3f} "
+              f"{pipeline_s / compiled_s:>9.1f}x {str(identical):>10}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--batches', type=int, nargs='+', default=[1, 100, 100_000])
+    parser.add_argument('--train-rows', type=int, default=3_000, help="Linhas de treino do modelo sintético.")
+    args = parser.parse_args()
+
+    from model_trainer2 import build_pipeline, prepare_training_data
+
+    print(f"{'modelo':<10} {'linhas':>8} {'Pipeline (ms)':>14} {'compilado (ms)':>16} {'ganho':>10} {'idênticas':>10}")
+    if os.path.exists('modelo_fechamento.pkl'):
+        model, features = load_model()
+        source = normalize_columns(pd.read_excel('vendas.xlsx')) if os.path.exists('vendas.xlsx') else \
+            normalize_columns(make_vendas(10_000))
+        source['DATA_DA_VENDA'] = pd.NaT
+        compare('entregue', model, features, source, args.batches)
+
+    train = apply_dtypes(normalize_columns(make_vendas(args.train_rows, seed=1)))
+    X, y, features = prepare_training_data(train)
+    model = build_pipeline(features, 'gbr').fit(X, y)
+    source = normalize_columns(make_vendas(20_000, closed_ratio=0.0, seed=2))
+    compare('sintético', model, features, source, args.batches)
+
+if __name__ == '__main__':
+    main()
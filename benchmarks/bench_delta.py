@@ -0,0 +1,74 @@
+"""Pontuação completa x pontuação incremental (prediction_store.py) em uploads semanais.
+
+Simula exportações semanais do CRM: a cada semana, uma fração das oportunidades em
+aberto muda de valor e algumas são novas. Compara predict_and_project sem o
+armazenamento (todas as linhas vão ao modelo) com o armazenamento frio (primeiro
+upload: todas as linhas são novas) e quente (só as alteradas e novas vão ao modelo),
+e confere que os dias previstos são idênticos. Usa o modelo entregue com o projeto.
+
+    python -m benchmarks.bench_delta --rows 100000 --changed 0.05 --new 0.02
+"""
+import argparse
+import os
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.synthetic import make_vendas
+from prediction_store import PredictionStore, delta_summary
+from schema import apply_dtypes, normalize_columns
+from scoring import load_model, predict_and_project, preprocess_data
+
+def weekly_export(df, changed, new, seed=1):
+    """Próxima exportação: `changed` das linhas com VALOR_SUGERIDO alterado e `new` de linhas novas."""
+    rng = np.random.default_rng(seed)
+    df = df.copy()
+    rows = rng.random(len(df)) < changed
+    df.loc[rows, 'VALOR_SUGERIDO'] = df.loc[rows, 'VALOR_SUGERIDO'] * 1.1
+    n_new = int(len(df) * new)
+    extra = df.sample(n_new, random_state=seed).copy()
+    extra['NOME_DA_OPORTUNIDADE'] = [f"Oportunidade nova - {i}" for i in range(n_new)]
+    return apply_dtypes(pd.concat([df, extra], ignore_index=True))
+
+def timed_run(df, model, features_list, store=None):
+    start = time.perf_counter()
+    df_abertas = preprocess_data(df.copy(), features_list)
+    df_abertas, _ = predict_and_project(df_abertas, model, features_list, store=store)
+    if store is not None:
+        store.save()
+    return time.perf_counter() - start, df_abertas['DIAS_PREVISTOS'].to_numpy()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rows', type=int, default=100_000)
+    parser.add_argument('--changed', type=float, default=0.05, help="Fração das linhas alteradas por semana.")
+    parser.add_argument('--new', type=float, default=0.02, help="Fração de linhas novas por semana.")
+    args = parser.parse_args()
+
+    model, features_list = load_model()
+    week1 = apply_dtypes(normalize_columns(make_vendas(args.rows)))
+    week2 = weekly_export(week1, args.changed, args.new)
+    print(f"{args.rows:,} linhas por upload ({(week1['DATA_DA_VENDA'].isna()).sum():,} em aberto); "
+          f"semana 2: {args.changed:.0%} alteradas, {args.new:.0%} novas\n")
+    print(f"{'modo':<34} {'tempo (s)':>10}  previsões")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'previsoes.sqlite')
+        full1, reference1 = timed_run(week1, model, features_list)
+        full2, reference2 = timed_run(week2, model, features_list)
+        with PredictionStore(path, model_key='bench') as store:
+            cold, days1 = timed_run(week1, model, features_list, store)
+            cold_stats = store.last_stats
+            warm, days2 = timed_run(week2, model, features_list, store)
+            warm_stats = store.last_stats
+        assert np.array_equal(days1, reference1) and np.array_equal(days2, reference2)
+        print(f"{'completa (semana 1)':<34} {full1:>10.2f}")
+        print(f"{'completa (semana 2)':<34} {full2:>10.2f}")
+        print(f"{'incremental, frio (semana 1)':<34} {cold:>10.2f}  {delta_summary(cold_stats)}")
+        print(f"{'incremental, quente (semana 2)':<34} {warm:>10.2f}  {delta_summary(warm_stats)}")
+        print(f"\nArmazenamento: {os.path.getsize(path) / 2**20:.1f} MB; dias previstos idênticos aos da pontuação completa.")
+
+if __name__ == '__main__':
+    main()
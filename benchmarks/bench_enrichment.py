@@ -0,0 +1,54 @@
+"""Compara a consulta sequencial (get_cnpj_data) com o CnpjFetcher contra o stub local.
+
+Verifica também que o resultado do fetcher é idêntico ao de `get_cnpj_data`.
+
+    python -m benchmarks.bench_enrichment --cnpjs 200 --latency 0.05 --error-rate 0.1
+"""
+import argparse
+import contextlib
+import io
+import random
+import time
+
+from benchmarks.stub_brasilapi import StubBrasilAPI
+from cnpj_enrichment import CnpjFetcher, get_cnpj_data
+
+def random_cnpjs(n, seed=0):
+    rnd = random.Random(seed)
+    return [''.join(rnd.choice('0123456789') for _ in range(14)) for _ in range(n)]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--cnpjs', type=int, default=200)
+    parser.add_argument('--latency', type=float, default=0.05)
+    parser.add_argument('--error-rate', type=float, default=0.1)
+    parser.add_argument('--workers', type=int, default=8)
+    parser.add_argument('--rate', type=float, default=50.0)
+    args = parser.parse_args()
+
+    cnpjs = random_cnpjs(args.cnpjs)
+
+    # Referência: consulta sequencial, sem erros injetados (get_cnpj_data não tenta de novo)
+    with StubBrasilAPI(latency=args.latency) as stub, contextlib.redirect_stdout(io.StringIO()):
+        start = time.perf_counter()
+        expected = {cnpj: get_cnpj_data(cnpj, api_url=stub.url) for cnpj in cnpjs}
+        sequential = time.perf_counter() - start
+
+    with StubBrasilAPI(latency=args.latency, error_rate=args.error_rate, retry_after=0.2) as stub:
+        fetcher = CnpjFetcher(api_url=stub.url, max_workers=args.workers, rate=args.rate,
+                              burst=args.workers, backoff_base=0.05, progress=None)
+        start = time.perf_counter()
+        results = fetcher.fetch_many(cnpjs)
+        concurrent = time.perf_counter() - start
+        injected = stub.errors
+
+    mismatches = [c for c in cnpjs if results[c] != expected[c] and c not in fetcher.failed]
+    print(f"CNPJs: {len(cnpjs)} | latência do stub: {args.latency * 1000:.0f} ms")
+    print(f"Sequencial (sem o sleep de 3 s): {sequential:.2f} s")
+    print(f"CnpjFetcher ({args.workers} workers, {args.rate}/s, {injected} erros injetados): "
+          f"{concurrent:.2f} s -> {sequential / concurrent:.1f}x")
+    print(f"Estatísticas: {fetcher.stats}")
+    print(f"Divergências em relação a get_cnpj_data: {len(mismatches)} | falhas definitivas: {len(fetcher.failed)}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,68 @@
+"""Compara a gravação do enriquecimento linha a linha (df.loc por CNPJ) com `apply_enrichment`.
+
+O método antigo é medido sobre uma amostra de CNPJs e extrapolado linearmente
+(o custo dele é proporcional a CNPJs únicos x linhas), para não levar horas em 1M linhas.
+
+    python -m benchmarks.bench_enrichment_writeback --rows 10000 100000 1000000
+"""
+import argparse
+import time
+
+import pandas as pd
+
+from benchmarks.synthetic import fake_cnpj_records, make_vendas
+from cnpj_enrichment import ENRICHMENT_COLUMNS, apply_enrichment, clean_cnpj
+
+def legacy_write_back(df, cnpj_cache, cnpjs):
+    """Implementação original do enrich_data (varredura booleana + df.loc por campo)."""
+    for cnpj in cnpjs:
+        if cnpj_cache[cnpj]:
+            indices = df[df['CNPJ_CLEAN'] == cnpj].index
+            for key, value in cnpj_cache[cnpj].items():
+                if value is not None and value != '':
+                    df.loc[indices, key] = value
+    return df
+
+def prepare(n_rows):
+    df = make_vendas(n_rows)
+    df.columns = df.columns.str.replace(' ', '_')
+    for col in ENRICHMENT_COLUMNS:
+        df[col] = pd.Series(None, index=df.index, dtype=object)
+    df['CNPJ_CLEAN'] = df['CNPJ'].map(clean_cnpj)
+    unique_cnpjs = df['CNPJ_CLEAN'].dropna().unique()
+    return df, fake_cnpj_records(unique_cnpjs), unique_cnpjs
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rows', type=int, nargs='+', default=[10_000, 100_000, 1_000_000])
+    parser.add_argument('--legacy-sample', type=int, default=200,
+                        help="CNPJs usados para medir (e extrapolar) o método antigo.")
+    args = parser.parse_args()
+
+    print(f"{'linhas':>10} {'CNPJs':>8} {'antigo (s)':>12} {'vetorizado (s)':>15} {'ganho':>8}")
+    for n_rows in args.rows:
+        df, records, unique_cnpjs = prepare(n_rows)
+
+        sample = unique_cnpjs[:args.legacy_sample]
+        start = time.perf_counter()
+        legacy = legacy_write_back(df.copy(), records, sample)
+        legacy_time = (time.perf_counter() - start) * len(unique_cnpjs) / len(sample)
+
+        start = time.perf_counter()
+        vectorized = apply_enrichment(df.copy(), records)
+        vectorized_time = time.perf_counter() - start
+
+        # Conferência: as linhas da amostra devem ficar idênticas nos dois métodos
+        rows = df['CNPJ_CLEAN'].isin(sample)
+        for col in ENRICHMENT_COLUMNS:
+            a, b = legacy.loc[rows, col], vectorized.loc[rows, col]
+            assert a.isna().equals(b.isna()), col
+            assert (a[a.notna()].astype(str) == b[b.notna()].astype(str)).all(), col
+
+        estimated = '*' if len(sample) < len(unique_cnpjs) else ''
+        print(f"{n_rows:>10,} {len(unique_cnpjs):>8,} {legacy_time:>11.2f}{estimated or ' '} "
+              f"{vectorized_time:>15.3f} {legacy_time / vectorized_time:>7.0f}x")
+    print("* tempo extrapolado a partir da amostra")
+
+if __name__ == '__main__':
+    main()
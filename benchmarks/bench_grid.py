@@ -0,0 +1,82 @@
+"""Tabela de resultados: quadro inteiro formatado como texto x grid paginado (results_grid.py).
+
+O caminho antigo copia as colunas da tabela, formata cada valor e cada data como texto,
+ordena pelo texto dd/mm/aaaa e envia o quadro inteiro ao navegador. O grid monta o quadro
+tipado uma vez por upload e, a cada rerun, envia só a página (50 linhas). Mede o tempo de
+cada rerun até os bytes Arrow enviados pelo Streamlit (`convert_pandas_df_to_arrow_bytes`)
+e o tamanho desses bytes. Usa previsões sintéticas (dias aleatórios), sem o modelo.
+
+    python -m benchmarks.bench_grid --rows 10000 100000 1000000
+"""
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+from streamlit.dataframe_util import convert_pandas_df_to_arrow_bytes
+
+from benchmarks.synthetic import make_vendas
+from projection import closing_dates
+from results_grid import GRID_COLUMNS, PAGE_SIZE, ResultsGrid
+from schema import apply_dtypes, normalize_columns
+from scoring import preprocess_data
+
+def results_frame(n_rows):
+    df = apply_dtypes(normalize_columns(make_vendas(n_rows * 2)))
+    df_abertas = preprocess_data(df, [])
+    days = np.random.default_rng(0).integers(1, 400, size=len(df_abertas))
+    df_abertas['DIAS_PREVISTOS'] = days
+    df_abertas['DATA_PROVAVEL_FECHAMENTO'] = closing_dates(days)
+    return df_abertas.iloc[:n_rows]
+
+def old_table(df_results):
+    """Como a aplicação montava a tabela antes do grid."""
+    display_df = df_results[[col for col in GRID_COLUMNS if col in df_results.columns and col != 'ESN']].copy()
+    display_df['VALOR_SUGERIDO'] = display_df['VALOR_SUGERIDO'].map('R$ {:,.2f}'.format)
+    display_df['DATA_PROVAVEL_FECHAMENTO'] = pd.to_datetime(display_df['DATA_PROVAVEL_FECHAMENTO']).dt.strftime('%d/%m/%Y')
+    display_df.sort_values(by='DATA_PROVAVEL_FECHAMENTO', inplace=True)
+    return convert_pandas_df_to_arrow_bytes(display_df)
+
+def timed(fn, repeats=3):
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = fn()
+        times.append(time.perf_counter() - start)
+    return float(np.median(times)), result
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rows', type=int, nargs='+', default=[10_000, 100_000, 1_000_000])
+    args = parser.parse_args()
+
+    print(f"{'linhas':>10} {'modo':<34} {'tempo (ms)':>11} {'enviado (KB)':>13}")
+    for n_rows in args.rows:
+        df_results = results_frame(n_rows)
+        old_seconds, payload = timed(lambda: old_table(df_results))
+        build_seconds, grid = timed(lambda: ResultsGrid(df_results))
+        grid.positions()  # Ordem padrão já calculada no primeiro rerun
+
+        def rerun(page=3, filters=None, sort_by='DATA_PROVAVEL_FECHAMENTO', ascending=True):
+            return convert_pandas_df_to_arrow_bytes(grid.page(page, PAGE_SIZE, sort_by, ascending, filters)[0])
+
+        def new_sort():
+            grid._orders.pop(('VALOR_SUGERIDO', False), None)
+            grid._last = None
+            return rerun(1, sort_by='VALOR_SUGERIDO', ascending=False)
+        page_seconds, page_payload = timed(rerun)
+        etapas = grid.options('ETAPA_ATUAL')[:2]
+        filter_seconds, _ = timed(lambda: (setattr(grid, '_last', None), rerun(1, {'ETAPA_ATUAL': etapas}))[1])
+        sort_seconds, _ = timed(new_sort)
+        rows = [
+            ('tabela inteira como texto', old_seconds, len(payload)),
+            ('grid: montagem (1x por upload)', build_seconds, None),
+            ('grid: trocar de página', page_seconds, len(page_payload)),
+            ('grid: mudar o filtro de etapa', filter_seconds, len(page_payload)),
+            ('grid: ordenar por outra coluna', sort_seconds, len(page_payload)),
+        ]
+        for label, seconds, size in rows:
+            print(f"{n_rows:>10,} {label:<34} {seconds * 1000:>11.1f} {f'{size / 1024:.1f}' if size else '-':>13}")
+
+if __name__ == '__main__':
+    main()
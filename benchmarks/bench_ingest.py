@@ -0,0 +1,83 @@
+"""Tempo de carga e pico de memória: Excel x CSV x Parquet (completo e com projeção de colunas).
+
+Replica a planilha vendas.xlsx `--scale` vezes, grava as versões .xlsx/.csv/.parquet
+num diretório temporário e mede cada leitura em um subprocesso isolado.
+
+    python -m benchmarks.bench_ingest --scale 100
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+import pandas as pd
+
+from data_io import convert, read_table
+from schema import DATE_COLUMNS
+
+SOURCE = 'vendas.xlsx'
+
+# Cada caso roda em um processo novo para que o pico de memória não seja contaminado
+CASES = {
+    'pd.read_excel (original)': "pd.read_excel(path)",
+    'read_table xlsx': "read_table(path)",
+    'read_table csv': "read_table(path)",
+    'read_table parquet': "read_table(path)",
+    'read_table parquet (projeção)': "read_table(path, columns=columns)",
+}
+
+RUNNER = """
+import json, sys, time
+import pandas as pd
+from data_io import read_table
+path, columns, expr = sys.argv[1], json.loads(sys.argv[2]), sys.argv[3]
+def status_mb(key):
+    # VmHWM (pico) é zerado no exec, ao contrário de ru_maxrss, que herda o pico do processo pai
+    with open('/proc/self/status') as f:
+        for line in f:
+            if line.startswith(key + ':'):
+                return int(line.split()[1]) / 1024
+before = status_mb('VmRSS')
+start = time.perf_counter()
+df = eval(expr)
+elapsed = time.perf_counter() - start
+peak = status_mb('VmHWM')
+print(json.dumps({'seconds': elapsed, 'peak_mb': peak - before,
+                  'frame_mb': df.memory_usage(deep=True).sum() / 2**20, 'rows': len(df)}))
+"""
+
+def run_case(path, expr, columns):
+    out = subprocess.run([sys.executable, '-c', RUNNER, path, json.dumps(columns), expr],
+                         capture_output=True, text=True, check=True, cwd=os.getcwd())
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--scale', type=int, default=100)
+    args = parser.parse_args()
+
+    base = pd.read_excel(SOURCE)
+    df = pd.concat([base] * args.scale, ignore_index=True)
+    features = ['ORIGEM', 'ETAPA_ATUAL', 'ESN', 'GSN', 'TIPO_DE_ATUACAO',
+                'PRODUTO_DA_OPORTUNIDADE', 'PRODUTO_SUGERIDO', 'VALOR_SUGERIDO']
+    columns = features + DATE_COLUMNS
+
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = {ext: os.path.join(tmp, f"vendas_x{args.scale}{ext}") for ext in ('.xlsx', '.csv', '.parquet')}
+        print(f"Gerando {len(df):,} linhas ({args.scale}x {SOURCE})...")
+        df.to_excel(paths['.xlsx'], index=False)
+        read_table(paths['.xlsx']).to_csv(paths['.csv'], index=False)
+        convert(paths['.xlsx'], paths['.parquet'])
+
+        print(f"\n{'caso':<32} {'tempo (s)':>10} {'pico RSS (MB)':>14} {'DataFrame (MB)':>15} {'arquivo (MB)':>13}")
+        for name, expr in CASES.items():
+            ext = '.' + name.split()[1] if name.startswith('read_table') else '.xlsx'
+            result = run_case(paths[ext], expr, columns)
+            size = os.path.getsize(paths[ext]) / 2**20
+            print(f"{name:<32} {result['seconds']:>10.2f} {result['peak_mb']:>14.0f} "
+                  f"{result['frame_mb']:>15.1f} {size:>13.1f}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,95 @@
+"""Treino e previsão: OneHotEncoder + GradientBoosting ('gbr') x HistGradientBoosting nativo ('hgb').
+
+Gera uma base sintética já enriquecida (com MUNICIPIO e CNAE_FISCAL de alta
+cardinalidade), separa as oportunidades fechadas por data (as mais recentes ficam
+para validação) e mede cada modelo em um subprocesso isolado: tempo de treino,
+latência de previsão (1 linha e lote), pico de memória e MAE na validação.
+
+    python -m benchmarks.bench_models --rows 20000
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+from benchmarks.synthetic import make_vendas
+from schema import apply_dtypes, normalize_columns
+
+RUNNER = """
+import json, sys, time
+import numpy as np
+import pandas as pd
+from sklearn.metrics import mean_absolute_error
+from model_trainer2 import build_pipeline, prepare_training_data
+from schema import apply_dtypes
+
+path, model_type, holdout = sys.argv[1], sys.argv[2], float(sys.argv[3])
+def status_mb(key):
+    with open('/proc/self/status') as f:
+        for line in f:
+            if line.startswith(key + ':'):
+                return int(line.split()[1]) / 1024
+
+df = apply_dtypes(pd.read_parquet(path))
+X, y, features = prepare_training_data(df)
+# Validação temporal: as vendas mais recentes não entram no treino
+order = np.argsort(df.loc[X.index, 'DATA_DA_VENDA'].to_numpy(), kind='stable')
+cut = int(len(order) * (1 - holdout))
+X_train, y_train = X.iloc[order[:cut]], y.iloc[order[:cut]]
+X_test, y_test = X.iloc[order[cut:]], y.iloc[order[cut:]]
+
+before = status_mb('VmRSS')
+model = build_pipeline(features, model_type)
+start = time.perf_counter()
+model.fit(X_train, y_train)
+fit_s = time.perf_counter() - start
+
+start = time.perf_counter()
+y_pred = model.predict(X_test)
+batch_s = time.perf_counter() - start
+
+row = X_test.iloc[:1]
+model.predict(row)
+times = []
+for _ in range(50):
+    start = time.perf_counter()
+    model.predict(row)
+    times.append(time.perf_counter() - start)
+
+print(json.dumps({'fit_s': fit_s, 'batch_s': batch_s, 'batch_rows': len(X_test),
+                  'row_ms': float(np.median(times)) * 1000, 'peak_mb': status_mb('VmHWM') - before,
+                  'mae': mean_absolute_error(y_test, y_pred), 'train_rows': len(X_train)}))
+"""
+
+def run_model(path, model_type, holdout):
+    out = subprocess.run([sys.executable, '-c', RUNNER, path, model_type, str(holdout)],
+                         capture_output=True, text=True, check=True, cwd=os.getcwd())
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rows', type=int, default=20_000)
+    parser.add_argument('--holdout', type=float, default=0.2, help="Fração das vendas mais recentes usada na validação.")
+    parser.add_argument('--models', nargs='+', default=['gbr', 'hgb'])
+    args = parser.parse_args()
+
+    df = apply_dtypes(normalize_columns(make_vendas(args.rows, enriched=True)), categories=False)
+    print(f"{args.rows:,} oportunidades, {int(df['DATA_DA_VENDA'].notna().sum()):,} fechadas; "
+          f"MUNICIPIO: {df['MUNICIPIO'].nunique()} valores, CNAE_FISCAL: {df['CNAE_FISCAL'].nunique()} valores")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'vendas_enriquecidas.parquet')
+        df.to_parquet(path, index=False)
+
+        print(f"\n{'modelo':<8} {'treino (s)':>11} {'lote (s)':>9} {'1 linha (ms)':>13} "
+              f"{'pico RSS (MB)':>14} {'MAE (dias)':>11}")
+        for model_type in args.models:
+            r = run_model(path, model_type, args.holdout)
+            print(f"{model_type:<8} {r['fit_s']:>11.2f} {r['batch_s']:>9.3f} {r['row_ms']:>13.2f} "
+                  f"{r['peak_mb']:>14.0f} {r['mae']:>11.2f}")
+        print(f"\n(lote = {r['batch_rows']:,} linhas de validação; treino com {r['train_rows']:,} linhas)")
+
+if __name__ == '__main__':
+    main()
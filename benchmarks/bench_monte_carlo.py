@@ -0,0 +1,36 @@
+"""Tempo da projeção de receita por Monte Carlo (projection.simulate_revenue) em um núcleo.
+
+    python -m benchmarks.bench_monte_carlo --deals 50000 --draws 500 1000 10000
+"""
+import argparse
+import time
+
+import numpy as np
+
+from projection import revenue_bands, simulate_revenue
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--deals', type=int, nargs='+', default=[5_000, 50_000])
+    parser.add_argument('--draws', type=int, nargs='+', default=[500, 1_000, 10_000])
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(42)
+    print(f"{'oportunidades':>14} {'cenários':>9} {'sem feeling (s)':>16} {'com feeling (s)':>16} {'ns/amostra':>11}")
+    for n_deals in args.deals:
+        p50 = rng.gamma(2.0, 45.0, size=n_deals) + 1
+        days_quantiles = np.stack([p50 * 0.6, p50, p50 * 1.6])
+        values = rng.lognormal(11.5, 0.6, size=n_deals)
+        feeling = rng.integers(0, 101, size=n_deals).astype(float)
+        for n_draws in args.draws:
+            times = []
+            for weights in (None, feeling):
+                start = time.perf_counter()
+                totals = simulate_revenue(days_quantiles, values, weights, today='2025-01-15', n_draws=n_draws, seed=1)
+                revenue_bands(totals, '2025-01-15')
+                times.append(time.perf_counter() - start)
+            print(f"{n_deals:>14,} {n_draws:>9,} {times[0]:>16.3f} {times[1]:>16.3f} "
+                  f"{max(times) / (n_deals * n_draws) * 1e9:>11.1f}")
+
+if __name__ == '__main__':
+    main()
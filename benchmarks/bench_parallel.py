@@ -0,0 +1,95 @@
+"""Pontuação serial x em paralelo (parallel_scoring.py) com 1, 4, 8 e 16 processos.
+
+Grava uma exportação sintética grande em .parquet (row groups de `--row-group-rows`
+linhas) e pontua o arquivo inteiro, de ponta a ponta (leitura, pré-processamento,
+previsão e gravação), com o modelo entregue com o projeto (compilado):
+
+- serial: `score_cli.score_file`, bloco a bloco, no próprio processo;
+- N processos: `ParallelScorer.score_file`, em que cada processo lê os próprios row
+  groups e grava a sua parte (os processos já estão no ar e com o modelo carregado).
+
+Mostra só valores medidos (mediana de `--repeats`): o tempo total, o tempo de CPU do
+processo principal (distribuir os row groups e anexar as partes à saída) e o tempo de
+CPU somado dos processos. Confere que a saída é idêntica à da pontuação serial. O ganho
+depende dos núcleos livres: com menos núcleos que processos, eles disputam os mesmos
+núcleos e o tempo não cai.
+
+    python -m benchmarks.bench_parallel --rows 1000000 --workers 1 4 8 16
+"""
+import argparse
+import contextlib
+import io
+import os
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.synthetic import make_vendas
+from compiled_model import try_compile
+from data_io import ChunkWriter
+from parallel_scoring import ParallelScorer
+from score_cli import score_file, scoring_columns
+from scoring import FEATURES_PATH, MODEL_PATH, load_model
+
+def write_input(path, n_rows, row_group_rows):
+    df = make_vendas(n_rows)
+    with ChunkWriter(path) as writer:
+        for start in range(0, n_rows, row_group_rows):
+            writer.write(df.iloc[start:start + row_group_rows])
+
+def median_seconds(fn, repeats):
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return float(np.median(times))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rows', type=int, default=1_000_000)
+    parser.add_argument('--row-group-rows', type=int, default=12_500)
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 4, 8, 16])
+    parser.add_argument('--repeats', type=int, default=3)
+    args = parser.parse_args()
+
+    model, features_list = load_model(MODEL_PATH, FEATURES_PATH)
+    model = try_compile(model)
+    columns = scoring_columns(features_list)
+    cores = len(os.sched_getaffinity(0)) if hasattr(os, 'sched_getaffinity') else os.cpu_count()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        input_path = os.path.join(tmp, 'vendas.parquet')
+        write_input(input_path, args.rows, args.row_group_rows)
+        serial_path = os.path.join(tmp, 'serial.parquet')
+        with contextlib.redirect_stdout(io.StringIO()):  # Sem o progresso de cada bloco
+            serial_seconds = median_seconds(
+                lambda: score_file(input_path, serial_path, model, features_list, columns=columns), args.repeats)
+        reference = pd.read_parquet(serial_path)
+        print(f"{args.rows:,} linhas ({len(reference):,} em aberto), row groups de {args.row_group_rows:,} "
+              f"linhas, {cores} núcleo(s) disponível(is)\n")
+        print(f"{'modo':<16} {'tempo (s)':>10} {'CPU principal (s)':>18} {'CPU processos (s)':>18} {'ganho':>7}")
+        print(f"{'serial':<16} {serial_seconds:>10.2f} {serial_seconds:>18.2f} {'-':>18} {'1.0x':>7}")
+
+        for workers in args.workers:
+            output_path = os.path.join(tmp, f"paralelo_{workers}.parquet")
+            with ParallelScorer(MODEL_PATH, FEATURES_PATH, workers=workers) as scorer:
+                scorer.warm_up()
+                scorer.score_file(input_path, output_path, columns=columns)  # Primeira tarefa de cada processo
+                main_seconds, cpu_seconds = [], []
+
+                def run():
+                    scorer.stats.update(main_seconds=0.0, worker_cpu_seconds=0.0)
+                    scorer.score_file(input_path, output_path, columns=columns)
+                    main_seconds.append(scorer.stats['main_seconds'])
+                    cpu_seconds.append(scorer.stats['worker_cpu_seconds'])
+                seconds = median_seconds(run, args.repeats)
+            pd.testing.assert_frame_equal(pd.read_parquet(output_path), reference)
+            print(f"{f'{workers} processo(s)':<16} {seconds:>10.2f} {np.median(main_seconds):>18.2f} "
+                  f"{np.median(cpu_seconds):>18.2f} {serial_seconds / seconds:>6.1f}x")
+    print("\nSaída idêntica à da pontuação serial em todos os casos.")
+
+if __name__ == '__main__':
+    main()
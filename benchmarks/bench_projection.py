@@ -0,0 +1,60 @@
+"""Datas prováveis + projeção mensal: implementação original (apply/timedelta/isin/merge) x projection.forecast.
+
+    python -m benchmarks.bench_projection --sizes 10000 100000 1000000 4000000
+"""
+import argparse
+import time
+from datetime import date, timedelta
+
+import numpy as np
+import pandas as pd
+
+from projection import forecast
+
+TODAY = date(2025, 1, 15)
+
+def original(days, values, today=TODAY):
+    """Cópia do cálculo que ficava em scoring.py e fechamento_app.py."""
+    df = pd.DataFrame({'DIAS_PREVISTOS': days, 'VALOR_SUGERIDO': values})
+    data_atual = pd.to_datetime(today)
+    df['DATA_PROVAVEL_FECHAMENTO'] = df['DIAS_PREVISTOS'].apply(lambda x: data_atual + timedelta(days=int(x)))
+    df['MES_ANO_PROVAVEL'] = df['DATA_PROVAVEL_FECHAMENTO'].dt.to_period('M')
+    projection_df = df.groupby('MES_ANO_PROVAVEL')['VALOR_SUGERIDO'].sum().reset_index()
+    projection_df['MES_ANO_PROVAVEL'] = projection_df['MES_ANO_PROVAVEL'].astype(str)
+    current_month = today.replace(day=1)
+    month_periods_str = [str(pd.Period(current_month + timedelta(days=30*i), freq='M')) for i in range(12)]
+    projection_df_12m = projection_df[projection_df['MES_ANO_PROVAVEL'].isin(month_periods_str)]
+    full_12m_df = pd.DataFrame({'MES_ANO_PROVAVEL': month_periods_str})
+    return pd.merge(full_12m_df, projection_df_12m, on='MES_ANO_PROVAVEL', how='left').fillna(0)
+
+def vectorized(days, values, today=TODAY):
+    return forecast(days, values, today)
+
+def best_of(func, *args, repeat=3):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(*args)
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10_000, 100_000, 1_000_000, 4_000_000])
+    parser.add_argument('--max-original', type=int, default=1_000_000,
+                        help="Maior tamanho medido com a implementação original (lenta).")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(42)
+    print(f"{'oportunidades':>14} {'original (s)':>13} {'vetorizado (s)':>15} {'ns/linha':>9} {'ganho':>7}")
+    for n in args.sizes:
+        days = rng.gamma(2.0, 45.0, size=n).astype(int) + 1
+        values = rng.lognormal(11.5, 0.6, size=n)
+        new = best_of(vectorized, days, values)
+        old = best_of(original, days, values, repeat=1) if n <= args.max_original else None
+        old_txt = f"{old:>13.3f}" if old is not None else f"{'-':>13}"
+        gain = f"{old / new:>6.0f}x" if old is not None else f"{'-':>7}"
+        print(f"{n:>14,} {old_txt} {new:>15.4f} {new / n * 1e9:>9.1f} {gain}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,139 @@
+"""Teste de carga do serviço de previsão (scoring_service.py).
+
+Sobe o serviço em um subprocesso e dispara requisições POST /predict (uma
+oportunidade cada) em malha aberta: as requisições saem no ritmo pedido,
+independentemente de as anteriores já terem respondido. Mede, do lado do cliente,
+a vazão obtida e a latência p50/p99, e lê as métricas do servidor (tamanho médio
+dos lotes). Cada ritmo é medido com e sem micro-lotes (--max-batch 1). No fim,
+confere que as previsões do serviço são idênticas às de predict_closing_days.
+
+    python -m benchmarks.bench_service --rates 100 300 500 --duration 10
+"""
+import argparse
+import asyncio
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+
+import aiohttp
+import numpy as np
+import pandas as pd
+
+from benchmarks.synthetic import make_vendas
+from scoring import load_model, predict_closing_days, preprocess_data
+
+TODAY = '2025-01-15'
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+def open_records(n_rows):
+    """Oportunidades em aberto (sem DATA DA VENDA) como dicionários JSON, com os cabeçalhos originais."""
+    df = make_vendas(n_rows, closed_ratio=0.0)
+    return json.loads(df.to_json(orient='records', date_format='iso', force_ascii=False))
+
+class Service:
+    """Sobe o serviço em um subprocesso; use como context manager."""
+
+    def __init__(self, max_batch):
+        self.port = free_port()
+        self.url = f"http://127.0.0.1:{self.port}"
+        self.args = [sys.executable, 'scoring_service.py', '--port', str(self.port),
+                     '--max-batch', str(max_batch), '--today', TODAY]
+
+    def __enter__(self):
+        self.proc = subprocess.Popen(self.args, cwd=os.getcwd(), stdout=subprocess.DEVNULL)
+        deadline = time.monotonic() + 60
+        while time.monotonic() < deadline:
+            try:
+                with socket.create_connection(('127.0.0.1', self.port), timeout=0.2):
+                    return self
+            except OSError:
+                time.sleep(0.1)
+        self.proc.kill()
+        raise RuntimeError("O serviço não subiu em 60 s.")
+
+    def __exit__(self, *exc):
+        self.proc.terminate()
+        self.proc.wait()
+
+async def run_load(url, records, rate, duration):
+    """Dispara `rate` requisições por segundo durante `duration` segundos; retorna (latências, erros, tempo total)."""
+    latencies, errors = [], 0
+    connector = aiohttp.TCPConnector(limit=0)
+    async with aiohttp.ClientSession(connector=connector) as session:
+        async def one(record):
+            nonlocal errors
+            start = time.perf_counter()
+            try:
+                async with session.post(f"{url}/predict", json=record) as response:
+                    await response.read()
+                    if response.status != 200:
+                        errors += 1
+                        return
+            except aiohttp.ClientError:
+                errors += 1
+                return
+            latencies.append(time.perf_counter() - start)
+
+        # Aquecimento: a primeira previsão paga custos de inicialização
+        await one(records[0])
+        latencies.clear()
+
+        n_requests = int(rate * duration)
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        tasks = []
+        for i in range(n_requests):
+            delay = start + i / rate - loop.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            tasks.append(asyncio.create_task(one(records[i % len(records)])))
+        await asyncio.gather(*tasks)
+        elapsed = loop.time() - start
+        async with session.get(f"{url}/metrics") as response:
+            server = await response.json()
+    return np.array(latencies), errors, elapsed, server
+
+async def fetch_batch(url, records):
+    async with aiohttp.ClientSession() as session:
+        async with session.post(f"{url}/predict/batch", json={'oportunidades': records}) as response:
+            return (await response.json())['previsoes']
+
+def check_predictions(url, records):
+    """As previsões do serviço devem ser iguais às de predict_closing_days sobre o mesmo DataFrame."""
+    model, features = load_model()
+    expected = predict_closing_days(preprocess_data(pd.DataFrame(records), features), model, features, today=TODAY)
+    got = asyncio.run(fetch_batch(url, records))
+    return [p['dias_previstos'] for p in got] == expected['DIAS_PREVISTOS'].tolist()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rates', type=int, nargs='+', default=[100, 300, 500], help="Requisições por segundo.")
+    parser.add_argument('--duration', type=float, default=10.0, help="Duração de cada medição (s).")
+    parser.add_argument('--max-batch', type=int, nargs='+', default=[1, 256],
+                        help="Configurações do serviço (1 = sem micro-lotes).")
+    args = parser.parse_args()
+
+    records = open_records(2_000)
+    print(f"{'max-batch':>9} {'ritmo (req/s)':>14} {'obtido (req/s)':>15} {'p50 (ms)':>9} {'p99 (ms)':>9} "
+          f"{'erros':>6} {'lote médio':>11}")
+    for max_batch in args.max_batch:
+        for rate in args.rates:
+            # Um serviço novo por medição, para que as métricas do servidor sejam só desta carga
+            with Service(max_batch) as service:
+                latencies, errors, elapsed, server = asyncio.run(run_load(service.url, records, rate, args.duration))
+            p50, p99 = np.percentile(latencies, [50, 99]) * 1000 if len(latencies) else (float('nan'),) * 2
+            print(f"{max_batch:>9} {rate:>14} {len(latencies) / elapsed:>15.1f} {p50:>9.1f} {p99:>9.1f} "
+                  f"{errors:>6} {server['avg_batch_rows'] or 0:>11.1f}")
+
+    with Service(max(args.max_batch)) as service:
+        print(f"\nPrevisões do serviço iguais às de predict_closing_days: {check_predictions(service.url, records[:500])}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,39 @@
+"""Modelo de chat falso, local, que imita o LLM usado pelo agente pandas (sem rede e sem chave da API).
+
+Cada pergunta custa duas chamadas, como uma rodada típica do agente 'openai-tools':
+a primeira pede a execução de `query` na ferramenta python_repl_ast e a segunda
+responde com o resultado. `latency` simula o tempo de resposta da API por chamada.
+
+    from langchain_agent import create_agent
+    llm = FakeToolChatModel(latency=0.5)
+    agent = create_agent(df, None, 0.0, llm=llm)
+"""
+import time
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, ToolMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+
+class FakeToolChatModel(BaseChatModel):
+    latency: float = 0.0
+    query: str = "len(df)"
+    calls: int = 0
+
+    @property
+    def _llm_type(self):
+        return 'fake-tool-chat'
+
+    def bind_tools(self, tools, **kwargs):
+        return self
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        self.calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+        last = messages[-1]
+        if isinstance(last, ToolMessage):
+            message = AIMessage(content=f"Resultado da análise: {last.content}")
+        else:
+            message = AIMessage(content='', tool_calls=[
+                {'name': 'python_repl_ast', 'args': {'query': self.query}, 'id': f"call_{self.calls}"}])
+        return ChatResult(generations=[ChatGeneration(message=message)])
@@ -0,0 +1,116 @@
+"""Servidor HTTP local que imita a BrasilAPI (/api/cnpj/v1/<cnpj>) para testes e benchmarks.
+
+Injeta latência e respostas 429 (com Retry-After) de forma configurável. CNPJs
+terminados em '00' respondem 404, para exercitar o caminho de "não encontrado".
+`ok_status` troca o código das respostas com dados (ex: 203, outro 2xx).
+
+Uso isolado:
+    python -m benchmarks.stub_brasilapi --port 8765 --latency 0.05 --error-rate 0.1
+"""
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+def fake_company(cnpj):
+    """Gera um registro determinístico (mesmo CNPJ -> mesma resposta)."""
+    rnd = random.Random(cnpj)
+    return {
+        'cnpj': cnpj,
+        'cnae_fiscal': rnd.choice([6201501, 6202300, 4751201, 4930202, 8599604]),
+        'porte': rnd.choice(['MICRO EMPRESA', 'EMPRESA DE PEQUENO PORTE', 'DEMAIS']),
+        'natureza_juridica': rnd.choice(['Sociedade Empresária Limitada', 'Sociedade Anônima Fechada']),
+        'data_inicio_atividade': f"{rnd.randint(1970, 2023)}-{rnd.randint(1, 12):02d}-{rnd.randint(1, 28):02d}",
+        'situacao_cadastral': rnd.choice([2, 2, 2, 3, 4, 8]),
+        'uf': rnd.choice(['SP', 'RS', 'SC', 'PR', 'MG', 'RJ']),
+        'municipio': rnd.choice(['SAO PAULO', 'PORTO ALEGRE', 'CURITIBA', 'BELO HORIZONTE', '']),
+    }
+
+class StubBrasilAPI:
+    """Sobe o servidor stub numa thread; use como context manager."""
+
+    def __init__(self, host='127.0.0.1', port=0, latency=0.0, error_rate=0.0,
+                 error_status=429, retry_after=None, ok_status=200, seed=0):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.retry_after = retry_after
+        self.ok_status = ok_status
+        self.requests = 0
+        self.errors = 0
+        self._rnd = random.Random(seed)
+        self._lock = threading.Lock()
+        self.server = ThreadingHTTPServer((host, port), self._handler())
+        self.server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}/api/cnpj/v1/"
+
+    def _handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def log_message(self, *args):
+                pass
+
+            def _send(self, status, payload, headers=None):
+                body = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                for key, value in (headers or {}).items():
+                    self.send_header(key, value)
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_GET(self):
+                if stub.latency:
+                    time.sleep(stub.latency)
+                cnpj = self.path.rstrip('/').rsplit('/', 1)[-1]
+                with stub._lock:
+                    stub.requests += 1
+                    inject_error = stub._rnd.random() < stub.error_rate
+                    if inject_error:
+                        stub.errors += 1
+                if inject_error:
+                    headers = {'Retry-After': str(stub.retry_after)} if stub.retry_after is not None else None
+                    self._send(stub.error_status, {'message': 'Too Many Requests'}, headers)
+                elif len(cnpj) != 14 or not cnpj.isdigit():
+                    self._send(400, {'message': 'CNPJ inválido'})
+                elif cnpj.endswith('00'):
+                    self._send(404, {'message': 'CNPJ não encontrado'})
+                else:
+                    self._send(stub.ok_status, fake_company(cnpj))
+
+        return Handler
+
+    def __enter__(self):
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Stub local da BrasilAPI.")
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--latency', type=float, default=0.05)
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--retry-after', type=float, default=None)
+    args = parser.parse_args()
+    with StubBrasilAPI(port=args.port, latency=args.latency, error_rate=args.error_rate,
+                       retry_after=args.retry_after) as stub:
+        print(f"Stub da BrasilAPI em {stub.url} (Ctrl+C para sair)")
+        try:
+            threading.Event().wait()
+        except KeyboardInterrupt:
+            pass
@@ -0,0 +1,414 @@
+"""Suíte de benchmarks do fluxo completo: carga, padronização, enriquecimento, treino, previsão e projeção.
+
+Gera (e guarda em `--data-dir`) uma base sintética com o layout e as cardinalidades
+de vendas.xlsx no tamanho pedido e mede cada etapa em um subprocesso isolado:
+tempo (mediana e mínimo de `--repeat` execuções) e pico de memória (o maior VmHWM,
+zerado logo antes da etapa, descontado o RSS de partida). Os resultados vão para um
+JSON; com `--baseline`, cada etapa é comparada com o JSON de uma execução anterior e
+as regressões acima de `--tolerance` são apontadas (código de saída 1).
+
+Etapas:
+    load-xlsx        pd.read_excel da planilha crua (até `--max-xlsx-rows`)
+    load-csv         pd.read_csv do mesmo conteúdo em CSV
+    normalize        normalize_columns + apply_dtypes sobre o DataFrame cru
+    enrich           enrich_data com cache SQLite pré-aquecido e API simulada (sem rede)
+    fit              build_pipeline(...).fit nas oportunidades fechadas (até `--max-fit-rows`)
+    predict          preprocess_data + predict_days com o Pipeline do scikit-learn
+    predict-compiled o mesmo, com o modelo compilado (compiled_model.py)
+    projection       forecast: datas prováveis e projeção mensal
+
+    python -m benchmarks.suite --rows 1000 100000 --output resultados.json
+    python -m benchmarks.suite --rows 1000 100000 --baseline resultados.json --output novo.json
+"""
+import argparse
+import contextlib
+import cProfile
+import datetime
+import io
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.synthetic import fake_cnpj_records, make_vendas
+
+STAGES = ['load-xlsx', 'load-csv', 'normalize', 'enrich', 'fit', 'predict', 'predict-compiled', 'projection']
+DATA_DIR = os.path.join(tempfile.gettempdir(), 'previsao_benchmarks')
+EXCEL_MAX_ROWS = 1_048_575     # Limite de linhas de uma planilha (sem o cabeçalho)
+MAX_XLSX_ROWS = 100_000        # Gravar a planilha com openpyxl leva ~1 min a cada 100 mil linhas
+MAX_FIT_ROWS = 5_000           # O 'gbr' (300 árvores sobre a matriz one-hot) já leva 1-2 min nesse tamanho em um núcleo
+MODEL_TRAIN_ROWS = 5_000       # Oportunidades fechadas do modelo usado nas etapas de previsão
+ENRICH_MISS_RATIO = 0.1        # CNPJs fora do cache (respondidos pela API simulada) na etapa de enriquecimento
+TOLERANCE = 0.2                # Regressão: tempo ou memória 20% acima da base
+MIN_SECONDS = 0.005            # Diferenças abaixo destes pisos são ruído de medição
+MIN_MB = 5.0
+TODAY = '2025-01-15'
+
+# --- Dados ---
+
+def dataset(data_dir, n_rows, seed, cnpjs_per_row=None):
+    """Base sintética enriquecida em Parquet (gerada uma vez por tamanho/semente)."""
+    n_cnpjs = max(1, int(n_rows * cnpjs_per_row)) if cnpjs_per_row else None
+    path = os.path.join(data_dir, f"vendas_{n_rows}_{seed}_{n_cnpjs or 'padrao'}.parquet")
+    if not os.path.exists(path):
+        os.makedirs(data_dir, exist_ok=True)
+        df = make_vendas(n_rows, n_cnpjs=n_cnpjs, enriched=True, seed=seed)
+        df.to_parquet(path + '.tmp', index=False)
+        os.replace(path + '.tmp', path)
+    return path
+
+def raw_frame(parquet_path):
+    """A planilha como chega do CRM: cabeçalhos originais, sem as colunas da BrasilAPI."""
+    from cnpj_enrichment import ENRICHMENT_COLUMNS
+
+    df = pd.read_parquet(parquet_path)
+    return df.drop(columns=[col for col in ENRICHMENT_COLUMNS if col in df.columns])
+
+def raw_file(parquet_path, ext):
+    """Grava (uma vez) a versão .xlsx ou .csv da planilha crua ao lado do Parquet."""
+    path = parquet_path.replace('.parquet', f"_crua{ext}")
+    if not os.path.exists(path):
+        df = raw_frame(parquet_path)
+        tmp = path + '.tmp' + ext
+        if ext == '.csv':
+            df.to_csv(tmp, index=False)
+        else:
+            df.to_excel(tmp, index=False)
+        os.replace(tmp, path)
+    return path
+
+def trained_model(data_dir, model_type, seed):
+    """(modelo, features) treinado em MODEL_TRAIN_ROWS oportunidades sintéticas, guardado em disco."""
+    import joblib
+
+    path = os.path.join(data_dir, f"modelo_{model_type}_{MODEL_TRAIN_ROWS}_{seed}.pkl")
+    if not os.path.exists(path):
+        from model_trainer2 import build_pipeline, prepare_training_data
+        from schema import apply_dtypes, normalize_columns
+
+        train = apply_dtypes(normalize_columns(make_vendas(2 * MODEL_TRAIN_ROWS, enriched=True, seed=seed + 1)))
+        X, y, features = prepare_training_data(train)
+        model = build_pipeline(features, model_type).fit(X, y)
+        joblib.dump((model, features), path + '.tmp')
+        os.replace(path + '.tmp', path)
+    return joblib.load(path)
+
+# --- Etapas ---
+#
+# Cada etapa é um par (prepare, run). `prepare` monta as entradas uma vez e devolve
+# `run`, que recebe uma cópia nova das entradas a cada repetição; só `run` é medido.
+
+class StubFetcher:
+    """Substitui o CnpjFetcher: responde na hora com registros sintéticos."""
+
+    def __init__(self):
+        self.failed = set()
+        self.calls = 0
+
+    def fetch_many(self, cnpjs):
+        self.calls += len(cnpjs)
+        return fake_cnpj_records(cnpjs)
+
+def prepare_load(config, ext):
+    from data_io import file_format
+
+    path = raw_file(config['parquet'], ext)
+    reader = pd.read_excel if file_format(path) == '.xlsx' else pd.read_csv
+    return (lambda: path), lambda path: {'columns': reader(path).shape[1]}
+
+def prepare_normalize(config):
+    from schema import apply_dtypes, normalize_columns
+
+    raw = raw_frame(config['parquet'])
+    return raw.copy, lambda df: {'frame_mb': round(apply_dtypes(normalize_columns(df)).memory_usage(deep=True).sum()
+                                                  / 2**20, 1)}
+
+def prepare_enrich(config):
+    from cnpj_cache import CnpjCache
+    from cnpj_enrichment import clean_cnpj, enrich_data
+    from data_io import read_table
+
+    df = read_table(raw_file(config['parquet'], '.csv'))
+    cnpjs = df['CNPJ'].dropna().map(clean_cnpj).dropna().unique()
+    rng = np.random.default_rng(config['seed'])
+    cached = cnpjs[rng.random(len(cnpjs)) >= config['enrich_miss_ratio']]
+    warm = os.path.join(config['workdir'], 'cnpj_cache_base.sqlite')
+    with CnpjCache(warm) as cache:
+        cache.put_many(fake_cnpj_records(cached))
+    cache_path = os.path.join(config['workdir'], 'cnpj_cache.sqlite')
+
+    def fresh():
+        # Cada repetição parte do mesmo cache (o enrich_data grava nele os CNPJs consultados)
+        shutil.copyfile(warm, cache_path)
+        return df.copy()
+
+    def run(frame):
+        fetcher = StubFetcher()
+        with CnpjCache(cache_path) as cache:
+            enrich_data(frame, fetcher=fetcher, cache=cache)
+        return {'cnpjs': len(cnpjs), 'api_calls': fetcher.calls}
+    return fresh, run
+
+def prepare_fit(config):
+    from model_trainer2 import build_pipeline, prepare_training_data
+    from schema import apply_dtypes, normalize_columns
+
+    X, y, features = prepare_training_data(apply_dtypes(normalize_columns(pd.read_parquet(config['parquet']))))
+    X, y = X.iloc[-config['max_fit_rows']:], y.iloc[-config['max_fit_rows']:]
+
+    def run(_):
+        build_pipeline(features, config['model_type']).fit(X, y)
+        return {'fit_rows': len(X), 'model_type': config['model_type']}
+    return (lambda: None), run
+
+def prepare_predict(config, compiled=False):
+    from compiled_model import try_compile
+    from scoring import predict_days, preprocess_data
+
+    model, features = trained_model(config['data_dir'], config['model_type'], config['seed'])
+    if compiled:
+        model = try_compile(model)
+    df = pd.read_parquet(config['parquet'])
+    df['DATA DA VENDA'] = pd.NaT  # Todas em aberto: o número de previsões é igual ao de linhas
+
+    def run(frame):
+        days = predict_days(preprocess_data(frame, features), model, features)
+        return {'predictions': len(days), 'model': type(model).__name__}
+    return df.copy, run
+
+def prepare_projection(config):
+    from projection import forecast
+
+    rng = np.random.default_rng(config['seed'])
+    n_rows = config['rows']
+    days = rng.integers(1, 400, size=n_rows)
+    values = pd.Series(rng.lognormal(11.5, 0.6, size=n_rows).astype(np.float32))
+    return (lambda: (days, values)), lambda args: {'months': len(forecast(*args, today=TODAY)[1])}
+
+PREPARE = {
+    'load-xlsx': lambda config: prepare_load(config, '.xlsx'),
+    'load-csv': lambda config: prepare_load(config, '.csv'),
+    'normalize': prepare_normalize,
+    'enrich': prepare_enrich,
+    'fit': prepare_fit,
+    'predict': prepare_predict,
+    'predict-compiled': lambda config: prepare_predict(config, compiled=True),
+    'projection': prepare_projection,
+}
+
+def skip_reason(stage, n_rows, args):
+    if stage == 'load-xlsx' and n_rows > min(args.max_xlsx_rows, EXCEL_MAX_ROWS):
+        return f"acima de --max-xlsx-rows ({args.max_xlsx_rows:,})"
+    return None
+
+# --- Medição (subprocesso) ---
+
+def status_mb(key):
+    with open('/proc/self/status') as f:
+        for line in f:
+            if line.startswith(key + ':'):
+                return int(line.split()[1]) / 1024
+    return float('nan')
+
+def reset_peak():
+    """Zera o VmHWM (pico de RSS) do processo; retorna False se o kernel não permitir."""
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+        return True
+    except OSError:
+        return False
+
+def measure(config):
+    """Executa uma etapa `repeat` vezes e retorna tempo e pico de memória."""
+    fresh, run = PREPARE[config['stage']](config)
+    times, peaks, extra = [], [], {}
+    for _ in range(config['repeat']):
+        inputs = fresh()
+        before = status_mb('VmRSS')
+        exact_peak = reset_peak()
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            extra = run(inputs)
+        times.append(time.perf_counter() - start)
+        # Sem o reset, o VmHWM inclui a preparação: o valor é só um limite superior. Nas repetições
+        # seguintes o alocador reaproveita a memória já liberada, por isso vale o maior pico
+        peaks.append(status_mb('VmHWM') - before)
+        del inputs
+    if config['profile']:
+        inputs = fresh()
+        profiler = cProfile.Profile()
+        with contextlib.redirect_stdout(io.StringIO()):
+            profiler.runcall(run, inputs)
+        os.makedirs(config['profile'], exist_ok=True)
+        profiler.dump_stats(os.path.join(config['profile'], f"{config['stage']}_{config['rows']}.prof"))
+    return {'stage': config['stage'], 'rows': config['rows'], 'seconds': float(np.median(times)),
+            'seconds_min': min(times), 'peak_mb': round(max(peaks), 1), 'repeat': config['repeat'],
+            'exact_peak': exact_peak, 'extra': extra}
+
+def run_stage(config):
+    """Roda `measure` em um processo novo, para que o pico de memória seja só desta etapa.
+
+    Se a etapa falhar (ex: MemoryError), o resultado traz `error` com a última linha do erro.
+    """
+    out = subprocess.run([sys.executable, '-m', 'benchmarks.suite', '--worker', json.dumps(config)],
+                         capture_output=True, text=True, cwd=os.getcwd())
+    if out.returncode != 0:
+        lines = out.stderr.strip().splitlines() or [f"código de saída {out.returncode}"]
+        return {'stage': config['stage'], 'rows': config['rows'], 'seconds': None, 'seconds_min': None,
+                'peak_mb': None, 'repeat': config['repeat'], 'error': lines[-1], 'extra': {}}
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+# --- Resultados ---
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def metadata(args):
+    import sklearn
+
+    return {
+        'created_at': datetime.datetime.now().isoformat(timespec='seconds'),
+        'git_commit': git_commit(),
+        'python': platform.python_version(),
+        'pandas': pd.__version__,
+        'numpy': np.__version__,
+        'sklearn': sklearn.__version__,
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+        'seed': args.seed,
+        'model_type': args.model_type,
+        'repeat': args.repeat,
+    }
+
+def compare(results, baseline, tolerance=TOLERANCE):
+    """Compara cada (etapa, linhas) com a base; retorna as linhas da tabela e o número de regressões."""
+    base = {(r['stage'], r['rows']): r for r in baseline['results']}
+    rows, regressions = [], 0
+    for result in results:
+        old = base.get((result['stage'], result['rows']))
+        if old is None:
+            rows.append((result, None, None, 'novo'))
+            continue
+        if result.get('error') or old.get('error'):
+            # Etapa que passou a falhar é regressão; a que voltou a funcionar, não
+            failed = bool(result.get('error'))
+            regressions += failed and not old.get('error')
+            rows.append((result, None, None, f"FALHOU: {result['error']}" if failed else 'corrigida'))
+            continue
+        time_ratio = result['seconds'] / old['seconds'] if old['seconds'] else float('inf')
+        mem_ratio = result['peak_mb'] / old['peak_mb'] if old['peak_mb'] > 0 else float('nan')
+        slower = (result['seconds'] > old['seconds'] * (1 + tolerance)
+                  and result['seconds'] - old['seconds'] > MIN_SECONDS)
+        bigger = (result['peak_mb'] > old['peak_mb'] * (1 + tolerance)
+                  and result['peak_mb'] - old['peak_mb'] > MIN_MB)
+        flags = [name for name, hit in (('tempo', slower), ('memória', bigger)) if hit]
+        regressions += bool(flags)
+        rows.append((result, time_ratio, mem_ratio, 'REGRESSÃO: ' + ', '.join(flags) if flags else 'ok'))
+    return rows, regressions
+
+def print_results(results):
+    print(f"{'etapa':<17} {'linhas':>10} {'mediana (s)':>12} {'mínimo (s)':>11} {'pico (MB)':>10}  detalhes")
+    for r in results:
+        if r.get('error'):
+            print(f"{r['stage']:<17} {r['rows']:>10,} {'-':>12} {'-':>11} {'-':>10}  FALHOU: {r['error']}")
+            continue
+        details = ', '.join(f"{k}={v}" for k, v in r['extra'].items())
+        print(f"{r['stage']:<17} {r['rows']:>10,} {r['seconds']:>12.4f} {r['seconds_min']:>11.4f} "
+              f"{r['peak_mb']:>10.1f}  {details}")
+
+def print_comparison(rows):
+    print(f"{'etapa':<17} {'linhas':>10} {'tempo (s)':>10} {'x base':>7} {'pico (MB)':>10} {'x base':>7}  situação")
+    for result, time_ratio, mem_ratio, status in rows:
+        ratios = (f"{time_ratio:>7.2f}", f"{mem_ratio:>7.2f}") if time_ratio is not None else (f"{'-':>7}",) * 2
+        seconds, peak = ((f"{result['seconds']:>10.4f}", f"{result['peak_mb']:>10.1f}") if not result.get('error')
+                         else (f"{'-':>10}",) * 2)
+        print(f"{result['stage']:<17} {result['rows']:>10,} {seconds} {ratios[0]} {peak} {ratios[1]}  {status}")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, nargs='+', default=[1_000, 10_000, 100_000],
+                        help="Tamanhos da base sintética (ex: 1000 100000 5000000).")
+    parser.add_argument('--stages', nargs='+', choices=STAGES, default=STAGES)
+    parser.add_argument('--repeat', type=int, default=3, help="Execuções medidas por etapa (vale a mediana).")
+    parser.add_argument('--output', default='benchmark_results.json', help="JSON com os resultados desta execução.")
+    parser.add_argument('--baseline', default=None, help="JSON de uma execução anterior para comparar.")
+    parser.add_argument('--tolerance', type=float, default=TOLERANCE,
+                        help="Aumento relativo de tempo ou memória tolerado antes de apontar regressão.")
+    parser.add_argument('--data-dir', default=DATA_DIR, help="Onde guardar as bases geradas (reaproveitadas).")
+    parser.add_argument('--model-type', default='gbr', choices=['gbr', 'hgb'])
+    parser.add_argument('--max-fit-rows', type=int, default=MAX_FIT_ROWS,
+                        help="Oportunidades fechadas usadas no treino (as mais recentes).")
+    parser.add_argument('--max-xlsx-rows', type=int, default=MAX_XLSX_ROWS,
+                        help="Acima disso a etapa load-xlsx é pulada (gravar a planilha é lento).")
+    parser.add_argument('--cnpjs-per-row', type=float, default=None,
+                        help="CNPJs distintos por oportunidade (padrão: 0,1; vendas.xlsx tem 1,0).")
+    parser.add_argument('--enrich-miss-ratio', type=float, default=ENRICH_MISS_RATIO,
+                        help="Fração dos CNPJs ausentes do cache (respondidos pela API simulada).")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--profile', default=None, help="Diretório para gravar um cProfile (.prof) de cada etapa.")
+    parser.add_argument('--worker', default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.worker:
+        print(json.dumps(measure(json.loads(args.worker))))
+        return 0
+
+    baseline = None
+    if args.baseline:
+        # Lida antes das medições, para não descobrir um caminho errado só no fim
+        with open(args.baseline, encoding='utf-8') as f:
+            baseline = json.load(f)
+
+    results = []
+    with tempfile.TemporaryDirectory() as workdir:
+        for n_rows in args.rows:
+            print(f"Gerando base sintética de {n_rows:,} linhas...", flush=True)
+            parquet = dataset(args.data_dir, n_rows, args.seed, args.cnpjs_per_row)
+            for stage in args.stages:
+                reason = skip_reason(stage, n_rows, args)
+                if reason:
+                    print(f"  {stage}: pulada ({reason})")
+                    continue
+                config = {'stage': stage, 'rows': n_rows, 'parquet': parquet, 'data_dir': args.data_dir,
+                          'workdir': workdir, 'seed': args.seed, 'repeat': args.repeat,
+                          'model_type': args.model_type, 'max_fit_rows': args.max_fit_rows,
+                          'enrich_miss_ratio': args.enrich_miss_ratio, 'profile': args.profile}
+                result = run_stage(config)
+                if result.get('error'):
+                    print(f"  {stage}: FALHOU ({result['error']})", flush=True)
+                else:
+                    print(f"  {stage}: {result['seconds']:.4f} s, pico {result['peak_mb']:.1f} MB", flush=True)
+                results.append(result)
+
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump({'metadata': metadata(args), 'results': results}, f, indent=2, ensure_ascii=False)
+    print(f"\nResultados salvos em: {args.output}\n")
+
+    if baseline is None:
+        print_results(results)
+        return 0
+
+    rows, regressions = compare(results, baseline, args.tolerance)
+    print(f"Base: {args.baseline} (commit {baseline['metadata'].get('git_commit')}, "
+          f"{baseline['metadata'].get('created_at')})")
+    print_comparison(rows)
+    if regressions:
+        print(f"\n{regressions} etapa(s) com regressão acima de {args.tolerance:.0%}.")
+        return 1
+    print(f"\nNenhuma regressão acima de {args.tolerance:.0%}.")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,103 @@
+"""Gerador de dados sintéticos com o mesmo layout de colunas da planilha vendas.xlsx."""
+import numpy as np
+import pandas as pd
+
+ORIGENS = ['Indicação ESN', 'Prospecção ESN', 'RD MKT', 'Parceiro', 'Evento', 'Site']
+ETAPAS = ['Qualificação', 'Diagnóstico', 'Proposta', 'Negociação', 'Fechamento',
+          'Ganho', 'Perdido', 'Suspenso', 'Contrato']
+ESNS = ['Marcelo', 'Carlos', 'Ana', 'Juliana', 'Roberto', 'Paulo', 'Fernanda', 'Lucas', 'Bruna']
+GSNS = ['Fabiano', 'Renata', 'Sérgio']
+TIPOS_ATUACAO = ['Base', 'RD', 'Novo Cliente', 'Upsell']
+PRODUTOS_OPORTUNIDADE = ['Gestão Backoffice', 'Gestão Comercial']
+PRODUTOS_SUGERIDOS = ['Implantação', 'Licença', 'Serviços']
+
+def random_cnpjs(n, rng):
+    """CNPJs formatados (xx.xxx.xxx/xxxx-xx) pseudoaleatórios."""
+    digits = rng.integers(0, 10**14, size=n, dtype=np.int64)
+    raw = pd.Series(digits).astype(str).str.zfill(14)
+    return (raw.str[:2] + '.' + raw.str[2:5] + '.' + raw.str[5:8] + '/' +
+            raw.str[8:12] + '-' + raw.str[12:]).to_numpy()
+
+def make_vendas(n_rows, n_cnpjs=None, closed_ratio=0.5, enriched=False, n_municipios=2000,
+                n_cnaes=600, seed=42):
+    """Gera `n_rows` oportunidades com os cabeçalhos originais (com espaços e acentos).
+
+    `n_cnpjs` controla quantos clientes distintos existem (padrão: uma empresa a cada
+    10 oportunidades). Com `enriched=True` as colunas da BrasilAPI também são geradas,
+    com as cardinalidades de `n_municipios` e `n_cnaes`. Os dias até o fechamento
+    dependem da etapa, do produto, do vendedor e do valor, para que os modelos
+    tenham algum sinal a aprender.
+    """
+    rng = np.random.default_rng(seed)
+    n_cnpjs = n_cnpjs or max(1, n_rows // 10)
+    cnpjs = random_cnpjs(n_cnpjs, rng)
+    client = rng.integers(0, n_cnpjs, size=n_rows)
+
+    etapa = rng.integers(0, len(ETAPAS), size=n_rows)
+    esn = rng.integers(0, len(ESNS), size=n_rows)
+    produto = rng.integers(0, len(PRODUTOS_SUGERIDOS), size=n_rows)
+    valor = np.round(rng.lognormal(mean=11.5, sigma=0.6, size=n_rows), 2)
+
+    ciclo = pd.Timestamp('2023-01-01') + pd.to_timedelta(rng.integers(0, 900, size=n_rows), unit='D')
+    media = 20 + 12 * etapa + 25 * produto + 4 * esn + 15 * np.log(valor / 1e5).clip(0)
+    dias = (media * rng.gamma(shape=8.0, scale=1 / 8.0, size=n_rows)).astype(int) + 1
+    closed = rng.random(n_rows) < closed_ratio
+    venda = pd.Series(ciclo + pd.to_timedelta(dias, unit='D')).where(closed)
+
+    df = pd.DataFrame({
+        'ID': rng.integers(10**7, 10**8, size=n_rows),
+        'NOME DA OPORTUNIDADE': [f"Oportunidade - {i}" for i in range(n_rows)],
+        'ORIGEM': rng.choice(ORIGENS, size=n_rows),
+        'NOME DO CLIENTE': [f"Empresa {c}" for c in client],
+        'CNPJ': cnpjs[client],
+        'ETAPA ATUAL': np.asarray(ETAPAS, dtype=object)[etapa],
+        'ESN': np.asarray(ESNS, dtype=object)[esn],
+        'GSN': rng.choice(GSNS, size=n_rows),
+        'TIPO DE ATUAÇÃO': rng.choice(TIPOS_ATUACAO, size=n_rows),
+        'FEELING FECHAMENTO': rng.integers(0, 101, size=n_rows).astype(float),
+        'PREVISÃO DE FECHAMENTO': ciclo + pd.to_timedelta(rng.integers(10, 365, size=n_rows), unit='D'),
+        'PRODUTO DA OPORTUNIDADE': rng.choice(PRODUTOS_OPORTUNIDADE, size=n_rows),
+        'PRODUTO SUGERIDO': np.asarray(PRODUTOS_SUGERIDOS, dtype=object)[produto],
+        'VALOR SUGERIDO': valor,
+        'PRODUTO VENDIDO': np.where(closed, 'Implantação', None),
+        'VALOR VENDIDO': np.where(closed, valor, np.nan),
+        'DATA CICLO DE BUSCA': ciclo,
+        'DATA DA VENDA': venda.to_numpy(),
+        'NRO PROPOSTA': rng.integers(10**5, 10**6, size=n_rows).astype(float),
+    })
+
+    if enriched:
+        # Atributos por empresa (todas as oportunidades do mesmo CNPJ compartilham os valores)
+        municipio = rng.zipf(1.3, size=n_cnpjs) % n_municipios
+        df['CNAE_FISCAL'] = (1000000 + rng.integers(0, n_cnaes, size=n_cnpjs) * 37)[client]
+        df['PORTE'] = rng.choice(['MICRO EMPRESA', 'EMPRESA DE PEQUENO PORTE', 'DEMAIS'], size=n_cnpjs)[client]
+        df['NATUREZA_JURIDICA'] = rng.choice(['Sociedade Empresária Limitada', 'Sociedade Anônima Fechada',
+                                              'Empresário Individual'], size=n_cnpjs)[client]
+        df['DATA_INICIO_ATIVIDADE'] = None
+        df['SITUACAO_CADASTRAL'] = rng.choice([2, 3, 4, 8], p=[0.85, 0.05, 0.05, 0.05], size=n_cnpjs)[client]
+        df['UF'] = rng.choice(['SP', 'RS', 'SC', 'PR', 'MG', 'RJ', 'BA', 'PE'], size=n_cnpjs)[client]
+        df['MUNICIPIO'] = np.char.add('MUNICIPIO ', municipio.astype(str))[client]
+    return df
+
+def fake_cnpj_records(cnpjs, seed=42):
+    """Registros de enriquecimento no formato de `get_cnpj_data`, sem acesso à rede."""
+    rng = np.random.default_rng(seed)
+    n = len(cnpjs)
+    cnae = rng.choice([6201501, 6202300, 4751201, 4930202, 8599604], size=n)
+    porte = rng.choice(['MICRO EMPRESA', 'EMPRESA DE PEQUENO PORTE', 'DEMAIS'], size=n)
+    natureza = rng.choice(['Sociedade Empresária Limitada', 'Sociedade Anônima Fechada'], size=n)
+    situacao = rng.choice([2, 3, 4, 8], size=n)
+    uf = rng.choice(['SP', 'RS', 'SC', 'PR', 'MG', 'RJ'], size=n)
+    municipio = rng.choice(['SAO PAULO', 'PORTO ALEGRE', 'CURITIBA', 'BELO HORIZONTE', ''], size=n)
+    return {
+        cnpj: {
+            'CNAE_FISCAL': int(cnae[i]),
+            'PORTE': str(porte[i]),
+            'NATUREZA_JURIDICA': str(natureza[i]),
+            'DATA_INICIO_ATIVIDADE': None,
+            'SITUACAO_CADASTRAL': int(situacao[i]),
+            'UF': str(uf[i]),
+            'MUNICIPIO': str(municipio[i]),
+        }
+        for i, cnpj in enumerate(cnpjs)
+    }
@@ -0,0 +1,142 @@
+import argparse
+import json
+import os
+import sqlite3
+import time
+
+import pandas as pd
+
+from cnpj_enrichment import CNPJ_COLUMN, ENRICHMENT_COLUMNS, clean_cnpj
+
+# --- Variáveis de Configuração ---
+CACHE_PATH = 'cnpj_cache.sqlite'
+TTL_DAYS = 30          # Dados cadastrais (ex: SITUACAO_CADASTRAL) são renovados mensalmente
+NEGATIVE_TTL_DAYS = 3  # CNPJs não encontrados (404/400) são consultados de novo mais cedo
+
+DAY = 86400.0
+
+class CnpjCache:
+    """Cache persistente (SQLite) das consultas à BrasilAPI, indexado pelo CNPJ limpo.
+
+    Cada entrada guarda o instante da consulta. Registros encontrados expiram após
+    `ttl_days` e resultados negativos (CNPJ não encontrado, gravados como NULL)
+    após `negative_ttl_days`. Entradas expiradas são tratadas como ausentes.
+    """
+
+    def __init__(self, path=CACHE_PATH, ttl_days=TTL_DAYS, negative_ttl_days=NEGATIVE_TTL_DAYS,
+                 clock=time.time):
+        self.path = path
+        self.ttl = ttl_days * DAY
+        self.negative_ttl = negative_ttl_days * DAY
+        self._clock = clock
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS cnpj_cache ("
+            " cnpj TEXT PRIMARY KEY,"
+            " data TEXT,"
+            " fetched_at REAL NOT NULL)"
+        )
+        self.conn.commit()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self.conn.close()
+
+    def __len__(self):
+        return self.conn.execute("SELECT COUNT(*) FROM cnpj_cache").fetchone()[0]
+
+    def get_many(self, cnpjs):
+        """Retorna {cnpj: dados ou None} apenas para as entradas ainda válidas."""
+        now = self._clock()
+        found = {}
+        cnpjs = list(cnpjs)
+        # Consulta em lotes para respeitar o limite de parâmetros do SQLite
+        for start in range(0, len(cnpjs), 500):
+            batch = cnpjs[start:start + 500]
+            placeholders = ','.join('?' * len(batch))
+            rows = self.conn.execute(
+                f"SELECT cnpj, data, fetched_at FROM cnpj_cache WHERE cnpj IN ({placeholders})", batch
+            )
+            for cnpj, data, fetched_at in rows:
+                ttl = self.ttl if data is not None else self.negative_ttl
+                if now - fetched_at < ttl:
+                    found[cnpj] = json.loads(data) if data is not None else None
+        return found
+
+    def put_many(self, records, fetched_at=None):
+        """Grava {cnpj: dados ou None}. Não sobrescreve entradas mais recentes."""
+        fetched_at = self._clock() if fetched_at is None else fetched_at
+        rows = [
+            (cnpj, json.dumps(data) if data is not None else None, fetched_at)
+            for cnpj, data in records.items() if cnpj
+        ]
+        self.conn.executemany(
+            "INSERT INTO cnpj_cache (cnpj, data, fetched_at) VALUES (?, ?, ?) "
+            "ON CONFLICT(cnpj) DO UPDATE SET data = excluded.data, fetched_at = excluded.fetched_at "
+            "WHERE excluded.fetched_at >= cnpj_cache.fetched_at",
+            rows,
+        )
+        self.conn.commit()
+        return len(rows)
+
+    def purge_expired(self):
+        """Remove entradas vencidas e retorna quantas foram apagadas."""
+        now = self._clock()
+        cursor = self.conn.execute(
+            "DELETE FROM cnpj_cache WHERE (data IS NOT NULL AND fetched_at < ?) "
+            "OR (data IS NULL AND fetched_at < ?)",
+            (now - self.ttl, now - self.negative_ttl),
+        )
+        self.conn.commit()
+        return cursor.rowcount
+
+    def warm_from_csv(self, csv_path, fetched_at=None):
+        """Carrega em lote os CNPJs já enriquecidos de um CSV (ex: vendas_enriquecidas.csv).
+
+        Por padrão a data de consulta é a data de modificação do arquivo, para que o
+        TTL reflita a idade real dos dados.
+        """
+        fetched_at = os.path.getmtime(csv_path) if fetched_at is None else fetched_at
+        df = pd.read_csv(csv_path, usecols=lambda c: c in [CNPJ_COLUMN] + ENRICHMENT_COLUMNS)
+        df['CNPJ_CLEAN'] = df[CNPJ_COLUMN].apply(clean_cnpj)
+        df = df[df['CNPJ_CLEAN'].notna() & df['CNAE_FISCAL'].notna()]
+        df = df.drop_duplicates('CNPJ_CLEAN', keep='last')
+
+        records = {}
+        columns = [col for col in ENRICHMENT_COLUMNS if col in df.columns]
+        for row in df[['CNPJ_CLEAN'] + columns].itertuples(index=False):
+            records[row[0]] = {col: _to_json_value(value) for col, value in zip(columns, row[1:])}
+        return self.put_many(records, fetched_at=fetched_at)
+
+def _to_json_value(value):
+    """Converte valores lidos do CSV (NaN, float inteiro, tipos numpy) para JSON."""
+    if pd.isna(value):
+        return None
+    if hasattr(value, 'item'):
+        value = value.item()
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    return value
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Manutenção do cache persistente de CNPJs.")
+    parser.add_argument('--path', default=CACHE_PATH, help="Arquivo SQLite do cache.")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    warm = subparsers.add_parser('warm', help="Aquece o cache a partir de um CSV enriquecido.")
+    warm.add_argument('csv_path', nargs='?', default='vendas_enriquecidas.csv')
+    subparsers.add_parser('purge', help="Remove as entradas expiradas.")
+    subparsers.add_parser('stats', help="Mostra o número de entradas.")
+    args = parser.parse_args()
+
+    with CnpjCache(args.path) as cache:
+        if args.command == 'warm':
+            print(f"{cache.warm_from_csv(args.csv_path)} CNPJs carregados de {args.csv_path}.")
+        elif args.command == 'purge':
+            print(f"{cache.purge_expired()} entradas expiradas removidas.")
+        print(f"Entradas no cache: {len(cache)}")
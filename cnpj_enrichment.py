@@ -0,0 +1,352 @@
+import random
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import numpy as np
+import pandas as pd
+import requests
+from requests.adapters import HTTPAdapter
+
+# --- Variáveis de Configuração ---
+API_URL = "https://brasilapi.com.br/api/cnpj/v1/"
+ENRICHMENT_COLUMNS = [
+    'CNAE_FISCAL', 'PORTE', 'NATUREZA_JURIDICA',
+    'DATA_INICIO_ATIVIDADE', 'SITUACAO_CADASTRAL', 'UF', 'MUNICIPIO'
+]
+CNPJ_COLUMN = 'CNPJ'
+
+# Códigos HTTP que indicam sobrecarga temporária da API (vale a pena tentar novamente)
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+
+# --- Funções de Enriquecimento ---
+
+def clean_cnpj(cnpj):
+    """Remove formatação do CNPJ, deixando apenas números."""
+    if pd.isna(cnpj):
+        return None
+    cleaned = re.sub(r'[^0-9]', '', str(cnpj))
+    return cleaned if len(cleaned) == 14 else None
+
+def extract_cnpj_fields(data):
+    """Extrai do JSON da BrasilAPI os campos usados no enriquecimento."""
+    return {
+        'CNAE_FISCAL': data.get('cnae_fiscal'),
+        'PORTE': data.get('porte'),
+        'NATUREZA_JURIDICA': data.get('natureza_juridica'),
+        'DATA_INICIO_ATIVIDADE': data.get('data_inicio_atividade'),
+        'SITUACAO_CADASTRAL': data.get('situacao_cadastral'),
+        'UF': data.get('uf'),
+        'MUNICIPIO': data.get('municipio')
+    }
+
+def get_cnpj_data(cnpj_clean, api_url=API_URL):
+    """Consulta a API BrasilAPI para obter dados do CNPJ."""
+    if not cnpj_clean or len(cnpj_clean) != 14:
+        return None
+
+    url = f"{api_url}{cnpj_clean}"
+    try:
+        response = requests.get(url, timeout=30)
+
+        if response.status_code == 404:
+            print(f"CNPJ {cnpj_clean} não encontrado (404).")
+            return None
+
+        if response.status_code == 400:
+            print(f"CNPJ {cnpj_clean} inválido ou não encontrado (400).")
+            return None
+
+        if response.status_code == 429:
+            # Se for 429, levanta exceção para que o loop principal possa lidar com o erro
+            response.raise_for_status()
+
+        response.raise_for_status() # Levanta exceção para códigos de status HTTP ruins (4xx ou 5xx)
+        data = response.json()
+        print(f"Dados do CNPJ {cnpj_clean} obtidos com sucesso.")
+
+        # Extrair os campos desejados
+        return extract_cnpj_fields(data)
+    except requests.exceptions.HTTPError as e:
+        # Captura erros HTTP que não são 404 (já tratado)
+        print(f"Erro HTTP ao consultar API para CNPJ {cnpj_clean}: {e}")
+        return None
+    except requests.exceptions.RequestException as e:
+        # Captura outros erros de requisição (timeout, conexão, etc.)
+        print(f"Erro de requisição ao consultar API para CNPJ {cnpj_clean}: {e}")
+        return None
+    except Exception as e:
+        # Captura erros inesperados (ex: erro ao processar JSON)
+        print(f"Erro inesperado ao processar dados do CNPJ {cnpj_clean}: {e}")
+        return None
+
+# --- Motor de Consulta Concorrente ---
+
+class TokenBucket:
+    """Limitador de taxa (token bucket) compartilhado entre as threads de consulta.
+
+    `rate` é o número de requisições liberadas por segundo e `capacity` o tamanho
+    máximo da rajada. `pause` bloqueia todas as threads (usado quando a API
+    responde 429 com Retry-After).
+    """
+
+    def __init__(self, rate, capacity=None, clock=time.monotonic, sleep=time.sleep):
+        if rate <= 0:
+            raise ValueError("O parâmetro 'rate' deve ser maior que zero.")
+        self.rate = float(rate)
+        self.capacity = float(capacity if capacity is not None else max(1.0, rate))
+        self._tokens = self.capacity
+        self._clock = clock
+        self._sleep = sleep
+        self._last = clock()
+        self._blocked_until = 0.0
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Bloqueia até haver um token disponível e o consome."""
+        while True:
+            with self._lock:
+                now = self._clock()
+                self._tokens = min(self.capacity, self._tokens + (now - self._last) * self.rate)
+                self._last = now
+                if now < self._blocked_until:
+                    wait = self._blocked_until - now
+                elif self._tokens >= 1.0:
+                    self._tokens -= 1.0
+                    return
+                else:
+                    wait = (1.0 - self._tokens) / self.rate
+            self._sleep(wait)
+
+    def pause(self, seconds):
+        """Suspende a liberação de tokens por `seconds` segundos e esvazia o balde."""
+        with self._lock:
+            self._blocked_until = max(self._blocked_until, self._clock() + seconds)
+            self._tokens = 0.0
+
+class RetryBudget:
+    """Orçamento global de novas tentativas, para não insistir indefinidamente numa API instável."""
+
+    def __init__(self, max_retries):
+        self.max_retries = max_retries
+        self.used = 0
+        self._lock = threading.Lock()
+
+    def try_spend(self):
+        with self._lock:
+            if self.used >= self.max_retries:
+                return False
+            self.used += 1
+            return True
+
+def print_progress(done, total, stats):
+    """Callback padrão de progresso: imprime a cada 5% e ao final."""
+    step = max(1, total // 20)
+    if done == total or done % step == 0:
+        elapsed = max(stats['elapsed'], 1e-9)
+        rate = done / elapsed
+        eta = (total - done) / rate if rate > 0 else float('inf')
+        print(f"Consultados {done}/{total} CNPJs ({rate:.1f}/s, ETA {eta:.0f}s) - "
+              f"ok: {stats['ok']}, não encontrados: {stats['not_found']}, "
+              f"falhas: {stats['failed']}, novas tentativas: {stats['retries']}")
+
+class CnpjFetcher:
+    """Consulta concorrente à BrasilAPI com limite de taxa, backoff e orçamento de tentativas.
+
+    Reaproveita conexões HTTP via `requests.Session` com pool de tamanho `max_workers`.
+    O resultado de `fetch_many` é equivalente a chamar `get_cnpj_data` para cada CNPJ:
+    um dicionário com os campos extraídos, ou None quando o CNPJ não foi encontrado
+    ou a consulta falhou. Os CNPJs que falharam (e não foram "não encontrados") ficam
+    em `self.failed`.
+    """
+
+    def __init__(self, api_url=API_URL, max_workers=4, rate=2.0, burst=None,
+                 max_attempts=5, retry_budget_ratio=0.5, backoff_base=1.0,
+                 backoff_max=60.0, timeout=30, session=None, progress=print_progress):
+        self.api_url = api_url
+        self.max_workers = max_workers
+        self.rate = rate
+        self.burst = burst
+        self.max_attempts = max_attempts
+        self.retry_budget_ratio = retry_budget_ratio
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.timeout = timeout
+        self.progress = progress
+        self.session = session or self._build_session()
+        self.failed = set()
+        self.stats = {}
+
+    def _build_session(self):
+        session = requests.Session()
+        # Sem retries automáticos do urllib3: o controle de tentativas é feito aqui
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.max_workers, max_retries=0)
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        return session
+
+    def _backoff(self, attempt, retry_after=None):
+        """Backoff exponencial com jitter completo, respeitando o Retry-After quando presente."""
+        delay = random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+        if retry_after is not None:
+            delay = max(delay, min(self.backoff_max, retry_after))
+        return delay
+
+    @staticmethod
+    def _retry_after(response):
+        try:
+            return float(response.headers.get('Retry-After'))
+        except (TypeError, ValueError):
+            return None
+
+    def fetch_one(self, cnpj_clean):
+        """Consulta um CNPJ e retorna (status, dados), com status 'ok', 'not_found' ou 'failed'."""
+        if not cnpj_clean or len(cnpj_clean) != 14:
+            return 'not_found', None
+
+        url = f"{self.api_url}{cnpj_clean}"
+        for attempt in range(self.max_attempts):
+            self._bucket.acquire()
+            retry_after = None
+            try:
+                response = self.session.get(url, timeout=self.timeout)
+            except requests.exceptions.RequestException as e:
+                reason = f"erro de requisição: {e}"
+            else:
+                if response.status_code in (400, 404):
+                    return 'not_found', None
+                if response.ok:
+                    # Como em get_cnpj_data: toda resposta sem erro (não só 200) tem o JSON lido
+                    try:
+                        return 'ok', extract_cnpj_fields(response.json())
+                    except Exception as e:
+                        print(f"Erro inesperado ao processar dados do CNPJ {cnpj_clean}: {e}")
+                        return 'failed', None
+                if response.status_code not in RETRYABLE_STATUS:
+                    print(f"Erro HTTP {response.status_code} ao consultar API para CNPJ {cnpj_clean}.")
+                    return 'failed', None
+                reason = f"HTTP {response.status_code}"
+                retry_after = self._retry_after(response)
+
+            if attempt + 1 >= self.max_attempts or not self._budget.try_spend():
+                print(f"Desistindo do CNPJ {cnpj_clean} ({reason}).")
+                return 'failed', None
+
+            with self._stats_lock:
+                self.stats['retries'] += 1
+            delay = self._backoff(attempt, retry_after)
+            if retry_after is not None:
+                # Todas as threads respeitam a pausa pedida pela API
+                self._bucket.pause(delay)
+            time.sleep(delay)
+
+        return 'failed', None
+
+    def fetch_many(self, cnpjs):
+        """Consulta uma coleção de CNPJs em paralelo e retorna {cnpj: dados ou None}."""
+        unique_cnpjs = list(dict.fromkeys(cnpjs))
+        total = len(unique_cnpjs)
+        self._bucket = TokenBucket(self.rate, self.burst)
+        self._budget = RetryBudget(max(self.max_attempts, int(total * self.retry_budget_ratio)))
+        self._stats_lock = threading.Lock()
+        self.failed = set()
+        self.stats = {'ok': 0, 'not_found': 0, 'failed': 0, 'retries': 0, 'elapsed': 0.0}
+
+        results = {}
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            futures = {executor.submit(self.fetch_one, cnpj): cnpj for cnpj in unique_cnpjs}
+            for done, future in enumerate(as_completed(futures), start=1):
+                cnpj = futures[future]
+                status, data = future.result()
+                results[cnpj] = data
+                with self._stats_lock:
+                    self.stats[status] += 1
+                    self.stats['elapsed'] = time.perf_counter() - start
+                if status == 'failed':
+                    self.failed.add(cnpj)
+                if self.progress:
+                    self.progress(done, total, dict(self.stats))
+
+        return results
+
+def apply_enrichment(df, records, key_column='CNPJ_CLEAN'):
+    """Aplica em lote os registros {cnpj: dados} a todas as linhas com o mesmo CNPJ.
+
+    Os registros viram um único DataFrame indexado pelo CNPJ, e cada coluna é
+    preenchida por indexação vetorizada. Valores None ou vazios não sobrescrevem
+    o que já existe no DataFrame (mesma regra do preenchimento linha a linha).
+    """
+    valid = {
+        cnpj: {key: value for key, value in data.items() if value is not None and value != ''}
+        for cnpj, data in records.items() if data
+    }
+    if not valid:
+        return df
+
+    enrichment = pd.DataFrame.from_dict(valid, orient='index')
+    positions = enrichment.index.get_indexer(df[key_column])
+    matched = positions >= 0
+    take = np.where(matched, positions, 0)
+
+    for col in enrichment.columns:
+        mapped = pd.Series(enrichment[col].to_numpy()[take], index=df.index).where(matched)
+        if col in df.columns:
+            current = df[col]
+            if isinstance(current.dtype, pd.CategoricalDtype):
+                current = current.astype(object)
+            df[col] = mapped.where(mapped.notna(), current)
+        else:
+            df[col] = mapped
+
+    return df
+
+def enrich_data(df, fetcher=None, cache=None):
+    """Enriquece o DataFrame com dados do CNPJ, usando cache e lógica de preenchimento.
+
+    Se `cache` (um `cnpj_cache.CnpjCache`) for informado, apenas os CNPJs ausentes ou
+    expirados no cache são consultados na API, e os resultados são gravados nele.
+    """
+
+    # 1. Garantir que as colunas de enriquecimento existam
+    for col in ENRICHMENT_COLUMNS:
+        if col not in df.columns:
+            df[col] = np.nan
+
+    # 2. Limpar a coluna CNPJ
+    df['CNPJ_CLEAN'] = df[CNPJ_COLUMN].apply(clean_cnpj)
+
+    # 3. Identificar linhas que precisam de enriquecimento (onde CNAE_FISCAL está vazio)
+    # Usamos .isna() para verificar valores NaN ou None
+    df_to_enrich = df[df['CNAE_FISCAL'].isna()].copy()
+
+    if df_to_enrich.empty:
+        print("Todos os dados de CNPJ já estão preenchidos. Pulando consulta à API.")
+        return df.drop(columns=['CNPJ_CLEAN'])
+
+    print(f"Iniciando enriquecimento para {len(df_to_enrich)} CNPJs...")
+
+    # 4. Buscar os CNPJs únicos no cache persistente e consultar os demais em paralelo
+    unique_cnpjs = df_to_enrich['CNPJ_CLEAN'].dropna().unique()
+    cnpj_cache = cache.get_many(unique_cnpjs) if cache is not None else {}
+    missing = [cnpj for cnpj in unique_cnpjs if cnpj not in cnpj_cache]
+    print(f"{len(cnpj_cache)} CNPJs encontrados no cache, {len(missing)} a consultar na API.")
+
+    if missing:
+        fetcher = fetcher or CnpjFetcher()
+        fetched = fetcher.fetch_many(missing)
+        if cache is not None:
+            # Falhas transitórias não são gravadas; "não encontrado" vira cache negativo
+            cache.put_many({cnpj: data for cnpj, data in fetched.items() if cnpj not in fetcher.failed})
+        cnpj_cache.update(fetched)
+
+    # 5. Atualizar o DataFrame original com os dados do cache, em uma única operação
+    df = apply_enrichment(df, cnpj_cache)
+
+    print("Enriquecimento de dados concluído.")
+
+    # Remover a coluna CNPJ_CLEAN temporária
+    df = df.drop(columns=['CNPJ_CLEAN'])
+
+    return df
@@ -0,0 +1,281 @@
+import argparse
+
+import numpy as np
+import pandas as pd
+from sklearn.dummy import DummyRegressor
+from sklearn.ensemble import GradientBoostingRegressor
+from sklearn.preprocessing import FunctionTransformer, OneHotEncoder
+
+# --- Modelo Compilado (OneHotEncoder + GradientBoostingRegressor) ---
+#
+# O Pipeline do modelo 'gbr' monta, a cada previsão, a matriz densa do one-hot e
+# percorre as árvores do scikit-learn. A versão compilada guarda as árvores em
+# arrays contíguos (entrada, categoria, limiar, filhos e valor de cada nó) e nunca
+# monta o one-hot: uma divisão na coluna "ETAPA_ATUAL = Proposta" só depende do
+# código da categoria de ETAPA_ATUAL.
+#
+# A avaliação segue o QuickScorer. Cada nó interno tem uma máscara de bits das
+# folhas da árvore que deixam de ser alcançáveis quando a condição do nó é falsa;
+# o E das máscaras dos nós falsos deixa ligada, como bit mais baixo, a folha de
+# saída. Como as condições de uma entrada só dependem do código da categoria (ou,
+# para VALOR_SUGERIDO, do intervalo entre limiares em que o valor cai), o E de
+# todos os nós dessa entrada é pré-calculado em uma tabela (código -> máscara por
+# árvore). Prever uma linha é buscar uma linha de tabela por entrada, fazer o E,
+# achar o bit mais baixo e somar as folhas.
+#
+# As operações em ponto flutuante são as mesmas do scikit-learn (valor em float32
+# comparado ao limiar em float64; soma das árvores em ordem, a partir do valor
+# inicial), então o resultado é idêntico, bit a bit, ao de `model.predict`.
+
+BLOCK_ROWS = 4096  # Linhas por bloco: as matrizes (linhas x árvores) do bloco cabem no cache
+SMALL_BLOCK = 256  # Abaixo disso, a soma das árvores é feita com um único np.add.accumulate
+
+class CompiledModel:
+    """Ensemble compilado; `predict(X)` recebe o mesmo DataFrame que o Pipeline.
+
+    `arrays` guarda as árvores achatadas (um elemento por nó; `tree_offsets` marca
+    o início de cada árvore) e `categories` o vocabulário de cada entrada categórica
+    (None nas numéricas).
+    """
+
+    def __init__(self, arrays, inputs, categories, feature_names_in, block_rows=BLOCK_ROWS):
+        self.arrays = arrays
+        self.inputs = list(inputs)
+        self.categories = categories
+        self.feature_names_in_ = np.asarray(feature_names_in, dtype=object)
+        self.block_rows = block_rows
+        self._prepare()
+
+    # --- Tabelas de Decisão ---
+
+    def _tree_layout(self, root):
+        """Folhas da árvore numeradas da esquerda para a direita e máscara de cada nó interno."""
+        left, right = self.arrays['left'], self.arrays['right']
+        leaves, internal, stack = [], [], [(root, False)]
+        while stack:
+            node, expanded = stack.pop()
+            if left[node] < 0:
+                leaves.append(node)
+            elif expanded:
+                internal.append(node)
+            else:
+                stack.extend([(right[node], False), (node, True), (left[node], False)])
+        position = {node: i for i, node in enumerate(leaves)}
+        masks = {}
+        for node in internal:
+            # Folhas da subárvore esquerda: inalcançáveis quando a condição do nó é falsa
+            bits, stack = 0, [left[node]]
+            while stack:
+                child = stack.pop()
+                if left[child] < 0:
+                    bits |= 1 << position[child]
+                else:
+                    stack.extend([left[child], right[child]])
+            masks[node] = bits
+        return leaves, masks
+
+    def _prepare(self):
+        a = self.arrays
+        offsets = a['tree_offsets']
+        n_trees = len(offsets) - 1
+        layouts = [self._tree_layout(offsets[t]) for t in range(n_trees)]
+        max_leaves = max(len(leaves) for leaves, _ in layouts)
+        if max_leaves > 64:
+            raise ValueError("Árvores com mais de 64 folhas não são suportadas pelo modelo compilado.")
+        dtype = next(dt for dt in (np.uint8, np.uint16, np.uint32, np.uint64) if np.iinfo(dt).bits >= max_leaves)
+        full = int(np.iinfo(dtype).max)
+
+        # Uma tabela por entrada: linha = código da categoria (última linha: desconhecida ou
+        # ausente) ou intervalo entre limiares; coluna = árvore; valor = E das máscaras dos nós falsos
+        self._tables, self._thresholds, self._lookups = [], [], []
+        for i, cats in enumerate(self.categories):
+            nodes = [(t, node) for t, (_, masks) in enumerate(layouts) for node in masks if a['input'][node] == i]
+            if cats is None:
+                thresholds = np.unique([a['threshold'][node] for _, node in nodes])
+                table = np.full((len(thresholds) + 1, n_trees), full, dtype=dtype)
+                for t, node in nodes:
+                    # Intervalo b = nº de limiares < valor; condição valor <= limiar[j] é falsa se b > j
+                    j = np.searchsorted(thresholds, a['threshold'][node])
+                    table[j + 1:, t] &= dtype(full & ~layouts[t][1][node])
+                self._thresholds.append(thresholds)
+                self._lookups.append(None)
+            else:
+                table = np.full((len(cats) + 1, n_trees), full, dtype=dtype)
+                for t, node in nodes:
+                    # Coluna one-hot vale 1 só no código da divisão: condição (0 ou 1) <= limiar
+                    false = np.full(len(cats) + 1, not (0.0 <= a['threshold'][node]))
+                    false[a['category'][node]] = not (1.0 <= a['threshold'][node])
+                    table[false, t] &= dtype(full & ~layouts[t][1][node])
+                self._thresholds.append(None)
+                self._lookups.append({label: code for code, label in enumerate(_labels(cats))})
+            self._tables.append(table)
+
+        # Folha de saída = bit ligado mais baixo; tabela direta para até 16 bits, frexp acima disso
+        self._dtype = dtype
+        if np.iinfo(dtype).bits <= 16:
+            values = np.arange(1 << np.iinfo(dtype).bits)
+            self._lowest_bit = np.where(values > 0, np.frexp((values & -values).astype(np.float64))[1] - 1,
+                                        0).astype(np.uint8)
+        else:
+            self._lowest_bit = None
+        leaf_table = np.zeros((n_trees, max_leaves))
+        for t, (leaves, _) in enumerate(layouts):
+            leaf_table[t, :len(leaves)] = a['value'][leaves]
+        # Contribuição de cada folha já multiplicada pela taxa de aprendizado (mesma operação do scikit-learn)
+        self._contributions = (a['learning_rate'] * leaf_table).ravel()
+        self._tree_base = np.arange(n_trees, dtype=np.intp) * max_leaves
+
+    # --- Entradas ---
+
+    def _encode(self, X):
+        """Índice da linha de cada tabela: código da categoria ou intervalo do valor numérico."""
+        rows = []
+        for name, cats, lookup, thresholds in zip(self.inputs, self.categories, self._lookups, self._thresholds):
+            series = X[name]
+            if cats is None:
+                values = np.asarray(series, dtype=np.float64).astype(np.float32)
+                if not np.isfinite(values).all():
+                    raise ValueError(f"{name} contém valores ausentes ou infinitos; o modelo não aceita esses valores.")
+                rows.append(np.searchsorted(thresholds, values.astype(np.float64), side='left'))
+                continue
+            unknown = len(cats)
+            if isinstance(series.dtype, pd.CategoricalDtype):
+                # Só as categorias distintas são procuradas no vocabulário; código -1 (ausente) vai para NaN
+                categorical = series.array
+                mapping = np.array([lookup.get(_label(value), unknown) for value in categorical.categories]
+                                   + [lookup.get(None, unknown)], dtype=np.intp)
+                rows.append(mapping[categorical.codes])
+            else:
+                rows.append(np.array([lookup.get(_label(value), unknown) for value in series], dtype=np.intp))
+        return rows
+
+    # --- Previsão ---
+
+    def predict(self, X):
+        """Previsão para um DataFrame com as colunas de entrada do Pipeline."""
+        rows = self._encode(X)
+        n_rows = len(X)
+        out = np.empty(n_rows)
+        for start in range(0, n_rows, self.block_rows):
+            stop = min(start + self.block_rows, n_rows)
+            reached = self._tables[0][rows[0][start:stop]]
+            for table, index in zip(self._tables[1:], rows[1:]):
+                reached &= table[index[start:stop]]
+            # A soma das árvores é feita em ordem, a partir do valor inicial, como no scikit-learn
+            if stop - start < SMALL_BLOCK:
+                # Poucas linhas: np.add.accumulate ao longo das árvores (sequencial, mesma ordem das somas)
+                total = np.empty((stop - start, reached.shape[1] + 1))
+                total[:, 0] = self.arrays['init']
+                total[:, 1:] = np.take(self._contributions, self._tree_base + self._leaf(reached))
+                out[start:stop] = np.add.accumulate(total, axis=1)[:, -1]
+            else:
+                # Muitas linhas: árvores nas linhas (contíguas) e uma soma vetorizada por árvore
+                leaf = self._leaf(np.ascontiguousarray(reached.T))
+                contributions = np.take(self._contributions, leaf + self._tree_base[:, None])
+                total = np.full(stop - start, self.arrays['init'])
+                for tree in contributions:
+                    total += tree
+                out[start:stop] = total
+        return out
+
+    def _leaf(self, reached):
+        """Posição da folha de saída: o bit ligado mais baixo de cada máscara."""
+        if self._lowest_bit is not None:
+            return np.take(self._lowest_bit, reached)
+        return np.frexp((reached & (~reached + self._dtype(1))).astype(np.float64))[1].astype(np.intp) - 1
+
+def _label(value):
+    """Chave de busca no vocabulário: todo valor ausente (None, NaN) vira a mesma chave."""
+    return None if value is None or value != value else value
+
+def _labels(categories):
+    return [_label(value) for value in categories]
+
+# --- Exportação ---
+
+def _input_columns(preprocessor):
+    """Para cada coluna da matriz gerada pelo ColumnTransformer: (entrada, código da categoria ou -1)."""
+    inputs, categories = [], []
+    n_out = max(s.stop for s in preprocessor.output_indices_.values())
+    column_map = np.full((n_out, 2), -1)
+    for name, transformer, columns in preprocessor.transformers_:
+        if transformer == 'drop' or len(columns) == 0:
+            continue
+        columns = [preprocessor.feature_names_in_[c] if isinstance(c, (int, np.integer)) else c for c in columns]
+        position = preprocessor.output_indices_[name].start
+        if isinstance(transformer, OneHotEncoder):
+            if transformer.drop_idx_ is not None or getattr(transformer, '_infrequent_enabled', False):
+                raise ValueError("OneHotEncoder com 'drop' ou categorias infrequentes não é suportado.")
+            for column, cats in zip(columns, transformer.categories_):
+                for code in range(len(cats)):
+                    column_map[position] = (len(inputs), code)
+                    position += 1
+                inputs.append(column)
+                categories.append(list(cats))
+        elif transformer == 'passthrough' or (isinstance(transformer, FunctionTransformer) and transformer.func is None):
+            for column in columns:
+                column_map[position] = (len(inputs), -1)
+                position += 1
+                inputs.append(column)
+                categories.append(None)
+        else:
+            raise ValueError(f"Transformador '{name}' não suportado pelo modelo compilado.")
+    return inputs, categories, column_map
+
+def compile_model(pipeline):
+    """Compila um Pipeline (ColumnTransformer com OneHotEncoder + GradientBoostingRegressor).
+
+    Lança ValueError se o Pipeline tiver outra estrutura (ex: o modelo 'hgb').
+    """
+    preprocessor = pipeline.named_steps.get('preprocessor')
+    regressor = pipeline.named_steps.get('regressor')
+    if not isinstance(regressor, GradientBoostingRegressor) or preprocessor is None:
+        raise ValueError("Apenas Pipelines com GradientBoostingRegressor podem ser compilados.")
+    if isinstance(regressor.init_, DummyRegressor):
+        init = float(np.asarray(regressor.init_.constant_).ravel()[0])
+    elif regressor.init_ == 'zero':
+        init = 0.0
+    else:
+        raise ValueError("Apenas o valor inicial padrão (DummyRegressor ou 'zero') é suportado.")
+
+    inputs, categories, column_map = _input_columns(preprocessor)
+    trees = [estimator.tree_ for estimator in regressor.estimators_[:, 0]]
+    offsets = np.cumsum([0] + [tree.node_count for tree in trees])
+    feature = np.concatenate([tree.feature for tree in trees])
+    split = feature >= 0
+    arrays = {
+        'tree_offsets': offsets.astype(np.int64),
+        'input': np.where(split, column_map[np.where(split, feature, 0), 0], -1).astype(np.int32),
+        'category': np.where(split, column_map[np.where(split, feature, 0), 1], -1).astype(np.int32),
+        'threshold': np.concatenate([tree.threshold for tree in trees]),
+        'left': np.concatenate([np.where(tree.children_left >= 0, tree.children_left + start, -1)
+                                for tree, start in zip(trees, offsets)]).astype(np.int32),
+        'right': np.concatenate([np.where(tree.children_right >= 0, tree.children_right + start, -1)
+                                 for tree, start in zip(trees, offsets)]).astype(np.int32),
+        'value': np.concatenate([tree.value[:, 0, 0] for tree in trees]),
+        'init': init,
+        'learning_rate': float(regressor.learning_rate),
+    }
+    return CompiledModel(arrays, inputs, categories, pipeline.feature_names_in_)
+
+def try_compile(model):
+    """Versão compilada do modelo, ou o próprio modelo se ele não puder ser compilado."""
+    try:
+        return compile_model(model)
+    except (ValueError, AttributeError, KeyError):
+        return model
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Confere o modelo compilado contra o Pipeline em uma planilha.")
+    parser.add_argument('input', help="Planilha (.xlsx, .csv ou .parquet) com oportunidades.")
+    parser.add_argument('--model', default=None, help="Modelo (.bundle ou .pkl; padrão: o pacote, se existir).")
+    args = parser.parse_args()
+
+    from data_io import read_table
+    from scoring import FEATURES_PATH, default_model_path, load_model, preprocess_data
+
+    model, features_list = load_model(args.model or default_model_path(), FEATURES_PATH)
+    X = preprocess_data(read_table(args.input), features_list)[features_list]
+    compiled = compile_model(model)
+    expected, got = model.predict(X), compiled.predict(X)
+    print(f"{len(X)} oportunidades; previsões idênticas (bit a bit): {np.array_equal(expected, got)}")
@@ -0,0 +1,286 @@
+import argparse
+import os
+
+import pandas as pd
+
+from schema import (CATEGORICAL_FEATURES, apply_dtypes, normalize_column_name,
+                    normalize_column_names, normalize_columns)
+
+# Tamanho padrão dos blocos de leitura (linhas)
+CHUNK_SIZE = 50_000
+
+SUPPORTED_FORMATS = ('.xlsx', '.csv', '.parquet')
+
+def file_format(path, fmt=None):
+    """Retorna a extensão do arquivo (.xlsx, .csv ou .parquet) ou lança ValueError."""
+    ext = (fmt or os.path.splitext(str(getattr(path, 'name', path)))[1]).lower()
+    if not ext.startswith('.'):
+        ext = f".{ext}"
+    if ext not in SUPPORTED_FORMATS:
+        raise ValueError(f"Formato não suportado: '{ext}'. Use um de {', '.join(SUPPORTED_FORMATS)}.")
+    return ext
+
+def _projection(raw_columns, columns):
+    """Mapeia os nomes padronizados pedidos em `columns` para os nomes originais do arquivo."""
+    if columns is None:
+        return None
+    wanted = set(columns)
+    normalized = normalize_column_names(raw_columns)
+    return [raw for raw, norm in zip(raw_columns, normalized) if norm in wanted]
+
+# --- Leitura Completa ---
+
+def read_table(source, columns=None, fmt=None, categories=True):
+    """Lê um arquivo .xlsx, .csv ou .parquet, padroniza os nomes das colunas e aplica os tipos.
+
+    `source` pode ser um caminho ou um objeto de arquivo (nesse caso informe `fmt`).
+    `columns` (nomes padronizados) limita a leitura às colunas necessárias; no Parquet
+    apenas essas colunas são lidas do disco.
+    """
+    ext = file_format(source, fmt)
+    wanted = set(columns) if columns is not None else None
+    usecols = (lambda raw: normalize_column_name(raw) in wanted) if wanted else None
+
+    if ext == '.parquet':
+        import pyarrow.parquet as pq
+
+        raw_columns = pq.read_schema(source).names
+        if hasattr(source, 'seek'):
+            source.seek(0)
+        selected = _projection(raw_columns, columns)
+        # Colunas categóricas são lidas já como dicionário (pandas category), sem materializar strings
+        dictionary = [raw for raw, norm in zip(raw_columns, normalize_column_names(raw_columns))
+                      if norm in CATEGORICAL_FEATURES and (selected is None or raw in selected)]
+        table = pq.read_table(source, columns=selected, read_dictionary=dictionary if categories else None)
+        df = table.to_pandas()
+    elif ext == '.csv':
+        df = pd.read_csv(source, usecols=usecols)
+    else:
+        df = pd.read_excel(source, usecols=usecols)
+
+    return apply_dtypes(normalize_columns(df), categories=categories)
+
+def write_table(df, path):
+    """Grava o DataFrame em .csv ou .parquet conforme a extensão do arquivo."""
+    ext = file_format(path)
+    if ext == '.parquet':
+        df.to_parquet(path, index=False)
+    elif ext == '.csv':
+        df.to_csv(path, index=False)
+    else:
+        df.to_excel(path, index=False)
+
+# --- Leitura em Blocos ---
+
+def _iter_xlsx(path, chunksize, columns):
+    """Lê a primeira aba em modo somente leitura do openpyxl, sem carregar a pasta inteira."""
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(path, read_only=True, data_only=True)
+    try:
+        rows = workbook.worksheets[0].iter_rows(values_only=True)
+        header = next(rows, None)
+        if header is None:
+            return
+        # Descarta colunas sem cabeçalho (células vazias à direita da tabela) e as não projetadas
+        named = [str(name) for name in header if name is not None]
+        selected = set(_projection(named, columns) or named)
+        keep = [i for i, name in enumerate(header) if name is not None and str(name) in selected]
+        names = [str(header[i]) for i in keep]
+
+        buffer = []
+        for row in rows:
+            if all(value is None for value in row):
+                continue
+            buffer.append([row[i] if i < len(row) else None for i in keep])
+            if len(buffer) >= chunksize:
+                yield pd.DataFrame(buffer, columns=names)
+                buffer = []
+        if buffer:
+            yield pd.DataFrame(buffer, columns=names)
+    finally:
+        workbook.close()
+
+def _iter_csv(path, chunksize, columns):
+    wanted = set(columns) if columns is not None else None
+    usecols = (lambda raw: normalize_column_name(raw) in wanted) if wanted else None
+    yield from pd.read_csv(path, chunksize=chunksize, usecols=usecols)
+
+def _iter_parquet(path, chunksize, columns):
+    import pyarrow.parquet as pq
+
+    parquet_file = pq.ParquetFile(path)
+    selected = _projection(parquet_file.schema_arrow.names, columns)
+    for batch in parquet_file.iter_batches(batch_size=chunksize, columns=selected):
+        yield batch.to_pandas()
+
+def iter_chunks(path, chunksize=CHUNK_SIZE, columns=None):
+    """Gera DataFrames de até `chunksize` linhas a partir de um arquivo .xlsx, .csv ou .parquet.
+
+    A memória usada fica limitada ao tamanho do bloco, independentemente do tamanho do arquivo.
+    `columns` (nomes padronizados) restringe as colunas lidas. Os nomes das colunas
+    são mantidos como no arquivo; datas e valores numéricos já saem tipados.
+    """
+    readers = {'.xlsx': _iter_xlsx, '.csv': _iter_csv, '.parquet': _iter_parquet}
+    for chunk in readers[file_format(path)](path, chunksize, columns):
+        raw_columns = chunk.columns
+        typed = apply_dtypes(normalize_columns(chunk), categories=False)
+        typed.columns = raw_columns
+        yield typed
+
+def read_row_groups(path, groups, columns=None):
+    """Lê só os row groups `groups` de um arquivo .parquet (mapeado em memória).
+
+    As colunas e os tipos saem como nos blocos de `iter_chunks`; é o que permite a cada
+    processo da pontuação em paralelo ler a própria parte do arquivo.
+    """
+    import pyarrow.parquet as pq
+
+    parquet_file = pq.ParquetFile(path, memory_map=True)
+    selected = _projection(parquet_file.schema_arrow.names, columns)
+    chunk = parquet_file.read_row_groups(list(groups), columns=selected).to_pandas()
+    raw_columns = chunk.columns
+    typed = apply_dtypes(normalize_columns(chunk), categories=False)
+    typed.columns = raw_columns
+    return typed
+
+def row_group_sizes(path):
+    """Número de linhas de cada row group de um arquivo .parquet (só os metadados são lidos)."""
+    import pyarrow.parquet as pq
+
+    metadata = pq.ParquetFile(path).metadata
+    return [metadata.row_group(i).num_rows for i in range(metadata.num_row_groups)]
+
+# --- Escrita Incremental ---
+
+def arrow_table(df):
+    """Tabela Arrow de um bloco de resultados, pronta para o Parquet."""
+    import pyarrow as pa
+
+    # Categorias variam de bloco para bloco: grava os valores, não o dicionário
+    df = df.copy()
+    for col in df.columns[df.dtypes == 'category']:
+        df[col] = df[col].astype(object)
+    # Colunas com tipos misturados viram texto para que o Arrow aceite o bloco
+    for col in df.columns[df.dtypes == object]:
+        if pd.api.types.infer_dtype(df[col], skipna=True) in ('mixed', 'mixed-integer'):
+            df[col] = df[col].astype(str).where(df[col].notna())
+    return pa.Table.from_pandas(df, preserve_index=False)
+
+def output_schema(schema):
+    """Esquema do arquivo a partir do primeiro bloco: colunas totalmente vazias não têm tipo, assume texto."""
+    import pyarrow as pa
+
+    return pa.schema([
+        field.with_type(pa.string()) if pa.types.is_null(field.type) else field for field in schema
+    ]).remove_metadata()
+
+class ChunkWriter:
+    """Grava blocos de DataFrame em um único arquivo .csv ou .parquet, de forma incremental."""
+
+    def __init__(self, path):
+        self.path = path
+        self.format = file_format(path)
+        if self.format == '.xlsx':
+            raise ValueError("A saída incremental suporta apenas .csv ou .parquet.")
+        self.rows = 0
+        self._writer = None
+        self._schema = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def write(self, df):
+        if self.format == '.csv':
+            df.to_csv(self.path, mode='w' if self.rows == 0 else 'a', header=self.rows == 0, index=False)
+        else:
+            self._write_parquet(df)
+        self.rows += len(df)
+
+    def _write_parquet(self, df):
+        import pyarrow.parquet as pq
+
+        table = arrow_table(df)
+        if self._writer is None:
+            self._schema = output_schema(table.schema)
+            self._writer = pq.ParquetWriter(self.path, self._schema)
+        self._writer.write_table(table.select(self._schema.names).cast(self._schema))
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+
+def write_part(df, path):
+    """Grava uma parte da saída para `concat_parts`: .csv como na saída final, .arrow (Arrow IPC) para .parquet."""
+    if path.endswith('.csv'):
+        df.to_csv(path, index=False)
+        return
+    import pyarrow as pa
+
+    table = arrow_table(df)
+    with pa.OSFile(path, 'wb') as sink, pa.ipc.new_file(sink, table.schema) as writer:
+        writer.write_table(table)
+
+def part_suffix(dst):
+    """Extensão das partes gravadas por `write_part` para a saída `dst`."""
+    return '.csv' if file_format(dst) == '.csv' else '.arrow'
+
+def concat_parts(parts, dst):
+    """Junta em `dst`, na ordem, as partes gravadas por `write_part` (`parts` pode ser um gerador).
+
+    No CSV, os bytes são copiados (só o cabeçalho da primeira parte é mantido); no Parquet,
+    as partes são lidas mapeadas em memória e gravadas com o esquema da primeira, como em
+    ChunkWriter. Cada parte é gravada assim que chega. Retorna o número de partes; sem
+    partes, `dst` não é criado.
+    """
+    import shutil
+
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    count, out, writer = 0, None, None
+    try:
+        for part in parts:
+            if file_format(dst) == '.csv':
+                out = out or open(dst, 'wb')
+                with open(part, 'rb') as f:
+                    if count > 0:
+                        f.readline()
+                    shutil.copyfileobj(f, out, 1 << 20)
+            else:
+                with pa.memory_map(part) as source:
+                    table = pa.ipc.open_file(source).read_all()
+                    if writer is None:
+                        schema = output_schema(table.schema)
+                        writer = pq.ParquetWriter(dst, schema)
+                    writer.write_table(table.select(schema.names).cast(schema))
+            count += 1
+    finally:
+        if out is not None:
+            out.close()
+        if writer is not None:
+            writer.close()
+    return count
+
+# --- Conversão ---
+
+def convert(src, dst, chunksize=CHUNK_SIZE):
+    """Converte uma planilha (ou CSV) para Parquet, em blocos, com colunas padronizadas e tipadas."""
+    with ChunkWriter(dst) as writer:
+        for chunk in iter_chunks(src, chunksize):
+            writer.write(normalize_columns(chunk))
+    return writer.rows
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Conversão de planilhas para Parquet.")
+    parser.add_argument('src', help="Arquivo de origem (.xlsx ou .csv).")
+    parser.add_argument('dst', nargs='?', help="Arquivo de destino (padrão: mesmo nome com .parquet).")
+    parser.add_argument('--chunksize', type=int, default=CHUNK_SIZE)
+    args = parser.parse_args()
+
+    dst = args.dst or f"{os.path.splitext(args.src)[0]}.parquet"
+    print(f"{convert(args.src, dst, args.chunksize)} linhas convertidas de {args.src} para {dst}.")
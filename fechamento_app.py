@@ -1,66 +1,121 @@
 import streamlit as st
 import pandas as pd
-import joblib
-from datetime import date, timedelta
-import numpy as np
+import functools
+import hashlib
+import io
+import os
+import sqlite3
+from datetime import date
 import plotly.express as px
-from langchain_agent import create_agent, run_agent # Importando as funções do agente
+import plotly.graph_objects as go
+from langchain_agent import LLM_MODELS, MODEL_NAME, AgentSession # Agente e cache de respostas da sessão do chat
+from analytics_cube import build_cube
+from results_grid import DEFAULT_SORT, GRID_COLUMNS, PAGE_SIZE, PAGE_SIZES, ResultsGrid, column_config, page_count
+from data_io import read_table
+from scoring import (FEATURES_PATH, QUANTILE_MODELS_PATH, default_model_path, load_model, load_quantile_models,
+                     preprocess_data, predict_and_project, predict_quantiles)
+from prediction_store import STORE_PATH, PredictionStore, delta_summary
+from projection import N_DRAWS, revenue_bands, simulate_revenue
+from instrumentation import configure_logging, env_enabled, prometheus_text, run_records, start_run, timed
 
 # --- Configurações Iniciais ---
 st.set_page_config(layout="wide", page_title="Previsão de Fechamento de Oportunidades")
 
-# Carregar o modelo e a lista de features
+# Instrumentação: ligada por FECHAMENTO_METRICS=1 ou pelo painel de debug da barra lateral.
+# Cada rerun é uma execução nova (o painel mostra só as etapas desta execução); o painel
+# liga a medição só nesta sessão, na thread do rerun, sem afetar as outras sessões.
+if env_enabled():
+    configure_logging()
+start_run(enabled=env_enabled() or st.session_state.get('debug_metrics', False))
+
+# --- Cache de Artefatos ---
+
+@functools.lru_cache(maxsize=8)
+def _file_sha256(path, mtime_ns, size):
+    """Hash do conteúdo do arquivo, recalculado apenas quando mtime ou tamanho mudam."""
+    with open(path, 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+def artifact_signature(path):
+    """Assinatura (mtime, tamanho, sha256) usada como chave dos caches do modelo."""
+    stat = os.stat(path)
+    return stat.st_mtime_ns, stat.st_size, _file_sha256(path, stat.st_mtime_ns, stat.st_size)
+
+MODEL_FILE = default_model_path() # Pacote do modelo (.bundle), se existir; senão, os pickles
+
+@st.cache_resource(show_spinner="Carregando o modelo...", max_entries=1)
+def load_cached_model(model_path, model_signature, features_signature):
+    """Desserializa o modelo uma única vez por versão dos artefatos (e não a cada rerun)."""
+    return load_model(model_path, FEATURES_PATH)
+
+# Carregar o modelo e a lista de features (no pacote, a lista de features vem junto com o modelo)
 try:
-    model = joblib.load('modelo_fechamento.pkl')
-    features_list = joblib.load('features_list.pkl')
+    features_signature = None if MODEL_FILE.endswith('.bundle') else artifact_signature(FEATURES_PATH)
+    model_signature = (artifact_signature(MODEL_FILE), features_signature)
+    with timed('app.carregar_modelo'):
+        model, features_list = load_cached_model(MODEL_FILE, *model_signature)
 except FileNotFoundError:
-    st.error("Erro: Arquivos do modelo (modelo_fechamento.pkl ou features_list.pkl) não encontrados.")
+    st.error("Erro: Arquivos do modelo (modelo_fechamento.bundle ou modelo_fechamento.pkl e features_list.pkl) não encontrados.")
+    st.stop()
+except ValueError as e:
+    st.error(f"Erro ao carregar o modelo: {e}")
     st.stop()
 
-# --- Funções de Pré-processamento e Previsão ---
+@st.cache_resource(show_spinner="Carregando os modelos de quantis...", max_entries=1)
+def load_cached_quantile_models(quantile_signature):
+    return load_quantile_models(QUANTILE_MODELS_PATH)
 
-def preprocess_data(df):
-    """Padroniza nomes de colunas e filtra oportunidades em aberto."""
-    # Padronizar nomes das colunas
-    df.columns = df.columns.str.strip().str.replace(' ', '_').str.replace('Á', 'A').str.replace('Ã', 'A').str.replace('Ç', 'C').str.replace('Ê', 'E').str.replace('Õ', 'O').str.replace('Ú', 'U').str.upper()
-    
-    # Filtrar oportunidades em aberto (DATA_DA_VENDA nula)
-    df_abertas = df[df['DATA_DA_VENDA'].isna()].copy()
-    
-    # Garantir que as colunas de feature existam
-    missing_cols = [col for col in features_list if col not in df_abertas.columns]
-    if missing_cols:
-        # st.warning(f"As seguintes colunas de feature estão faltando no arquivo: {', '.join(missing_cols)}. A previsão pode ser imprecisa.")
-        # Adicionar colunas faltantes com valor padrão (pode ser necessário um tratamento mais robusto)
-        for col in missing_cols:
-            df_abertas[col] = np.nan # Adiciona NaN para colunas faltantes
-            
-    # Garantir que VALOR_SUGERIDO seja numérico
-    if 'VALOR_SUGERIDO' in df_abertas.columns:
-        df_abertas['VALOR_SUGERIDO'] = pd.to_numeric(df_abertas['VALOR_SUGERIDO'], errors='coerce')
-        
-    return df_abertas
+# Modelos de quantis são opcionais (model_trainer2.py --quantiles): sem eles, a projeção com intervalos não aparece
+try:
+    quantile_signature = artifact_signature(QUANTILE_MODELS_PATH)
+    quantile_models = load_cached_quantile_models(quantile_signature)
+except FileNotFoundError:
+    quantile_signature, quantile_models = None, None
 
-def predict_closing_days(df_abertas):
-    """Faz a previsão dos dias para fechamento e calcula a data provável."""
-    if df_abertas.empty:
-        return df_abertas
+# --- Previsão (com cache) ---
 
-    # 1. Fazer a previsão
-    X_predict = df_abertas[features_list]
-    
-    # O modelo é um Pipeline que inclui o pré-processamento (OneHotEncoder)
-    # Ele tratará as novas categorias automaticamente (handle_unknown='ignore')
-    predicted_days = model.predict(X_predict)
-    
-    # Garantir que os dias sejam inteiros e não negativos
-    df_abertas['DIAS_PREVISTOS'] = np.maximum(1, np.round(predicted_days)).astype(int)
-    
-    # 2. Calcular a Data Provável de Fechamento
-    data_atual = pd.to_datetime(date.today()) # Convertendo para datetime para consistência
-    df_abertas['DATA_PROVAVEL_FECHAMENTO'] = df_abertas['DIAS_PREVISTOS'].apply(lambda x: data_atual + timedelta(days=int(x)))
-    
-    return df_abertas
+@st.cache_data(show_spinner="Processando a planilha...", max_entries=8)
+def load_and_predict(file_hash, model_signature, today, file_format, _file_bytes):
+    """Lê a planilha e calcula as previsões, com cache pelo hash do conteúdo do arquivo.
+
+    Reruns do Streamlit (ex: mensagens no chat) com o mesmo arquivo e o mesmo modelo
+    reutilizam o DataFrame e as previsões sem reler o Excel nem chamar o modelo.
+    `today` faz parte da chave porque a data provável é calculada a partir da data atual.
+
+    Entre uploads (ex: a exportação semanal do CRM), as previsões ficam no armazenamento
+    de previsões (SQLite): só as oportunidades novas ou alteradas vão ao modelo. Retorna
+    também as contagens de linhas reaproveitadas e pontuadas (None sem o armazenamento).
+    """
+    # Leitura completa, sem projeção de colunas: df_raw também alimenta o agente do chat
+    # (df_completo, que responde sobre qualquer coluna) e o cubo de análises
+    with timed('app.leitura_planilha') as span:
+        df_raw = read_table(io.BytesIO(_file_bytes), fmt=file_format)
+        span.rows = len(df_raw)
+    with timed('preprocess_data', rows=len(df_raw)):
+        df_abertas = preprocess_data(df_raw.copy(), features_list)
+    # A chave do modelo é o sha256 dos artefatos: com outro modelo, as previsões guardadas são descartadas
+    key = ':'.join(signature[2] for signature in model_signature if signature)
+    try:
+        with PredictionStore(STORE_PATH, model_key=key) as store:
+            df_abertas, projection_df = predict_and_project(df_abertas, model, features_list, today=today, store=store)
+            delta_stats = store.last_stats
+    except sqlite3.Error:
+        # Sem disco gravável (ou arquivo corrompido): pontua todas as linhas
+        df_abertas, projection_df = predict_and_project(df_abertas, model, features_list, today=today)
+        delta_stats = None
+    return df_raw, df_abertas, projection_df, delta_stats
+
+@st.cache_data(show_spinner="Simulando cenários de fechamento...", max_entries=8)
+def simulate_bands(file_hash, model_signature, quantile_signature, today, use_feeling, _df_abertas):
+    """Faixas mensais de receita (P10/P50/P90 entre os cenários) a partir dos quantis de dias previstos."""
+    days_quantiles = predict_quantiles(_df_abertas, quantile_models)
+    feeling = _df_abertas['FEELING_FECHAMENTO'] if use_feeling and 'FEELING_FECHAMENTO' in _df_abertas.columns else None
+    totals = simulate_revenue(days_quantiles, _df_abertas['VALOR_SUGERIDO'], feeling, today=today, seed=42)
+    return revenue_bands(totals, today)
+
+def reset_grid_page():
+    """Volta o grid para a primeira página (ao mudar filtros, ordenação ou tamanho da página)."""
+    st.session_state['grid_pagina'] = 1
 
 # --- Layout do Streamlit ---
 
@@ -73,106 +128,125 @@ tab_previsao, tab_chat = st.tabs(["Previsão e Projeção", "Chat com a Planilha
 # --- Aba de Previsão e Projeção ---
 with tab_previsao:
     # 1. Upload do arquivo
-    uploaded_file = st.file_uploader("Selecione a planilha de Oportunidades (formato .xlsx)", type=["xlsx"], key="upload_previsao")
+    uploaded_file = st.file_uploader("Selecione a planilha de Oportunidades (formato .xlsx, .csv ou .parquet)", type=["xlsx", "csv", "parquet"], key="upload_previsao")
 
     if uploaded_file is not None:
         try:
-            # Carregar o arquivo
-            df_raw = pd.read_excel(uploaded_file)
-            
-            # Salvar o DataFrame completo na sessão para uso no chat
-            st.session_state['df_completo'] = df_raw.copy()
+            # Carregar o arquivo, pré-processar e prever (com cache pelo conteúdo do arquivo)
+            file_bytes = uploaded_file.getvalue()
+            file_hash = hashlib.sha256(file_bytes).hexdigest()
+            # Com o arquivo já em cache, só esta etapa aparece no painel (as internas não rodam)
+            with timed('app.load_and_predict'):
+                df_raw, df_abertas, projection_df_12m, delta_stats = load_and_predict(file_hash, model_signature, date.today(),
+                                                     os.path.splitext(uploaded_file.name)[1], file_bytes)
             
-            # Pré-processar e filtrar oportunidades em aberto
-            df_abertas = preprocess_data(df_raw)
+            # Salvar o DataFrame completo na sessão para uso no chat (só quando o arquivo muda);
+            # o hash do arquivo identifica os dados no agente e no cache de respostas.
+            # O cubo de agregados responde às perguntas de totais/contagens/médias sem o agente.
+            if st.session_state.get('df_completo_hash') != file_hash:
+                st.session_state['df_completo'] = df_raw.copy()
+                st.session_state['df_completo_hash'] = file_hash
+                with timed('app.cubo', rows=len(df_raw)):
+                    st.session_state['cube'] = build_cube(df_raw, df_abertas)
             
             if df_abertas.empty:
                 st.success("Não há oportunidades em aberto (com 'DATA_DA_VENDA' vazia) na planilha fornecida.")
             else:
                 st.info(f"Foram encontradas **{len(df_abertas)}** oportunidades em aberto para previsão.")
+                if delta_stats is not None:
+                    st.caption(f"Previsões: {delta_summary(delta_stats)} desde o último upload.")
                 
-                # Fazer a previsão
-                df_results = predict_closing_days(df_abertas)
+                # Previsão já calculada (e cacheada) em load_and_predict
+                df_results = df_abertas
                 
                 # --- Tarefa 3: Grid de Visualização ---
                 st.header("1. Oportunidades com Previsão de Fechamento")
                 
-                # Selecionar e ordenar colunas
-                cols_to_display = [
-                    'NOME_DA_OPORTUNIDADE', 
-                    'ETAPA_ATUAL', 
-                    'VALOR_SUGERIDO', 
-                    'DIAS_PREVISTOS', 
-                    'DATA_PROVAVEL_FECHAMENTO',
-                    'PREVISAO_DE_FECHAMENTO', # Previsão humana original
-                    'FEELING_FECHAMENTO'     # Feeling humano original
-                ]
-                
-                # Filtrar apenas as colunas que existem no DataFrame
-                display_df = df_results[[col for col in cols_to_display if col in df_results.columns]].copy()
-                
-                # Renomear colunas para melhor visualização
-                display_df.rename(columns={
-                    'NOME_DA_OPORTUNIDADE': 'Oportunidade',
-                    'ETAPA_ATUAL': 'Etapa',
-                    'VALOR_SUGERIDO': 'Valor Sugerido',
-                    'DIAS_PREVISTOS': 'Dias Previstos (IA)',
-                    'DATA_PROVAVEL_FECHAMENTO': 'Data Provável Fechamento',
-                    'PREVISAO_DE_FECHAMENTO': 'Previsão Humana',
-                    'FEELING_FECHAMENTO': 'Feeling Humano (%)'
-                }, inplace=True)
+                # Grid montado uma vez por upload (e por modelo/data): ordenação e filtros sobre os
+                # valores nativos, e só a página visível vai para o navegador, já tipada
+                grid_key = (file_hash, model_signature, date.today())
+                if st.session_state.get('grid_key') != grid_key:
+                    with timed('app.grid', rows=len(df_results)):
+                        st.session_state['grid'] = ResultsGrid(df_results)
+                    st.session_state['grid_key'] = grid_key
+                grid = st.session_state['grid']
                 
-                # CORREÇÃO: Garantir que a coluna seja do tipo datetime antes de usar .dt
-                display_df['Data Provável Fechamento'] = pd.to_datetime(display_df['Data Provável Fechamento'])
+                filter_cols = st.columns(len(grid.filter_columns) + 2)
+                filters = {}
+                for col, container in zip(grid.filter_columns, filter_cols):
+                    filters[col] = container.multiselect(GRID_COLUMNS[col], grid.options(col), key=f"grid_filtro_{col}",
+                                                         placeholder="Todas", on_change=reset_grid_page)
+                sort_by = filter_cols[-2].selectbox("Ordenar por", grid.columns, index=grid.columns.index(DEFAULT_SORT)
+                                                    if DEFAULT_SORT in grid.columns else 0,
+                                                    format_func=GRID_COLUMNS.get, key="grid_ordem", on_change=reset_grid_page)
+                descending = filter_cols[-1].toggle("Decrescente", key="grid_decrescente", on_change=reset_grid_page)
                 
-                # Formatação
-                display_df['Valor Sugerido'] = display_df['Valor Sugerido'].map('R$ {:,.2f}'.format)
-                display_df['Data Provável Fechamento'] = display_df['Data Provável Fechamento'].dt.strftime('%d/%m/%Y')
-                
-                # Ordenar pelo campo "Data Provável de Fechamento"
-                display_df.sort_values(by='Data Provável Fechamento', inplace=True)
-                
-                st.dataframe(display_df, use_container_width=True)
+                with timed('app.tabela', rows=len(df_results)):
+                    positions = grid.positions(sort_by, not descending, filters)
+                    page_cols = st.columns([1, 1, 4])
+                    page_size = page_cols[0].selectbox("Linhas por página", PAGE_SIZES, index=PAGE_SIZES.index(PAGE_SIZE),
+                                                       key="grid_tamanho", on_change=reset_grid_page)
+                    pages = page_count(len(positions), page_size)
+                    if st.session_state.get('grid_pagina', 1) > pages:
+                        reset_grid_page()  # Novo arquivo com menos páginas
+                    page_number = page_cols[1].number_input(f"Página (de {pages})", min_value=1, max_value=pages,
+                                                            step=1, key="grid_pagina")
+                    page_df, total = grid.page(page_number, page_size, sort_by, not descending, filters)
+                    st.dataframe(page_df, use_container_width=True, hide_index=True,
+                                 column_config=column_config(grid.columns))
+                    first = (page_number - 1) * page_size
+                    st.caption(f"Mostrando {first + 1 if total else 0}–{first + len(page_df)} de {total} oportunidades"
+                               + (f" (filtradas de {len(grid)})" if total != len(grid) else "") + ".")
                 
                 # --- Tarefa 4: Gráfico de Projeção de Vendas ---
                 st.header("2. Projeção de Vendas (Valor Sugerido) por Mês")
                 
-                # Criar a coluna de Mês/Ano para o agrupamento
-                df_results['MES_ANO_PROVAVEL'] = df_results['DATA_PROVAVEL_FECHAMENTO'].dt.to_period('M')
-                
-                # Agrupar por Mês/Ano e somar o VALOR_SUGERIDO
-                projection_df = df_results.groupby('MES_ANO_PROVAVEL')['VALOR_SUGERIDO'].sum().reset_index()
-                projection_df['MES_ANO_PROVAVEL'] = projection_df['MES_ANO_PROVAVEL'].astype(str)
-                
-                # Filtrar para os próximos 12 meses (a partir do mês atual)
-                today = date.today()
-                current_month = today.replace(day=1)
+                # Projeção dos próximos 12 meses de calendário (a partir do mês atual), já calculada
+                # em load_and_predict junto com as datas prováveis; meses sem vendas aparecem com 0
                 
-                # Gerar a lista dos próximos 12 meses
-                month_periods = [pd.Period(current_month + timedelta(days=30*i), freq='M') for i in range(12)]
-                month_periods_str = [str(p) for p in month_periods]
+                with timed('app.grafico_projecao'):
+                    # Criar o gráfico de barras
+                    fig = px.bar(
+                        projection_df_12m, 
+                        x='MES_ANO_PROVAVEL', 
+                        y='VALOR_SUGERIDO', 
+                        title='Projeção de Fechamento de Vendas (Valor Sugerido) nos Próximos 12 Meses',
+                        labels={'MES_ANO_PROVAVEL': 'Mês de Fechamento', 'VALOR_SUGERIDO': 'Valor Total Sugerido (R$)'},
+                        text_auto='.2s'
+                    )
                 
-                # Filtrar o DataFrame para os 12 meses de interesse
-                projection_df_12m = projection_df[projection_df['MES_ANO_PROVAVEL'].isin(month_periods_str)]
+                    fig.update_traces(marker_color='skyblue')
+                    fig.update_layout(xaxis_tickangle=-45)
                 
-                # Garantir que todos os 12 meses estejam presentes (com valor 0 se não houver vendas)
-                full_12m_df = pd.DataFrame({'MES_ANO_PROVAVEL': month_periods_str})
-                projection_df_12m = pd.merge(full_12m_df, projection_df_12m, on='MES_ANO_PROVAVEL', how='left').fillna(0)
+                    st.plotly_chart(fig, use_container_width=True)
                 
-                # Criar o gráfico de barras
-                fig = px.bar(
-                    projection_df_12m, 
-                    x='MES_ANO_PROVAVEL', 
-                    y='VALOR_SUGERIDO', 
-                    title='Projeção de Fechamento de Vendas (Valor Sugerido) nos Próximos 12 Meses',
-                    labels={'MES_ANO_PROVAVEL': 'Mês de Fechamento', 'VALOR_SUGERIDO': 'Valor Total Sugerido (R$)'},
-                    text_auto='.2s'
-                )
-                
-                fig.update_traces(marker_color='skyblue')
-                fig.update_layout(xaxis_tickangle=-45)
-                
-                st.plotly_chart(fig, use_container_width=True)
+                # --- Projeção com Intervalos (Monte Carlo) ---
+                if quantile_models is not None:
+                    st.header("3. Projeção de Vendas com Intervalos (Monte Carlo)")
+                    use_feeling = st.checkbox("Ponderar pela chance de fechamento (Feeling Humano)", value=True,
+                                              key="mc_feeling")
+                    with timed('app.monte_carlo', rows=len(df_results)):
+                        bands_df = simulate_bands(file_hash, model_signature, quantile_signature, date.today(),
+                                                  use_feeling, df_results)
+                    
+                    with timed('app.grafico_intervalos'):
+                        fig_bands = go.Figure([
+                            go.Scatter(x=bands_df['MES_ANO_PROVAVEL'], y=bands_df['P90'], mode='lines',
+                                       line=dict(width=0), name='P90', showlegend=False),
+                            go.Scatter(x=bands_df['MES_ANO_PROVAVEL'], y=bands_df['P10'], mode='lines',
+                                       line=dict(width=0), fill='tonexty', fillcolor='rgba(135, 206, 235, 0.4)',
+                                       name='Faixa P10-P90'),
+                            go.Scatter(x=bands_df['MES_ANO_PROVAVEL'], y=bands_df['P50'], mode='lines+markers',
+                                       line=dict(color='steelblue'), name='P50 (mediana)'),
+                        ])
+                        fig_bands.update_layout(
+                            title=f'Receita Projetada por Mês ({N_DRAWS} cenários simulados)',
+                            xaxis_title='Mês de Fechamento', yaxis_title='Valor Sugerido (R$)', xaxis_tickangle=-45
+                        )
+                        st.plotly_chart(fig_bands, use_container_width=True)
+                    st.caption("Em cada cenário, a data de fechamento de cada oportunidade é sorteada entre os "
+                               "quantis P10, P50 e P90 previstos pelo modelo. A faixa mostra a receita entre os "
+                               "10% piores e os 10% melhores cenários de cada mês.")
                 
         except Exception as e:
             st.error(f"Ocorreu um erro ao processar o arquivo: {e}")
@@ -194,6 +268,9 @@ with tab_chat:
             help="Sua chave da API OpenAI para o agente de conversação."
         )
         
+        # Modelo
+        llm_model = st.selectbox("Modelo do LLM", LLM_MODELS, index=LLM_MODELS.index(MODEL_NAME))
+        
         # Temperatura
         temperature = st.slider(
             "Temperatura do LLM", 
@@ -207,7 +284,7 @@ with tab_chat:
         # Botão para limpar o histórico
         if st.button("Limpar Histórico do Chat"):
             st.session_state.messages = []
-            st.experimental_rerun()
+            st.rerun()
 
     # --- Lógica do Chat ---
     
@@ -215,16 +292,26 @@ with tab_chat:
     if "messages" not in st.session_state:
         st.session_state.messages = []
 
+    # Agente e cache de respostas da sessão: o agente só é recriado quando mudam os dados,
+    # o modelo, a temperatura ou a chave; perguntas repetidas não chamam o LLM
+    if "agent_session" not in st.session_state:
+        st.session_state.agent_session = AgentSession()
+    agent_session = st.session_state.agent_session
+
     # Verifica se o DataFrame foi carregado
     if 'df_completo' not in st.session_state:
         st.warning("Por favor, carregue uma planilha na aba 'Previsão e Projeção' para iniciar o chat.")
-    elif not openai_api_key:
-        st.warning("Por favor, insira sua Chave da API OpenAI na barra lateral para iniciar o chat.")
     else:
-        # Cria o agente (ou recria se as configurações mudaram)
+        # Sem a chave, o chat responde apenas às perguntas de agregação (cubo)
+        if not openai_api_key:
+            st.info("Sem a Chave da API OpenAI, o chat responde apenas a totais, contagens e médias por etapa, "
+                    "ESN, GSN, produto, origem, tipo de atuação ou mês previsto. Insira a chave na barra lateral "
+                    "para as demais perguntas.")
+
+        # Planilha completa (como carregada, antes do filtro de oportunidades em aberto)
         df_chat = st.session_state['df_completo']
-        #agent = create_agent(df_chat, openai_api_key, temperature)
-        agent = create_agent(df_raw, openai_api_key, temperature)
+        data_hash = st.session_state['df_completo_hash']
+        cube = st.session_state.get('cube')
 
         # Exibe mensagens anteriores
         for message in st.session_state.messages:
@@ -238,21 +325,30 @@ with tab_chat:
             with st.chat_message("user"):
                 st.markdown(prompt)
 
-            # Obtém a resposta do agente
+            # Obtém a resposta do cubo (perguntas de agregação), do cache (mesma pergunta sobre
+            # estes dados) ou do agente
             with st.chat_message("assistant"):
                 with st.spinner("Analisando os dados..."):
-                    response = run_agent(agent, prompt)
+                    response, source = agent_session.ask(df_chat, prompt, openai_api_key, temperature,
+                                                         model=llm_model, data_hash=data_hash, cube=cube)
                     st.markdown(response)
+                    if source == 'cache':
+                        st.caption("Resposta do cache (mesma pergunta sobre os mesmos dados).")
             
             # Adiciona a resposta do assistente ao histórico
             st.session_state.messages.append({"role": "assistant", "content": response})
 
+        stats = agent_session.answers.stats()
+        if stats['hits'] + stats['misses'] + agent_session.routed:
+            st.caption(f"Respostas: {agent_session.routed} pelo cubo, {stats['hits']} do cache, "
+                       f"{stats['misses']} consultas ao agente ({stats['size']}/{stats['maxsize']} respostas guardadas).")
+
 # --- Instruções para o Usuário (Sidebar) ---
 with st.sidebar:
     st.header("Instruções da Aplicação")
     st.markdown("""
     **Aba 'Previsão e Projeção':**
-    1. Faça o **upload** da sua planilha de oportunidades (`.xlsx`).
+    1. Faça o **upload** da sua planilha de oportunidades (`.xlsx`, `.csv` ou `.parquet`).
     2. O modelo de **IA** fará a previsão dos dias para fechamento.
     3. Visualize o grid de oportunidades e o gráfico de projeção de vendas.
     
@@ -260,3 +356,23 @@ with st.sidebar:
     1. Insira sua **Chave da API OpenAI** e defina a **Temperatura** na barra lateral.
     2. Faça perguntas sobre os dados da planilha carregada.
     """)
+
+# --- Painel de Debug (tempos por etapa) ---
+with st.sidebar:
+    st.checkbox("Mostrar tempos por etapa (debug)", key='debug_metrics',
+                help="Mede cada etapa desta execução (leitura, pré-processamento, previsão, gráficos e agente), "
+                     "só nesta sessão.")
+
+if st.session_state.get('debug_metrics'):
+    with st.expander("Tempos por etapa (execução atual)", expanded=True):
+        records = run_records()
+        if records:
+            st.dataframe(pd.DataFrame(records).rename(columns={
+                'stage': 'Etapa', 'seconds': 'Tempo (s)', 'rows': 'Linhas', 'rows_per_s': 'Linhas/s',
+                'memory_delta_mb': 'Memória (MB)', 'status': 'Situação'}), use_container_width=True)
+            st.caption("Etapas com resultado em cache não rodam de novo e não aparecem aqui. "
+                       "A memória é a variação do RSS do processo durante a etapa.")
+        else:
+            st.caption("Nenhuma etapa medida nesta execução. Ative o painel e carregue uma planilha.")
+        st.download_button("Exportar acumulados (Prometheus)", prometheus_text(), file_name='fechamento_metrics.prom',
+                           mime='text/plain')
@@ -0,0 +1,227 @@
+import functools
+import json
+import logging
+import os
+import threading
+import time
+
+# --- Instrumentação por Etapa ---
+#
+# Temporizadores (context manager `timed` e decorador `instrument`) que registram,
+# para cada etapa: tempo, linhas processadas e variação de memória (RSS). Cada
+# registro vira uma linha JSON no logger 'fechamento.metrics', entra na lista da
+# execução atual (painel de debug da aplicação) e nos acumulados do processo, que
+# podem ser exportados no formato texto do Prometheus.
+#
+# Desligada (padrão), cada chamada custa uma verificação de flag: nada é medido,
+# registrado ou logado. Liga para o processo inteiro com FECHAMENTO_METRICS=1 ou
+# `enable()` (linha de comando), ou só para uma execução com `start_run(enabled=True)`
+# (um rerun do Streamlit: a sessão que pediu a medição não liga as outras).
+
+# --- Variáveis de Configuração ---
+ENV_VAR = 'FECHAMENTO_METRICS'
+LOGGER_NAME = 'fechamento.metrics'
+METRIC_PREFIX = 'fechamento'
+
+logger = logging.getLogger(LOGGER_NAME)
+
+def env_enabled():
+    """True se a variável de ambiente FECHAMENTO_METRICS pede a instrumentação ligada."""
+    return os.environ.get(ENV_VAR, '').strip().lower() not in ('', '0', 'false', 'nao', 'não')
+
+_enabled = env_enabled()       # Padrão do processo
+_local = threading.local()     # Execução atual (um rerun do Streamlit, uma execução do treino): flag e registros
+_lock = threading.Lock()
+_totals = {}                   # {etapa: acumulados do processo}
+
+try:
+    _PAGE_SIZE = os.sysconf('SC_PAGE_SIZE')
+except (AttributeError, ValueError, OSError):
+    _PAGE_SIZE = None
+
+def enable(on=True):
+    """Liga (ou desliga) a instrumentação em todo o processo (execuções sem flag própria)."""
+    global _enabled
+    _enabled = bool(on)
+
+def is_enabled():
+    """Flag da execução atual (`start_run(enabled=...)`) ou, sem ela, o padrão do processo."""
+    enabled = getattr(_local, 'enabled', None)
+    return _enabled if enabled is None else enabled
+
+def rss_bytes():
+    """Memória residente atual do processo (None fora do Linux)."""
+    if _PAGE_SIZE is None:
+        return None
+    try:
+        with open('/proc/self/statm', 'rb') as f:
+            return int(f.read().split()[1]) * _PAGE_SIZE
+    except (OSError, IndexError, ValueError):
+        return None
+
+def configure_logging(level=logging.INFO, stream=None):
+    """Envia os registros para `stream` (padrão: stderr), uma linha JSON por etapa, se ainda não houver destino."""
+    if not logger.handlers:
+        handler = logging.StreamHandler(stream)
+        handler.setFormatter(logging.Formatter('%(message)s'))
+        logger.addHandler(handler)
+        logger.propagate = False
+    logger.setLevel(level)
+
+# --- Registros ---
+
+class Span:
+    """Uma medição em andamento; `rows` pode ser preenchido dentro do bloco."""
+
+    __slots__ = ('stage', 'rows', 'start', 'rss_start')
+
+    def __init__(self, stage, rows=None):
+        self.stage = stage
+        self.rows = rows
+
+    def __enter__(self):
+        self.rss_start = rss_bytes()
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        seconds = time.perf_counter() - self.start
+        rss_end = rss_bytes()
+        memory = rss_end - self.rss_start if rss_end is not None and self.rss_start is not None else None
+        _record(self.stage, seconds, self.rows, memory, error=exc_type.__name__ if exc_type else None)
+        return False
+
+class _NoopSpan:
+    """Usado quando a instrumentação está desligada: não mede nada."""
+
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+    def __setattr__(self, name, value):
+        pass
+
+_NOOP = _NoopSpan()
+
+def _record(stage, seconds, rows, memory, error=None):
+    record = {'stage': stage, 'seconds': round(seconds, 6), 'rows': rows,
+              'rows_per_s': round(rows / seconds, 1) if rows and seconds > 0 else None,
+              'memory_delta_mb': round(memory / 2**20, 2) if memory is not None else None,
+              'status': 'erro' if error else 'ok'}
+    if error:
+        record['error'] = error
+    run = getattr(_local, 'run', None)
+    if run is not None:
+        run.append(record)
+    with _lock:
+        totals = _totals.setdefault(stage, {'calls': 0, 'seconds': 0.0, 'rows': 0, 'errors': 0,
+                                            'last_seconds': 0.0, 'last_memory_delta': 0})
+        totals['calls'] += 1
+        totals['seconds'] += seconds
+        totals['rows'] += rows or 0
+        totals['errors'] += bool(error)
+        totals['last_seconds'] = seconds
+        if memory is not None:
+            totals['last_memory_delta'] = memory
+    if logger.isEnabledFor(logging.INFO):
+        logger.info(json.dumps({'event': 'stage', **record}, ensure_ascii=False))
+
+def timed(stage, rows=None):
+    """Context manager que mede o bloco como a etapa `stage`.
+
+        with timed('leitura') as span:
+            df = read_table(path)
+            span.rows = len(df)
+    """
+    if not is_enabled():
+        return _NOOP
+    return Span(stage, rows)
+
+def instrument(stage=None, rows=None):
+    """Decorador: mede cada chamada da função; `rows(resultado)` informa as linhas processadas."""
+    def decorator(func):
+        name = stage or func.__qualname__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not is_enabled():
+                return func(*args, **kwargs)
+            with Span(name) as span:
+                result = func(*args, **kwargs)
+                if rows is not None:
+                    span.rows = rows(result)
+            return result
+        return wrapper
+    return decorator
+
+# --- Execução Atual e Exportação ---
+
+def start_run(enabled=None):
+    """Começa uma nova execução na thread atual (os registros anteriores são descartados).
+
+    `enabled` liga ou desliga a instrumentação só nesta execução (None: o padrão do processo).
+    """
+    _local.run = []
+    _local.enabled = None if enabled is None else bool(enabled)
+
+def run_records():
+    """Registros da execução atual, na ordem em que as etapas terminaram."""
+    return list(getattr(_local, 'run', None) or [])
+
+def totals():
+    """Cópia dos acumulados do processo: {etapa: {calls, seconds, rows, errors, ...}}."""
+    with _lock:
+        return {stage: dict(values) for stage, values in _totals.items()}
+
+def reset():
+    """Zera os acumulados do processo e a execução atual."""
+    with _lock:
+        _totals.clear()
+    _local.run = None
+    _local.enabled = None
+
+def _label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def prometheus_text(prefix=METRIC_PREFIX):
+    """Acumulados no formato texto do Prometheus (ex: para o textfile collector do node_exporter)."""
+    snapshot = totals()
+    metrics = [
+        ('stage_seconds', 'summary', "Tempo gasto em cada etapa (segundos).", None),
+        ('stage_rows_total', 'counter', "Linhas processadas em cada etapa.", 'rows'),
+        ('stage_errors_total', 'counter', "Execuções de cada etapa que terminaram com erro.", 'errors'),
+        ('stage_last_seconds', 'gauge', "Duração da última execução de cada etapa (segundos).", 'last_seconds'),
+        ('stage_last_memory_delta_bytes', 'gauge',
+         "Variação do RSS na última execução de cada etapa (bytes).", 'last_memory_delta'),
+    ]
+    lines = []
+    for name, kind, help_text, key in metrics:
+        lines.append(f"# HELP {prefix}_{name} {help_text}")
+        lines.append(f"# TYPE {prefix}_{name} {kind}")
+        for stage, values in sorted(snapshot.items()):
+            label = f'{{stage="{_label(stage)}"}}'
+            if key is None:
+                lines.append(f"{prefix}_{name}_sum{label} {values['seconds']:.6f}")
+                lines.append(f"{prefix}_{name}_count{label} {values['calls']}")
+            else:
+                lines.append(f"{prefix}_{name}{label} {values[key]}")
+    return '\n'.join(lines) + '\n'
+
+def write_prometheus(path, prefix=METRIC_PREFIX):
+    """Grava `prometheus_text()` em `path` (troca atômica, para o coletor nunca ler um arquivo pela metade)."""
+    with open(path + '.tmp', 'w', encoding='utf-8') as f:
+        f.write(prometheus_text(prefix))
+    os.replace(path + '.tmp', path)
+
+def summary_table(records):
+    """Tabela de texto com os registros (usada pelo treinamento ao final da execução)."""
+    lines = [f"{'etapa':<28} {'tempo (s)':>10} {'linhas':>10} {'memória (MB)':>13}"]
+    for record in records:
+        rows = f"{record['rows']:,}" if record['rows'] is not None else '-'
+        memory = f"{record['memory_delta_mb']:+.1f}" if record['memory_delta_mb'] is not None else '-'
+        lines.append(f"{record['stage']:<28} {record['seconds']:>10.3f} {rows:>10} {memory:>13}")
+    return '\n'.join(lines)
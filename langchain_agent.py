@@ -1,3 +1,9 @@
+import collections
+import hashlib
+import pickle
+import re
+import unicodedata
+
 import pandas as pd
 
 from langchain_experimental.agents.agent_toolkits import create_pandas_dataframe_agent
@@ -10,6 +16,16 @@ from langchain_core.prompts.chat import ChatPromptTemplate
 #from langchain.agents import create_react_agent
 from langchain_openai import ChatOpenAI
 
+from analytics_cube import DIMENSIONS, MEASURES, MONTH_DIMENSION
+from instrumentation import instrument, timed
+
+# --- Variáveis de Configuração ---
+MODEL_NAME = 'gpt-4o-mini'  # Modelo sugerido para tarefas de raciocínio e custo-benefício
+LLM_MODELS = ['gpt-4o-mini', 'gpt-4o']
+ANSWER_CACHE_SIZE = 128     # Respostas guardadas por sessão (as menos usadas saem primeiro)
+NO_ANSWER = "Desculpa, não consegui gerar uma resposta."
+NO_AGENT = ("Essa pergunta precisa do agente de IA. Insira sua chave da API da OpenAI na barra lateral "
+            "(totais, contagens e médias por etapa, ESN, GSN, produto ou mês são respondidos sem a chave).")
 
 # Prompt de sistema customizado
 SYSTEM_PROMPT = """
@@ -22,22 +38,27 @@ Se o usuário perguntar sobre a previsão de fechamento, lembre-o que a previsã
 Responda de forma clara e profissional, em português.
 """
 
-def create_agent(df: pd.DataFrame, openai_api_key: str, temperature: float):
+@instrument('agente.criar')
+def create_agent(df: pd.DataFrame, openai_api_key: str, temperature: float, model: str = MODEL_NAME, llm=None):
     """
     Cria e retorna o agente de conversação LangChain com memória.
+
+    `llm` permite usar outro modelo de chat no lugar do ChatOpenAI (ex: um modelo falso
+    local em testes e benchmarks); nesse caso a chave da API não é usada.
     """
-    if not openai_api_key:
+    if not openai_api_key and llm is None:
         return None
 
     if not isinstance(df, pd.DataFrame):
         raise TypeError("O parâmetro 'df' deve ser um pandas.DataFrame.")
     
     # 1. Configuração do LLM
-    llm = ChatOpenAI(
-        model="gpt-4o-mini", # Modelo sugerido para tarefas de raciocínio e custo-benefício
-        temperature=temperature,
-        openai_api_key=openai_api_key
-    )
+    if llm is None:
+        llm = ChatOpenAI(
+            model=model,
+            temperature=temperature,
+            openai_api_key=openai_api_key
+        )
 
 #    # 2. Configuração da Memória
 #    # Usaremos uma memória de buffer de janela para manter o contexto das últimas 5 interações
@@ -65,20 +86,324 @@ def create_agent(df: pd.DataFrame, openai_api_key: str, temperature: float):
 
 # Função para processar a entrada do usuário
 
+@instrument('agente.executar')
+def invoke_agent(agent, prompt: str, timeout: int = 60):
+    """
+    Executa o agente com o prompt do usuário com timeout (erros são propagados).
+    """
+    response = agent.invoke(
+        {"input": prompt},
+        config={"max_execution_time": timeout}
+    )
+    return response.get("output", NO_ANSWER)
+
+def error_message(error):
+    """Mensagem exibida no chat quando a execução do agente falha."""
+    if isinstance(error, TimeoutError):
+        return "A análise demorou muito tempo. Tente uma pergunta mais específica."
+    return f"Desculpe, ocorreu um erro ao processar sua solicitação: {str(error)}"
+
 def run_agent(agent, prompt: str, timeout: int = 60):
     """
     Executa o agente com o prompt do usuário com timeout.
     """
     try:
-        response = agent.invoke(
-            {"input": prompt},
-            config={"max_execution_time": timeout}
-        )
-        return response.get("output", "Desculpa, não consegui gerar uma resposta.")
-    except TimeoutError:
-        return "A análise demorou muito tempo. Tente uma pergunta mais específica."
+        return invoke_agent(agent, prompt, timeout)
     except Exception as e:
-        return f"Desculpe, ocorreu um erro ao processar sua solicitação: {str(e)}"
+        return error_message(e)
+
+# --- Sessão do Chat (agente reaproveitado e cache de respostas) ---
+
+def dataframe_hash(df):
+    """Hash do conteúdo do DataFrame (valores, índice, nomes e tipos das colunas)."""
+    digest = hashlib.sha256(repr([(str(col), str(dtype)) for col, dtype in df.dtypes.items()]).encode('utf-8'))
+    try:
+        digest.update(pd.util.hash_pandas_object(df, index=True).to_numpy().tobytes())
+    except TypeError:
+        # Células com objetos não hasheáveis pelo pandas (ex: listas)
+        digest.update(pickle.dumps(df, protocol=pickle.HIGHEST_PROTOCOL))
+    return digest.hexdigest()
+
+def normalize_prompt(prompt):
+    """Forma canônica da pergunta para o cache: Unicode NFKC, sem diferença de caixa,
+    espaços repetidos ou pontuação final."""
+    text = unicodedata.normalize('NFKC', prompt).casefold()
+    return re.sub(r'\s+', ' ', text).strip().rstrip('?!.;: ').strip()
+
+class AnswerCache:
+    """Cache LRU de respostas, indexado por (pergunta normalizada, hash dos dados)."""
+
+    def __init__(self, maxsize=ANSWER_CACHE_SIZE):
+        self.maxsize = maxsize
+        self.entries = collections.OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    def get(self, prompt, data_hash):
+        key = (normalize_prompt(prompt), data_hash)
+        if key in self.entries:
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return self.entries[key]
+        self.misses += 1
+        return None
+
+    def put(self, prompt, data_hash, answer):
+        key = (normalize_prompt(prompt), data_hash)
+        self.entries[key] = answer
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)
+
+    def clear(self):
+        self.entries.clear()
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {'hits': self.hits, 'misses': self.misses, 'size': len(self.entries), 'maxsize': self.maxsize,
+                'hit_rate': self.hits / total if total else None}
+
+# --- Roteador de Intenções (perguntas de agregação respondidas pelo cubo) ---
+#
+# Reconhece perguntas como "valor total por etapa", "quantas oportunidades em
+# negociação", "qual GSN tem o maior valor em aberto" ou "ticket médio por produto
+# por mês". É conservador: se sobrar qualquer palavra fora do vocabulário abaixo
+# (ou dos valores das dimensões na planilha), a pergunta vai para o agente.
+
+# (termos, medida); termos mais longos primeiro, para "valor médio" não virar "valor"
+MEASURE_TERMS = [
+    (('ticket medio', 'valor medio', 'media de valor', 'media do valor', 'media dos valores'), 'TICKET_MEDIO'),
+    (('media de dias previstos', 'media dos dias previstos', 'dias previstos', 'media de dias', 'prazo medio',
+      'tempo medio', 'dias para fechar', 'dias ate o fechamento', 'dias ate fechar'), 'DIAS_PREVISTOS_MEDIO'),
+    (('valor total', 'soma do valor', 'soma dos valores', 'total de valor', 'valor', 'valores', 'receita',
+      'volume', 'faturamento'), 'VALOR_TOTAL'),
+    (('numero de oportunidades', 'quantidade de oportunidades', 'total de oportunidades', 'quantas', 'quantos',
+      'quantidade', 'contagem', 'numero'), 'OPORTUNIDADES'),
+]
+DIMENSION_TERMS = {
+    'ETAPA_ATUAL': ('etapa atual', 'etapas', 'etapa', 'fases', 'fase', 'estagio', 'estagios'),
+    'ESN': ('esns', 'esn', 'vendedores', 'vendedor', 'executivos', 'executivo'),
+    'GSN': ('gsns', 'gsn', 'gerentes', 'gerente'),
+    'PRODUTO_SUGERIDO': ('produtos sugeridos', 'produto sugerido', 'produtos', 'produto'),
+    'PRODUTO_DA_OPORTUNIDADE': ('produtos da oportunidade', 'produto da oportunidade'),
+    'ORIGEM': ('origens', 'origem', 'canais', 'canal'),
+    'TIPO_DE_ATUACAO': ('tipos de atuacao', 'tipo de atuacao', 'atuacao', 'tipos', 'tipo'),
+    MONTH_DIMENSION: ('mes previsto de fechamento', 'mes de fechamento', 'mes previsto', 'meses', 'mes',
+                      'mensal', 'mensalmente'),
+}
+OPEN_TERMS = ('em aberto', 'abertas', 'abertos', 'aberta', 'aberto', 'em andamento', 'pipeline')
+HIGHEST_TERMS = ('maior', 'mais', 'maximo', 'lider')
+LOWEST_TERMS = ('menor', 'menos', 'minimo')
+# Trechos sem efeito na consulta ("previsão de fechamento" não é a etapa Fechamento)
+FILLER_PHRASES = ('previsao de fechamento', 'data de fechamento', 'data provavel de fechamento',
+                  'previsto de fechamento', 'para fechamento', 'ate o fechamento', 'por cada', 'de cada')
+FILLER_WORDS = set("""
+    qual quais o a os as e de do da dos das em no na nos nas por para com cada estao esta
+    sao foi total geral sugerido sugerida sugeridos oportunidade oportunidades negocio negocios deals
+    me mostre mostra mostrar liste listar lista informe diga calcule ver ranking agrupado agrupada
+    separado separada dividido dividida quebra previsto prevista previstos previstas atual atualmente
+    hoje planilha dados um uma
+""".split())
+# Verbos aceitos só em perguntas de ranking ("qual GSN tem o maior valor"); fora delas,
+# "quantos ESN existem?" / "quantos vendedores temos?" perguntam outra coisa e vão para o agente
+RANK_VERBS = ('tem', 'possui', 'teve')
+# Contagens sem "oportunidades": com uma dimensão, "quantos ESN?" pede o número de ESNs distintos
+COUNT_WORDS = ('quantas', 'quantos', 'quantidade', 'contagem', 'numero')
+
+AMBIGUOUS_LABELS = {'fechamento', 'base', 'ganho', 'evento', 'novos'}
+
+def _plain(text):
+    """Minúsculas, sem acentos e sem pontuação (para casar termos e valores das dimensões)."""
+    text = unicodedata.normalize('NFKD', str(text).casefold())
+    text = ''.join(ch for ch in text if not unicodedata.combining(ch))
+    return re.sub(r'\s+', ' ', re.sub(r'[^\w$-]+', ' ', text)).strip()
+
+def _take(text, phrases, prefix=''):
+    """Remove as ocorrências de `phrases` (palavras inteiras); retorna (texto restante, frases encontradas)."""
+    found = []
+    for phrase in sorted(phrases, key=len, reverse=True):
+        pattern = rf'\b{prefix}{re.escape(phrase)}\b'
+        if re.search(pattern, text):
+            found.append(phrase)
+            text = re.sub(pattern, ' ', text)
+    return text, found
+
+def _title(text):
+    """Primeira letra maiúscula sem mexer no resto ("ESN" continua "ESN")."""
+    return text[:1].upper() + text[1:]
+
+def _format_measure(measure, value):
+    if value is None or pd.isna(value):
+        return '-'
+    if measure == 'OPORTUNIDADES':
+        return f"{int(value):,}"
+    if measure == 'DIAS_PREVISTOS_MEDIO':
+        return f"{value:,.1f} dias"
+    return f"R$ {value:,.2f}"
+
+def _scope_text(scope, measures, by, filters):
+    if scope == 'abertas' or MONTH_DIMENSION in by or MONTH_DIMENSION in filters or 'DIAS_PREVISTOS_MEDIO' in measures:
+        return "oportunidades em aberto"
+    return "todas as oportunidades da planilha"
+
+def parse_question(prompt, cube):
+    """Interpreta a pergunta como consulta ao cubo: dict (measures, by, filters, scope, rank) ou None."""
+    text = _plain(prompt)
+    labels = {dim: {_plain(value): value for value in values if _plain(value)} for dim, values in cube.labels.items()}
+    text, _ = _take(text, FILLER_PHRASES)
+
+    # Filtros: valores das dimensões, com o nome da dimensão opcional antes ("etapa de negociação").
+    # Valores que também são palavras comuns ("base", "fechamento") exigem esse contexto ou "em/na/no".
+    filters = {}
+    candidates = sorted(((plain, dim, value) for dim, values in labels.items() for plain, value in values.items()),
+                        key=lambda item: len(item[0]), reverse=True)
+    for plain, dim, value in candidates:
+        if dim == MONTH_DIMENSION:
+            continue
+        context = '|'.join(re.escape(term) for term in DIMENSION_TERMS.get(dim, ()) + ('em', 'na', 'no', 'nas', 'nos'))
+        optional = '' if plain in AMBIGUOUS_LABELS else '?'
+        pattern = rf'\b(?:(?:{context}) (?:de |do |da )?){optional}{re.escape(plain)}\b'
+        if re.search(pattern, text):
+            if dim in filters and filters[dim] != value:
+                return None   # Mais de um valor da mesma dimensão: deixa para o agente
+            filters[dim] = value
+            text = re.sub(pattern, ' ', text)
+
+    measures, bare_count = [], False
+    for terms, measure in MEASURE_TERMS:
+        text, found = _take(text, terms)
+        if found and measure not in measures:
+            measures.append(measure)
+        bare_count = bare_count or any(term in COUNT_WORDS for term in found)
+
+    by = []
+    for dim, terms in DIMENSION_TERMS.items():
+        if dim not in labels:
+            continue
+        text, found = _take(text, terms)
+        if found and dim not in filters:
+            by.append(dim)
+
+    text, open_found = _take(text, OPEN_TERMS)
+    text, highest = _take(text, HIGHEST_TERMS)
+    text, lowest = _take(text, LOWEST_TERMS)
+    if highest or lowest:
+        text, _ = _take(text, RANK_VERBS)
+    leftover = [word for word in text.split() if word not in FILLER_WORDS]
+    if leftover:
+        return None
+    if not measures:
+        if not (by or filters) or not re.search(r'\boportunidades?\b', _plain(prompt)):
+            return None
+        measures = ['OPORTUNIDADES']
+    if len([dim for dim in by if dim != MONTH_DIMENSION]) > 1 or (highest and lowest):
+        return None
+    if bare_count and by and not re.search(r'\b(?:oportunidades?|por|cada)\b', _plain(prompt)):
+        return None   # Número de valores distintos da dimensão: o cubo não tem essa medida
+    if (highest or lowest) and not by:
+        return None
+    return {'measures': measures, 'by': by, 'filters': filters, 'scope': 'abertas' if open_found else 'todas',
+            'rank': 'max' if highest else 'min' if lowest else None}
+
+def route_question(prompt, cube, max_rows=50):
+    """Resposta da pergunta a partir do cubo (markdown) ou None se ela não for de agregação."""
+    if cube is None:
+        return None
+    with timed('chat.roteador'):
+        intent = parse_question(prompt, cube)
+        if intent is None:
+            return None
+        measures, by, filters = intent['measures'], intent['by'], intent['filters']
+        by = sorted(by, key=list(DIMENSIONS).index)
+        table = cube.query(measures, by=by, filters=filters, scope=intent['scope'])
+        if table is None:
+            return None
+
+        scope = _scope_text(intent['scope'], measures, by, filters)
+        where = ''.join(f", {DIMENSIONS[dim]} = {value}" for dim, value in filters.items())
+        footer = f"\n\n_Calculado direto da planilha ({scope}{where}), sem o agente._"
+        if not by:
+            row = table.iloc[0]
+            parts = [f"{_title(MEASURES[m])}: **{_format_measure(m, row[m])}**" for m in measures]
+            return ' · '.join(parts) + footer
+        if table.empty:
+            return "Nenhuma oportunidade encontrada para esse filtro." + footer
+
+        if intent['rank']:
+            values = table[measures[0]].dropna()
+            if values.empty:
+                return None
+            key = values.idxmax() if intent['rank'] == 'max' else values.idxmin()
+            names = ' / '.join(str(k) for k in (key if isinstance(key, tuple) else (key,)))
+            dims = ' e '.join(DIMENSIONS[dim] for dim in by)
+            which = 'maior' if intent['rank'] == 'max' else 'menor'
+            details = ' · '.join(f"{MEASURES[m]}: {_format_measure(m, table.loc[key, m])}" for m in measures)
+            return f"{_title(dims)} com {which} {MEASURES[measures[0]]}: **{names}** ({details})" + footer
+
+        if MONTH_DIMENSION not in by:
+            table = table.sort_values(measures[0], ascending=False)
+        shown = table.head(max_rows)
+        header = [_title(DIMENSIONS[dim]) for dim in by] + [_title(MEASURES[m]) for m in measures]
+        lines = ['| ' + ' | '.join(header) + ' |', '|' + '---|' * len(header)]
+        for key, row in shown.iterrows():
+            keys = key if isinstance(key, tuple) else (key,)
+            cells = [str(k) for k in keys] + [_format_measure(m, row[m]) for m in measures]
+            lines.append('| ' + ' | '.join(cells) + ' |')
+        if len(table) > max_rows:
+            lines.append(f"\n({len(table) - max_rows} linhas omitidas)")
+        return '\n'.join(lines) + footer
+
+class AgentSession:
+    """Agente e cache de respostas de uma sessão do chat (guardado em st.session_state).
+
+    Perguntas de agregação são respondidas pelo cubo (route_question), sem agente.
+    O agente só é recriado quando muda a chave (hash dos dados, modelo, temperatura
+    e chave da API). Perguntas repetidas sobre os mesmos dados são respondidas pelo
+    cache, sem chamar o LLM; respostas com erro não entram no cache. `agent_factory`
+    (padrão: create_agent) permite injetar um LLM falso em testes e benchmarks.
+    """
+
+    def __init__(self, agent_factory=create_agent, cache_size=ANSWER_CACHE_SIZE):
+        self.agent_factory = agent_factory
+        self.answers = AnswerCache(cache_size)
+        self.agent = None
+        self.key = None
+        self.builds = 0
+        self.routed = 0
+
+    def get_agent(self, df, openai_api_key, temperature, model=MODEL_NAME, data_hash=None):
+        """Agente para estes dados e configurações (reaproveitado se nada mudou)."""
+        data_hash = data_hash or dataframe_hash(df)
+        key = (data_hash, model, temperature, hashlib.sha256((openai_api_key or '').encode('utf-8')).hexdigest())
+        if self.agent is None or key != self.key:
+            self.agent = self.agent_factory(df, openai_api_key, temperature, model=model)
+            self.key = key
+            self.builds += 1
+        return self.agent
+
+    def ask(self, df, prompt, openai_api_key, temperature, model=MODEL_NAME, data_hash=None, timeout=60, cube=None):
+        """Responde à pergunta; retorna (resposta, origem), com origem 'cubo', 'cache' ou 'agente'."""
+        answer = route_question(prompt, cube)
+        if answer is not None:
+            self.routed += 1
+            return answer, 'cubo'
+        data_hash = data_hash or dataframe_hash(df)
+        answer = self.answers.get(prompt, data_hash)
+        if answer is not None:
+            return answer, 'cache'
+        agent = self.get_agent(df, openai_api_key, temperature, model, data_hash)
+        if agent is None:
+            return NO_AGENT, 'agente'
+        try:
+            answer = invoke_agent(agent, prompt, timeout)
+        except Exception as e:
+            return error_message(e), 'agente'
+        if answer != NO_ANSWER:
+            self.answers.put(prompt, data_hash, answer)
+        return answer, 'agente'
 
 #def run_agent(agent, prompt: str):
 #    """
@@ -0,0 +1,186 @@
+import argparse
+import datetime
+import hashlib
+import json
+import mmap
+import os
+import pickle
+import struct
+import zlib
+
+import numpy as np
+
+# --- Formato do Pacote do Modelo ---
+#
+#   MAGIC | pickle comprimido (zlib) | buffers dos arrays (alinhados, sem compressão) | manifesto JSON | tamanho | MAGIC
+#
+# O pickle usa o protocolo 5 com buffers fora de banda: os arrays numéricos ficam fora
+# do fluxo comprimido e, na carga, viram visões somente leitura de um mmap do arquivo.
+# Processos que carregam o mesmo pacote compartilham essas páginas (cache do sistema)
+# em vez de cada um manter uma cópia. O manifesto fica no fim do arquivo e pode ser
+# lido sem carregar o modelo.
+
+MAGIC = b'FECHBNDL'
+FORMAT_VERSION = 1
+ALIGNMENT = 64
+COMPRESSION_LEVEL = 6
+_TRAILER = struct.Struct('<Q8s')
+
+class Bundle:
+    """Pacote carregado: o Pipeline, a lista de features e o manifesto."""
+
+    def __init__(self, model, manifest):
+        self.model = model
+        self.manifest = manifest
+
+    @property
+    def features(self):
+        return self.manifest['features']
+
+    @property
+    def metadata(self):
+        return self.manifest.get('metadata') or {}
+
+def category_vocabularies(model):
+    """Categorias conhecidas pelo encoder do Pipeline ({coluna: [categorias]})."""
+    try:
+        transformer = model.named_steps['preprocessor'].named_transformers_['cat']
+        columns = model.named_steps['preprocessor'].transformers_[0][2]
+    except (AttributeError, KeyError, IndexError):
+        return {}
+    return {col: [str(value) for value in categories]
+            for col, categories in zip(columns, getattr(transformer, 'categories_', []))}
+
+def _json_default(value):
+    """Escalares do numpy (ex: métricas) viram números do Python; o resto vira texto."""
+    return value.item() if isinstance(value, np.generic) else str(value)
+
+def _pad(f, alignment=ALIGNMENT):
+    f.write(b'\0' * (-f.tell() % alignment))
+
+def save_bundle(path, model, features, schema=None, metrics=None, metadata=None):
+    """Grava o pacote do modelo e retorna o manifesto.
+
+    `schema` ({feature: dtype}) é o tipo de cada feature no treino (ex: 'category',
+    'float32'), conferido na carga contra o que o pré-processamento produz. O arquivo
+    é gravado ao lado e renomeado no fim: uma gravação interrompida não corrompe o pacote atual.
+    """
+    buffers = []
+    payload = zlib.compress(pickle.dumps(model, protocol=5, buffer_callback=buffers.append),
+                            COMPRESSION_LEVEL)
+    digest = hashlib.sha256(payload)
+    layout = []
+    partial = f"{path}.tmp"
+    with open(partial, 'wb') as f:
+        f.write(MAGIC)
+        payload_offset = f.tell()
+        f.write(payload)
+        for buffer in buffers:
+            raw = buffer.raw()
+            _pad(f)
+            layout.append({'offset': f.tell(), 'length': raw.nbytes})
+            f.write(raw)
+            digest.update(raw)
+
+        manifest = {
+            'format': FORMAT_VERSION,
+            'created_at': datetime.datetime.now().isoformat(timespec='seconds'),
+            'content_hash': digest.hexdigest(),
+            'features': list(features),
+            'schema': dict(schema or {}),
+            'categories': category_vocabularies(model),
+            'metrics': metrics or {},
+            'metadata': metadata or {},
+            'payload': {'offset': payload_offset, 'length': len(payload)},
+            'buffers': layout,
+        }
+        encoded = json.dumps(manifest, ensure_ascii=False, default=_json_default).encode('utf-8')
+        f.write(encoded)
+        f.write(_TRAILER.pack(len(encoded), MAGIC))
+    os.replace(partial, path)
+    return manifest
+
+def read_manifest(path):
+    """Lê apenas o manifesto (no fim do arquivo), sem desserializar o modelo."""
+    with open(path, 'rb') as f:
+        size = f.seek(0, 2)
+        if size < len(MAGIC) + _TRAILER.size:
+            raise ValueError(f"'{path}' não é um pacote de modelo válido.")
+        f.seek(size - _TRAILER.size)
+        length, magic = _TRAILER.unpack(f.read(_TRAILER.size))
+        if magic != MAGIC:
+            raise ValueError(f"'{path}' não é um pacote de modelo válido.")
+        f.seek(size - _TRAILER.size - length)
+        manifest = json.loads(f.read(length).decode('utf-8'))
+    if manifest.get('format') != FORMAT_VERSION:
+        raise ValueError(f"Versão do pacote não suportada: {manifest.get('format')}.")
+    return manifest
+
+def load_bundle(path, verify=True, writable=False):
+    """Carrega o pacote; os arrays numéricos do modelo são mapeados do arquivo (somente leitura).
+
+    Com `verify`, confere o hash do conteúdo antes de desserializar. Com `writable`, os
+    arrays são copiados para a memória (necessário para continuar o treino do modelo).
+    """
+    manifest = read_manifest(path)
+    with open(path, 'rb') as f:
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    view = memoryview(mapped)
+    payload = view[manifest['payload']['offset']:manifest['payload']['offset'] + manifest['payload']['length']]
+    buffers = [view[b['offset']:b['offset'] + b['length']] for b in manifest['buffers']]
+
+    if verify:
+        digest = hashlib.sha256(payload)
+        for buffer in buffers:
+            digest.update(buffer)
+        if digest.hexdigest() != manifest['content_hash']:
+            raise ValueError(f"Pacote '{path}' corrompido: o hash do conteúdo não confere.")
+
+    if writable:
+        buffers = [bytearray(buffer) for buffer in buffers]
+    model = pickle.loads(zlib.decompress(payload), buffers=buffers)
+    return Bundle(model, manifest)
+
+def check_schema(manifest, df):
+    """Confere se `df` (saída do pré-processamento) tem as features e os tipos do treino.
+
+    Retorna a lista de problemas encontrados (vazia se estiver tudo certo).
+    """
+    problems = [f"feature ausente: {col}" for col in manifest['features'] if col not in df.columns]
+    for col, expected in manifest.get('schema', {}).items():
+        if col not in df.columns:
+            continue
+        actual = str(df[col].dtype)
+        # Tipos do pandas (ex: category) não são tipos do numpy: só são compatíveis se forem iguais
+        numeric = isinstance(df[col].dtype, np.dtype) and np.issubdtype(df[col].dtype, np.number)
+        compatible = (actual == expected or
+                      (numeric and expected != 'category' and np.issubdtype(np.dtype(expected), np.number)))
+        if not compatible:
+            problems.append(f"{col}: tipo {actual}, esperado {expected}")
+    return problems
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Criação e inspeção do pacote do modelo.")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    pack = subparsers.add_parser('pack', help="Cria um pacote a partir dos pickles do modelo e das features.")
+    pack.add_argument('model_path', nargs='?', default='modelo_fechamento.pkl')
+    pack.add_argument('features_path', nargs='?', default='features_list.pkl')
+    pack.add_argument('--output', default='modelo_fechamento.bundle')
+    inspect = subparsers.add_parser('inspect', help="Mostra o manifesto de um pacote.")
+    inspect.add_argument('path', nargs='?', default='modelo_fechamento.bundle')
+    args = parser.parse_args()
+
+    if args.command == 'pack':
+        import joblib
+
+        from schema import CATEGORICAL_FEATURES
+
+        features = joblib.load(args.features_path)
+        schema = {col: 'category' if col in CATEGORICAL_FEATURES else 'float32' for col in features}
+        manifest = save_bundle(args.output, joblib.load(args.model_path), features, schema=schema)
+        print(f"Pacote salvo em {args.output} ({len(manifest['buffers'])} arrays fora do pickle).")
+    else:
+        manifest = read_manifest(args.path)
+        manifest['categories'] = {col: f"{len(values)} categorias" for col, values in manifest['categories'].items()}
+        manifest['buffers'] = f"{len(manifest['buffers'])} arrays, {sum(b['length'] for b in manifest['buffers']):,} bytes"
+        print(json.dumps(manifest, indent=2, ensure_ascii=False))
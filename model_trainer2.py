@@ -1,24 +1,91 @@
+import argparse
+import datetime
+import os
+import sys
+import tempfile
 import pandas as pd
-import requests
-import re
-import time
-from sklearn.model_selection import train_test_split
-from sklearn.ensemble import GradientBoostingRegressor
-from sklearn.preprocessing import OneHotEncoder
+from sklearn.experimental import enable_halving_search_cv  # noqa: F401 (habilita o HalvingRandomSearchCV)
+from sklearn.model_selection import HalvingRandomSearchCV, TimeSeriesSplit
+from sklearn.ensemble import GradientBoostingRegressor, HistGradientBoostingRegressor
+from sklearn.preprocessing import OneHotEncoder, OrdinalEncoder
 from sklearn.compose import ColumnTransformer
 from sklearn.pipeline import Pipeline
-from sklearn.metrics import mean_absolute_error, r2_score
+from sklearn.base import clone
+from sklearn.metrics import mean_absolute_error, mean_pinball_loss, r2_score
 import joblib
+from joblib import Memory
 import numpy as np
+from cnpj_enrichment import API_URL, CNPJ_COLUMN, ENRICHMENT_COLUMNS, enrich_data
+from cnpj_cache import CnpjCache
+from data_io import read_table, write_table
+from schema import ALL_FEATURES, CATEGORICAL_FEATURES, DATE_COLUMNS, apply_dtypes
+from pipeline_stages import CHECKPOINT_DIR, Stage, StagedPipeline
+from model_bundle import load_bundle, read_manifest, save_bundle
+from instrumentation import (configure_logging, enable, env_enabled, instrument, run_records, start_run,
+                             summary_table, timed, write_prometheus)
 
 # --- Variáveis de Configuração ---
 FILE_PATH = r"C:\Klug\Python\Projeto_15 - Fechemanto Oportunidade\vendas.xlsx"
-API_URL = "https://brasilapi.com.br/api/cnpj/v1/"
-ENRICHMENT_COLUMNS = [
-    'CNAE_FISCAL', 'PORTE', 'NATUREZA_JURIDICA', 
-    'DATA_INICIO_ATIVIDADE', 'SITUACAO_CADASTRAL', 'UF', 'MUNICIPIO'
-]
-CNPJ_COLUMN = 'CNPJ'
+CNPJ_CACHE_PATH = 'cnpj_cache.sqlite' # Cache persistente das consultas à BrasilAPI
+ENRICHED_PATH = 'vendas_enriquecidas.csv' # Use .parquet para manter os tipos e acelerar a releitura
+MODEL_PATH = 'modelo_fechamento.pkl'
+FEATURES_PATH = 'features_list.pkl'
+BUNDLE_PATH = 'modelo_fechamento.bundle' # Modelo, features, esquema, métricas e metadados (versão, high-water mark) em um arquivo
+
+# Etapas do treinamento; cada uma grava um checkpoint em CHECKPOINT_DIR e é pulada
+# quando suas entradas (arquivo, configuração e etapas anteriores) não mudaram
+STAGES = ['ingest', 'enrich', 'feature-build', 'train', 'evaluate', 'export', 'quantiles', 'update']
+
+# --- Treino Incremental (--incremental) ---
+# Só as oportunidades fechadas depois da última DATA_DA_VENDA usada no modelo (high-water mark)
+# disparam uma atualização; o modelo ganha INCREMENTAL_ESTIMATORS árvores (warm start) em vez
+# de ser treinado do zero
+INCREMENTAL_ESTIMATORS = 30
+MIN_NEW_ROWS = 10       # Com menos vendas novas, espera acumular (o high-water mark não avança)
+DRIFT_THRESHOLD = 1.5   # MAE nas vendas novas acima de 1.5x o MAE da validação -> treino completo
+FULL_REFIT_EVERY = 8    # Treino completo a cada 8 atualizações incrementais
+
+# Modelos de quantis (--quantiles): P10, P50 e P90 dos dias até o fechamento, usados
+# na projeção de receita com intervalos (Monte Carlo) da aplicação
+QUANTILES = [0.1, 0.5, 0.9]
+QUANTILE_MODELS_PATH = 'modelos_quantis.pkl'
+
+# Tipo de modelo:
+#   'gbr' - OneHotEncoder denso + GradientBoostingRegressor (modelo original, single-thread)
+#   'hgb' - HistGradientBoostingRegressor com suporte nativo a categorias (multi-thread, sem one-hot,
+#           trata categorias novas e valores ausentes como "missing")
+MODEL_TYPE = 'gbr'
+
+# O histograma do HistGradientBoosting aceita no máximo 255 categorias por feature;
+# as menos frequentes (ex: MUNICIPIO, CNAE_FISCAL) são agrupadas em uma categoria "infrequente"
+HGB_MAX_CATEGORIES = 255
+
+# Validação temporal: as oportunidades mais recentes (por DATA_CICLO_DE_BUSCA) ficam fora do treino
+HOLDOUT_FRACTION = 0.2
+
+# --- Busca de Hiperparâmetros (--tune) ---
+TUNING_RESULTS_PATH = 'resultados_tuning.csv'
+CV_SPLITS = 4          # Dobras do TimeSeriesSplit (sempre treina no passado e valida no futuro)
+TUNING_CANDIDATES = 40 # Combinações sorteadas na primeira rodada do successive halving
+TUNING_FACTOR = 3      # A cada rodada só 1/3 dos candidatos segue, com 3x mais dados
+
+# Espaço de busca de cada tipo de modelo (os valores sugeridos nos comentários de build_pipeline)
+PARAM_DISTRIBUTIONS = {
+    'gbr': {
+        'regressor__n_estimators': [200, 300, 500],
+        'regressor__learning_rate': [0.1, 0.05, 0.02, 0.01],
+        'regressor__max_depth': [3, 4, 5],
+        'regressor__min_samples_split': [2, 5, 10, 20],
+        'regressor__min_samples_leaf': [1, 3, 5, 10],
+    },
+    'hgb': {
+        'regressor__max_iter': [200, 300, 500],
+        'regressor__learning_rate': [0.1, 0.05, 0.02, 0.01],
+        'regressor__max_depth': [3, 4, 5, None],
+        'regressor__min_samples_leaf': [5, 10, 20, 40],
+        'regressor__l2_regularization': [0.0, 0.1, 1.0],
+    },
+}
 
 # Porte da empresa
 # 01 MICROEMPRESA - Empresa com Receita Bruta Anual de até R$ 360.000,00 
@@ -33,220 +100,465 @@ CNPJ_COLUMN = 'CNPJ'
 # 08 BAIXADA - A empresa foi extinta ou encerrada definitivamente.
 # 01 NULA - A inscrição do CNPJ foi invalidada por motivo de fraude ou vício
 
-# --- Funções de Enriquecimento ---
+# --- Funções de Treinamento ---
 
-def clean_cnpj(cnpj):
-    """Remove formatação do CNPJ, deixando apenas números."""
-    if pd.isna(cnpj):
-        return None
-    cleaned = re.sub(r'[^0-9]', '', str(cnpj))
-    return cleaned if len(cleaned) == 14 else None
+# Colunas que o treino usa: CNPJ (enriquecimento), features e datas (alvo e ordem temporal)
+INGEST_COLUMNS = list(dict.fromkeys([CNPJ_COLUMN] + ALL_FEATURES + DATE_COLUMNS))
 
-def get_cnpj_data(cnpj_clean):
-    """Consulta a API BrasilAPI para obter dados do CNPJ."""
-    if not cnpj_clean or len(cnpj_clean) != 14:
-        return None
+@instrument('treino.leitura', rows=len)
+def ingest(file_path=FILE_PATH):
+    """Carrega a planilha de vendas."""
+    # Usar o caminho do arquivo diretamente, assumindo que está no mesmo diretório ou o caminho é ajustado
+    # Aceita .xlsx, .csv ou .parquet; os nomes das colunas já saem padronizados e tipados.
+    # Só as colunas de INGEST_COLUMNS são lidas (as que faltarem no arquivo são ignoradas)
+    return read_table(file_path, columns=INGEST_COLUMNS)
+
+@instrument('treino.enriquecimento', rows=len)
+def enrich(df):
+    """Enriquece com dados do CNPJ e salva o resultado.
+
+    O arquivo salvo (ENRICHED_PATH) tem só as colunas lidas em `ingest` (INGEST_COLUMNS)
+    mais as colunas do enriquecimento, não a planilha inteira.
+    """
+    # Enriquecer os dados
+    with CnpjCache(CNPJ_CACHE_PATH) as cnpj_cache:
+        df = enrich_data(df, cache=cnpj_cache)
     
-    url = f"{API_URL}{cnpj_clean}"
-    try:
-        response = requests.get(url, timeout=30)
-        
-        if response.status_code == 404:
-            print(f"CNPJ {cnpj_clean} não encontrado (404).")
-            return None
-        
-        if response.status_code == 400:
-            print(f"CNPJ {cnpj_clean} inválido ou não encontrado (400).")
-            return None
-        
-        if response.status_code == 429:
-            # Se for 429, levanta exceção para que o loop principal possa lidar com o erro
-            response.raise_for_status()
-        
-        response.raise_for_status() # Levanta exceção para códigos de status HTTP ruins (4xx ou 5xx)
-        data = response.json()
-        print(f"Dados do CNPJ {cnpj_clean} obtidos com sucesso.")
-        
-        # Extrair os campos desejados
-        extracted_data = {
-            'CNAE_FISCAL': data.get('cnae_fiscal'),
-            'PORTE': data.get('porte'),
-            'NATUREZA_JURIDICA': data.get('natureza_juridica'),
-            'DATA_INICIO_ATIVIDADE': data.get('data_inicio_atividade'),
-            'SITUACAO_CADASTRAL': data.get('situacao_cadastral'),
-            'UF': data.get('uf'),
-            'MUNICIPIO': data.get('municipio')
-        }
-        return extracted_data
-    except requests.exceptions.HTTPError as e:
-        # Captura erros HTTP que não são 404 (já tratado)
-        print(f"Erro HTTP ao consultar API para CNPJ {cnpj_clean}: {e}")
-        return None
-    except requests.exceptions.RequestException as e:
-        # Captura outros erros de requisição (timeout, conexão, etc.)
-        print(f"Erro de requisição ao consultar API para CNPJ {cnpj_clean}: {e}")
+    # Colunas enriquecidas também passam a usar os tipos compactos (category / float32)
+    df = apply_dtypes(df)
+    
+    # Salvar o DataFrame enriquecido (CSV ou Parquet, conforme a extensão)
+    write_table(df, ENRICHED_PATH)
+    print(f"\nDados enriquecidos salvos em: {ENRICHED_PATH}")
+    return df
+
+def prepare_training_data(df):
+    """Seleciona as oportunidades fechadas e retorna (X, y, lista de features)."""
+    df_fechadas = df[df['DATA_DA_VENDA'].notna()].copy()
+    df_fechadas['DATA_DA_VENDA'] = pd.to_datetime(df_fechadas['DATA_DA_VENDA'])
+    df_fechadas['DATA_CICLO_DE_BUSCA'] = pd.to_datetime(df_fechadas['DATA_CICLO_DE_BUSCA'])
+    df_fechadas['DIAS_PARA_FECHAMENTO'] = (df_fechadas['DATA_DA_VENDA'] - df_fechadas['DATA_CICLO_DE_BUSCA']).dt.days
+    df_fechadas = df_fechadas[df_fechadas['DIAS_PARA_FECHAMENTO'] > 0] # Filtrar dias inválidos
+
+    # Ordem cronológica: as divisões de validação usam as oportunidades mais recentes como teste
+    df_fechadas = df_fechadas.sort_values('DATA_CICLO_DE_BUSCA', kind='stable')
+
+    # Definição de Features (X) e Target (y)
+    # As listas de features (categóricas, incluindo as colunas enriquecidas, e numéricas) ficam em schema.py
+    # Filtrar o DataFrame para incluir apenas as features que existem (algumas podem ter sido removidas se não existiam)
+    # Isso é uma medida de segurança, embora o código de enriquecimento garanta que existam.
+    existing_features = [f for f in ALL_FEATURES if f in df_fechadas.columns]
+
+    X = df_fechadas[existing_features]
+    y = df_fechadas['DIAS_PARA_FECHAMENTO']
+    return X, y, existing_features
+
+@instrument('treino.features', rows=lambda data: len(data['X']))
+def build_features(df, holdout_fraction=HOLDOUT_FRACTION):
+    """Monta X e y e separa as oportunidades mais recentes para validação."""
+    X, y, existing_features = prepare_training_data(df)
+    X_train, X_test, y_train, y_test = temporal_split(X, y, holdout_fraction)
+    return {'X': X, 'y': y, 'features': existing_features, 'closed_at': df.loc[X.index, 'DATA_DA_VENDA'],
+            'X_train': X_train, 'X_test': X_test, 'y_train': y_train, 'y_test': y_test}
+
+def temporal_split(X, y, holdout_fraction=HOLDOUT_FRACTION):
+    """Separa as últimas `holdout_fraction` linhas (as mais recentes) para validação."""
+    cut = int(len(X) * (1 - holdout_fraction))
+    return X.iloc[:cut], X.iloc[cut:], y.iloc[:cut], y.iloc[cut:]
+
+def build_pipeline(existing_features, model_type=MODEL_TYPE, memory=None):
+    """Cria o Pipeline (pré-processamento + modelo) para o tipo de modelo escolhido.
+
+    Os dois tipos recebem o mesmo DataFrame com as colunas de `existing_features`,
+    então a aplicação carrega qualquer um deles da mesma forma. `memory` (joblib.Memory)
+    guarda em disco a matriz já codificada pelo pré-processamento.
+    """
+    # Atualizar a lista de features categóricas para o preprocessor
+    categorical_features_for_preprocessor = [f for f in CATEGORICAL_FEATURES if f in existing_features]
+
+    if model_type == 'hgb':
+        # Categorias viram códigos inteiros; desconhecidas e ausentes viram -1, que o
+        # HistGradientBoosting trata como valor ausente
+        preprocessor = ColumnTransformer(
+            transformers=[
+                ('cat', OrdinalEncoder(handle_unknown='use_encoded_value', unknown_value=-1,
+                                       encoded_missing_value=-1, max_categories=HGB_MAX_CATEGORIES),
+                 categorical_features_for_preprocessor)
+            ],
+            remainder='passthrough' # Manter colunas numéricas
+        )
+        # As colunas categóricas saem primeiro do ColumnTransformer
+        regressor = HistGradientBoostingRegressor(
+            max_iter=300, learning_rate=0.05, max_depth=4, random_state=42,
+            categorical_features=list(range(len(categorical_features_for_preprocessor)))
+        )
+    elif model_type == 'gbr':
+        # Pré-processamento: One-Hot Encoding para variáveis categóricas
+        preprocessor = ColumnTransformer(
+            transformers=[
+                ('cat', OneHotEncoder(handle_unknown='ignore', sparse_output=False), categorical_features_for_preprocessor)
+            ],
+            remainder='passthrough' # Manter colunas numéricas
+        )
+        #Abaixo estão os parâmetros mais importantes para deixar o modelo mais forte:
+        #a) n_estimators (quantidade de árvores)
+        #   Aumentar → melhora a previsão, mas deixa mais lento. Valor recomendado para testar: 200, 300, 500
+        #b) learning_rate (passo de aprendizado)
+        #   Muito alto → overfitting
+        #   Muito baixo → modelo lento para aprender, mas mais preciso. Recomendado testar: 0.05, 0.02, 0.01
+        #c) max_depth (profundidade das árvores)
+        #   Controla a capacidade de aprender padrões.
+        #   Profundidades menores reduzem overfitting. Testar: 3, 4, 5
+        #d) min_samples_split e min_samples_leaf
+        #   Controlam o mínimo de dados por divisão/folha.
+        #   Ajudam muito contra overfitting.
+        #
+        # Overfitting é quando o modelo “decorou” os dados de treino em vez de aprender o padrão real. 
+        # Ele fica ótimo no treino, mas vai mal em dados novos porque não generaliza.
+        regressor = GradientBoostingRegressor(n_estimators=300, learning_rate=0.05, max_depth=4, random_state=42)
+    else:
+        raise ValueError(f"Tipo de modelo desconhecido: '{model_type}'. Use 'gbr' ou 'hgb'.")
+
+    return Pipeline(steps=[
+        ('preprocessor', preprocessor),
+        ('regressor', regressor)
+    ], memory=memory)
+
+def as_quantile(pipeline, model_type, quantile):
+    """Mesmo Pipeline (com os mesmos hiperparâmetros), treinado para prever o quantil `quantile`."""
+    if model_type == 'hgb':
+        return clone(pipeline).set_params(regressor__loss='quantile', regressor__quantile=quantile)
+    return clone(pipeline).set_params(regressor__loss='quantile', regressor__alpha=quantile)
+
+def fit_quantiles(template, model_type, data, path=QUANTILE_MODELS_PATH):
+    """Treina um modelo por quantil com os hiperparâmetros de `template` e salva em `path`.
+
+    Cada modelo é avaliado na validação temporal (perda pinball e cobertura do intervalo)
+    e depois treinado com todos os dados.
+    """
+    models, predictions = {}, {}
+    for quantile in QUANTILES:
+        model = as_quantile(template, model_type, quantile)
+        with timed(f"treino.fit_p{int(quantile * 100)}", rows=len(data['X_train'])):
+            model.fit(data['X_train'], data['y_train'])
+        predictions[quantile] = model.predict(data['X_test'])
+        loss = mean_pinball_loss(data['y_test'], predictions[quantile], alpha=quantile)
+        print(f"P{int(quantile * 100)}: perda pinball {loss:.2f} dias")
+        models[quantile] = model.fit(data['X'], data['y'])
+    low, high = predictions[min(QUANTILES)], predictions[max(QUANTILES)]
+    coverage = np.mean((data['y_test'] >= low) & (data['y_test'] <= high))
+    print(f"Cobertura do intervalo P{int(min(QUANTILES) * 100)}-P{int(max(QUANTILES) * 100)} "
+          f"na validação temporal: {coverage:.0%}")
+    joblib.dump(models, path)
+    print(f"Modelos de quantis salvos em: '{path}'.")
+    return models
+
+# --- Metadados e Atualização Incremental ---
+
+def stages_param(model_type):
+    """Parâmetro do Pipeline com o número de árvores de cada tipo de modelo."""
+    return 'regressor__max_iter' if model_type == 'hgb' else 'regressor__n_estimators'
+
+def load_metadata(path=BUNDLE_PATH):
+    """Metadados do modelo salvo, lidos do manifesto do pacote (ou None, se ainda não houver pacote)."""
+    if not os.path.exists(path):
         return None
-    except Exception as e:
-        # Captura erros inesperados (ex: erro ao processar JSON)
-        print(f"Erro inesperado ao processar dados do CNPJ {cnpj_clean}: {e}")
+    return read_manifest(path)['metadata'] or None
+
+@instrument('treino.salvar_modelo')
+def save_model(model, data, metadata, metrics=None):
+    """Salva o pacote do modelo e, por compatibilidade, os pickles do modelo e das features.
+
+    O pacote guarda também o tipo de cada feature no treino, conferido na carga pela aplicação.
+    """
+    features = data['features']
+    schema = {col: str(data['X'][col].dtype) for col in features}
+    save_bundle(BUNDLE_PATH, model, features, schema=schema, metrics=metrics, metadata=metadata)
+    joblib.dump(model, MODEL_PATH)
+    joblib.dump(features, FEATURES_PATH)
+    print(f"\nModelo e artefatos salvos: '{BUNDLE_PATH}', '{MODEL_PATH}' e '{FEATURES_PATH}' "
+          f"(versão {metadata['version']}, {metadata['mode']}).")
+
+def build_metadata(model, model_type, data, mode, baseline_mae, previous=None, base_estimators=None):
+    """Metadados de uma versão do modelo; `previous` são os metadados da versão anterior."""
+    previous = previous or {}
+    return {
+        'version': previous.get('version', 0) + 1,
+        'mode': mode,
+        'trained_at': datetime.datetime.now().isoformat(timespec='seconds'),
+        'model_type': model_type,
+        'high_water_mark': data['closed_at'].max().isoformat(),
+        'n_rows': len(data['X']),
+        'n_estimators': model.get_params()[stages_param(model_type)],
+        'base_estimators': base_estimators or previous.get('base_estimators'),
+        'incremental_updates': previous.get('incremental_updates', 0) + 1 if mode == 'incremental' else 0,
+        'baseline_mae': baseline_mae,
+        'features': data['features'],
+    }
+
+def refit_template(model, metadata):
+    """Modelo salvo sem treino, com o número de árvores do último treino completo."""
+    return clone(model).set_params(**{stages_param(metadata['model_type']): metadata['base_estimators']})
+
+def full_refit(template, model_type, data):
+    """Treino completo: avalia na validação temporal e treina o modelo final com todos os dados."""
+    with timed('treino.fit', rows=len(data['X_train'])):
+        model = clone(template).fit(data['X_train'], data['y_train'])
+    mae, _ = evaluate(model, data['X_test'], data['y_test'])
+    with timed('treino.fit_final', rows=len(data['X'])):
+        return model.fit(data['X'], data['y']), mae
+
+def warm_start(model, model_type, X, y, n_new=INCREMENTAL_ESTIMATORS):
+    """Acrescenta `n_new` árvores ao modelo já treinado, mantendo o pré-processamento.
+
+    As árvores existentes não mudam; as novas são ajustadas aos resíduos do modelo atual
+    em (X, y). O encoder mantém o vocabulário do treino completo (categorias novas
+    continuam tratadas como desconhecidas até o próximo treino completo).
+    """
+    preprocessor = model.named_steps['preprocessor']
+    regressor = model.named_steps['regressor']
+    param = stages_param(model_type).split('__')[1]
+    regressor.set_params(warm_start=True, **{param: regressor.get_params()[param] + n_new})
+    with timed('treino.warm_start', rows=len(X)):
+        regressor.fit(preprocessor.transform(X), y)
+    regressor.set_params(warm_start=False)
+    return model
+
+def incremental_update(data):
+    """Atualiza o modelo salvo com as oportunidades fechadas depois do high-water mark.
+
+    Decide entre não fazer nada (poucas vendas novas), acrescentar árvores (warm start)
+    ou treinar do zero (sem metadados, deriva acima de DRIFT_THRESHOLD ou a cada
+    FULL_REFIT_EVERY atualizações). No treino completo, os modelos de quantis já salvos
+    são treinados de novo junto com o modelo principal; no warm start, continuam os do
+    último treino completo. Retorna os metadados da versão resultante.
+    """
+    metadata = load_metadata()
+    if metadata is None:
+        print("Modelo sem metadados: é necessário um treino completo (sem --incremental).")
         return None
 
-def enrich_data(df):
-    """Enriquece o DataFrame com dados do CNPJ, usando cache e lógica de preenchimento."""
-    
-    # 1. Garantir que as colunas de enriquecimento existam
-    for col in ENRICHMENT_COLUMNS:
-        if col not in df.columns:
-            df[col] = np.nan
+    model_type = metadata['model_type']
+    model = load_bundle(BUNDLE_PATH, writable=True).model
+    new = (data['closed_at'] > pd.Timestamp(metadata['high_water_mark'])).to_numpy()
+    print(f"Versão {metadata['version']} ({model_type}), dados até {metadata['high_water_mark'][:10]}: "
+          f"{new.sum()} oportunidades fechadas depois disso.")
+    if new.sum() < MIN_NEW_ROWS:
+        print(f"Menos de {MIN_NEW_ROWS} vendas novas: modelo mantido.")
+        return metadata
 
-    # 2. Limpar a coluna CNPJ
-    df['CNPJ_CLEAN'] = df[CNPJ_COLUMN].apply(clean_cnpj)
-    
-    # 3. Identificar linhas que precisam de enriquecimento (onde CNAE_FISCAL está vazio)
-    # Usamos .isna() para verificar valores NaN ou None
-    df_to_enrich = df[df['CNAE_FISCAL'].isna()].copy()
-    
-    if df_to_enrich.empty:
-        print("Todos os dados de CNPJ já estão preenchidos. Pulando consulta à API.")
-        return df
+    # Deriva: erro do modelo atual nas vendas novas comparado ao erro da validação do último treino completo
+    mae_new, _ = evaluate(model, data['X'][new], data['y'][new])
+    drift = mae_new / metadata['baseline_mae']
+    print(f"MAE nas vendas novas: {mae_new:.2f} dias ({drift:.2f}x o MAE de referência).")
 
-    print(f"Iniciando enriquecimento para {len(df_to_enrich)} CNPJs...")
-    
-    # 4. Processar CNPJs únicos para otimizar chamadas (cache implícito)
-    unique_cnpjs = df_to_enrich['CNPJ_CLEAN'].dropna().unique()
-    cnpj_cache = {}
-    
-    for i, cnpj in enumerate(unique_cnpjs):
-        if cnpj not in cnpj_cache:
-            print(f"Consultando API para CNPJ {cnpj} ({i+1}/{len(unique_cnpjs)})...")
-            try:
-                data = get_cnpj_data(cnpj)
-                cnpj_cache[cnpj] = data
-            except requests.exceptions.HTTPError as e:
-                if e.response.status_code == 429:
-                    print(f"Erro 429 (Too Many Requests) para CNPJ {cnpj}. Pausando por 60 segundos...")
-                    time.sleep(60)
-                    # Tenta novamente o mesmo CNPJ
-                    data = get_cnpj_data(cnpj)
-                    cnpj_cache[cnpj] = data
-                else:
-                    raise e # Re-lança outros erros HTTP
-            
-            time.sleep(3.0) # Delay para evitar sobrecarga na API
-        
-        # Atualizar o DataFrame original com os dados do cache
-        if cnpj_cache[cnpj]:
-            # Encontrar todos os índices no DataFrame original que correspondem a este CNPJ
-            indices = df[df['CNPJ_CLEAN'] == cnpj].index
-            
-            for key, value in cnpj_cache[cnpj].items():
-                # Atualizar apenas se o valor for válido (não None ou vazio)
-                if value is not None and value != '':
-                    df.loc[indices, key] = value
-    
-    print("Enriquecimento de dados concluído.")
-    
-    # Remover a coluna CNPJ_CLEAN temporária
-    df = df.drop(columns=['CNPJ_CLEAN'])
-    
-    return df
+    if drift > DRIFT_THRESHOLD or metadata['incremental_updates'] + 1 >= FULL_REFIT_EVERY:
+        reason = 'deriva acima do limite' if drift > DRIFT_THRESHOLD else f"{FULL_REFIT_EVERY} atualizações incrementais"
+        print(f"Treino completo ({reason}).")
+        template = refit_template(model, metadata)
+        model, mae = full_refit(template, model_type, data)
+        metadata = build_metadata(model, model_type, data, 'full', mae, metadata)
+        metrics = {'mae': mae}
+        refit_quantiles = os.path.exists(QUANTILE_MODELS_PATH)
+    else:
+        print(f"Acrescentando {INCREMENTAL_ESTIMATORS} árvores ao modelo (warm start).")
+        model = warm_start(model, model_type, data['X'], data['y'])
+        metadata = build_metadata(model, model_type, data, 'incremental', metadata['baseline_mae'], metadata)
+        metrics = {'mae_new': mae_new, 'drift': drift}
+        refit_quantiles = False
+
+    save_model(model, data, metadata, metrics)
+    if refit_quantiles:
+        # As faixas P10-P90 da aplicação precisam vir de modelos treinados com os mesmos dados
+        fit_quantiles(template, model_type, data)
+    return metadata
+
+def pipeline_config(pipeline):
+    """Hiperparâmetros do Pipeline em formato serializável (entram na impressão digital da etapa de treino)."""
+    simple = (str, int, float, bool, type(None))
+    return {
+        key: value for key, value in pipeline.get_params(deep=True).items()
+        if isinstance(value, simple) or (isinstance(value, (list, tuple)) and all(isinstance(v, simple) for v in value))
+    }
+
+def evaluate(model, X_test, y_test):
+    """Retorna (MAE, R²) do modelo nas oportunidades de validação."""
+    with timed('treino.predict', rows=len(X_test)):
+        y_pred = model.predict(X_test)
+    return mean_absolute_error(y_test, y_pred), r2_score(y_test, y_pred)
+
+def tune(X, y, existing_features, model_type=MODEL_TYPE, n_candidates=TUNING_CANDIDATES,
+         cv_splits=CV_SPLITS, n_jobs=-1, results_path=TUNING_RESULTS_PATH):
+    """Busca hiperparâmetros com successive halving e validação cruzada temporal.
+
+    `X` deve estar em ordem cronológica (ver prepare_training_data). Cada rodada
+    avalia os candidatos com uma fração dos dados e só o terço melhor segue para a
+    próxima, com mais dados. O pré-processamento de cada dobra é calculado uma única
+    vez e reaproveitado por todos os candidatos (cache do Pipeline em disco).
+    Retorna o HalvingRandomSearchCV ajustado e grava a tabela de resultados em CSV.
+    """
+    with tempfile.TemporaryDirectory(prefix='cache_treino_') as cache_dir:
+        pipeline = build_pipeline(existing_features, model_type, memory=Memory(cache_dir, verbose=0))
+        search = HalvingRandomSearchCV(
+            pipeline,
+            PARAM_DISTRIBUTIONS[model_type],
+            n_candidates=n_candidates,
+            factor=TUNING_FACTOR,
+            resource='n_samples',
+            cv=TimeSeriesSplit(n_splits=cv_splits),
+            scoring='neg_mean_absolute_error',
+            n_jobs=n_jobs,
+            random_state=42, # Mesma subamostra para todos os candidatos da rodada (aproveita o cache)
+            verbose=1,
+        )
+        search.fit(X, y)
+        # O modelo final não depende do diretório de cache temporário
+        search.best_estimator_.set_params(memory=None)
+
+    results = pd.DataFrame(search.cv_results_)
+    params = [col for col in results.columns if col.startswith('param_')]
+    results = results[['iter', 'n_resources', 'rank_test_score', 'mean_test_score', 'std_test_score',
+                       'mean_fit_time'] + params]
+    results['mean_test_score'] = -results['mean_test_score'] # MAE em dias (positivo)
+    results = results.rename(columns={'mean_test_score': 'mae_cv', 'std_test_score': 'mae_cv_std'})
+    results = results.sort_values(['iter', 'mae_cv'], ascending=[False, True])
+    results.to_csv(results_path, index=False)
+    return search, results
+
+# --- Etapas do Pipeline ---
+
+def build_stages(args):
+    """Cria as etapas do treinamento a partir das opções da linha de comando."""
+    def run_train(inputs):
+        data = inputs['feature-build']
+        if args.tune:
+            with timed('treino.busca', rows=len(data['X_train'])):
+                search, results = tune(data['X_train'], data['y_train'], data['features'], args.model,
+                                       n_candidates=args.candidates, cv_splits=args.cv_splits, n_jobs=args.n_jobs)
+            print(f"\nMelhores candidatos (MAE médio na validação cruzada, última rodada):")
+            print(results.head(10).to_string(index=False))
+            print(f"\nTabela completa salva em: {TUNING_RESULTS_PATH}")
+            return search.best_estimator_
+        model = build_pipeline(data['features'], args.model)
+        with timed('treino.fit', rows=len(data['X_train'])):
+            return model.fit(data['X_train'], data['y_train'])
+
+    def run_evaluate(inputs):
+        # Avaliação nas oportunidades mais recentes (não usadas no treino nem na busca)
+        data = inputs['feature-build']
+        mae, r2 = evaluate(inputs['train'], data['X_test'], data['y_test'])
+        print(f"\nMétricas de avaliação ({args.model}, validação temporal: {len(data['X_test'])} oportunidades mais recentes):")
+        print(f"MAE (Erro Absoluto Médio): {mae:.2f} dias")
+        print(f"R-quadrado: {r2:.2f}")
+        return {'mae': mae, 'r2': r2, 'n_test': len(data['X_test'])}
+
+    def run_export(inputs):
+        # Modelo final: mesmos hiperparâmetros, treinado com todos os dados disponíveis
+        data = inputs['feature-build']
+        with timed('treino.fit_final', rows=len(data['X'])):
+            model = clone(inputs['train']).fit(data['X'], data['y'])
+        base_estimators = model.get_params()[stages_param(args.model)]
+        save_model(model, data, build_metadata(
+            model, args.model, data, 'full', inputs['evaluate']['mae'], load_metadata(), base_estimators),
+            metrics=inputs['evaluate'])
+        return model
+
+    def run_quantiles(inputs):
+        # Um modelo por quantil, com os hiperparâmetros do modelo principal
+        return fit_quantiles(inputs['train'], args.model, inputs['feature-build'])
+
+    def run_update_quantiles(inputs):
+        # O treino completo da atualização já refaz os quantis existentes; aqui só se ainda não existem
+        metadata = inputs['update']
+        if metadata is None or os.path.exists(QUANTILE_MODELS_PATH):
+            return None
+        template = refit_template(load_bundle(BUNDLE_PATH).model, metadata)
+        return fit_quantiles(template, metadata['model_type'], inputs['feature-build'])
+
+    train_config = {'model': args.model, 'tune': args.tune, 'params': pipeline_config(build_pipeline(ALL_FEATURES, args.model))}
+    if args.tune:
+        train_config.update(candidates=args.candidates, cv_splits=args.cv_splits, factor=TUNING_FACTOR,
+                            distributions=PARAM_DISTRIBUTIONS[args.model])
+
+    stages = [
+        # As colunas lidas entram na impressão digital: outra projeção invalida o checkpoint
+        Stage('ingest', lambda inputs: ingest(args.input), config={'input': args.input, 'columns': INGEST_COLUMNS},
+              files=[args.input]),
+        Stage('enrich', lambda inputs: enrich(inputs['ingest']), deps=['ingest'],
+              config={'api_url': API_URL, 'columns': ENRICHMENT_COLUMNS}, outputs=[ENRICHED_PATH]),
+        # 'format' muda quando o conteúdo do checkpoint muda (2: inclui as datas de venda)
+        Stage('feature-build', lambda inputs: build_features(inputs['enrich']), deps=['enrich'],
+              config={'features': ALL_FEATURES, 'holdout': HOLDOUT_FRACTION, 'format': 2}),
+    ]
+    if args.incremental:
+        # Os metadados mudam a cada versão salva, então a etapa roda de novo depois de cada atualização
+        stages.append(Stage('update', lambda inputs: incremental_update(inputs['feature-build']),
+                            deps=['feature-build'], config={'model': load_metadata()},
+                            outputs=[BUNDLE_PATH, MODEL_PATH, FEATURES_PATH]))
+        if args.quantiles:
+            stages.append(Stage('quantiles', run_update_quantiles, deps=['feature-build', 'update'],
+                                config={'quantiles': QUANTILES, 'path': QUANTILE_MODELS_PATH},
+                                outputs=[QUANTILE_MODELS_PATH]))
+        return stages
+
+    stages += [
+        Stage('train', run_train, deps=['feature-build'], config=train_config,
+              outputs=[TUNING_RESULTS_PATH] if args.tune else []),
+        Stage('evaluate', run_evaluate, deps=['feature-build', 'train']),
+        Stage('export', run_export, deps=['feature-build', 'train', 'evaluate'],
+              config={'bundle_path': BUNDLE_PATH, 'model_path': MODEL_PATH, 'features_path': FEATURES_PATH},
+              outputs=[BUNDLE_PATH, MODEL_PATH, FEATURES_PATH]),
+    ]
+    if args.quantiles:
+        stages.append(Stage('quantiles', run_quantiles, deps=['feature-build', 'train'],
+                            config={'quantiles': QUANTILES, 'path': QUANTILE_MODELS_PATH},
+                            outputs=[QUANTILE_MODELS_PATH]))
+    return stages
 
 # --- Script Principal ---
 
-# 1. Carregar os dados
-try:
-    # Usar o caminho do arquivo diretamente, assumindo que está no mesmo diretório ou o caminho é ajustado
-    df = pd.read_excel(FILE_PATH)
-    
-    # Padronizar nomes das colunas (mantido do código original)
-    df.columns = df.columns.str.strip().str.replace(' ', '_').str.replace('Á', 'A').str.replace('Ã', 'A').str.replace('Ç', 'C').str.replace('Ê', 'E').str.replace('Õ', 'O').str.replace('Ú', 'U').str.upper()
-    
-    # 2. Enriquecer os dados
-    df = enrich_data(df)
-    
-    # 3. Salvar o DataFrame enriquecido em CSV (conforme solicitado)
-    output_csv_path = 'vendas_enriquecidas.csv'
-    df.to_csv(output_csv_path, index=False)
-    print(f"\nDados enriquecidos salvos em: {output_csv_path}")
-    
-except Exception as e:
-    print(f"Erro fatal durante o processamento: {e}")
-    exit()
-
-# 4. Preparação dos dados de treinamento (Oportunidades Fechadas)
-df_fechadas = df[df['DATA_DA_VENDA'].notna()].copy()
-df_fechadas['DATA_DA_VENDA'] = pd.to_datetime(df_fechadas['DATA_DA_VENDA'])
-df_fechadas['DATA_CICLO_DE_BUSCA'] = pd.to_datetime(df_fechadas['DATA_CICLO_DE_BUSCA'])
-df_fechadas['DIAS_PARA_FECHAMENTO'] = (df_fechadas['DATA_DA_VENDA'] - df_fechadas['DATA_CICLO_DE_BUSCA']).dt.days
-df_fechadas = df_fechadas[df_fechadas['DIAS_PARA_FECHAMENTO'] > 0] # Filtrar dias inválidos
-
-# 5. Definição de Features (X) e Target (y)
-# Adicionar as novas colunas categóricas
-categorical_features = [
-    'ORIGEM', 'ETAPA_ATUAL', 'ESN', 'GSN', 'TIPO_DE_ATUACAO',
-    'PRODUTO_DA_OPORTUNIDADE', 'PRODUTO_SUGERIDO',
-    'CNAE_FISCAL', 'PORTE', 'NATUREZA_JURIDICA', 'SITUACAO_CADASTRAL', 'UF', 'MUNICIPIO'
-]
-numerical_features = ['VALOR_SUGERIDO']
-all_features = categorical_features + numerical_features
-
-# Filtrar o DataFrame para incluir apenas as features que existem (algumas podem ter sido removidas se não existiam)
-# Isso é uma medida de segurança, embora o código de enriquecimento garanta que existam.
-existing_features = [f for f in all_features if f in df_fechadas.columns]
-
-X = df_fechadas[existing_features]
-y = df_fechadas['DIAS_PARA_FECHAMENTO']
-
-# 6. Pré-processamento: One-Hot Encoding para variáveis categóricas
-# Atualizar a lista de features categóricas para o preprocessor
-categorical_features_for_preprocessor = [f for f in categorical_features if f in existing_features]
-
-preprocessor = ColumnTransformer(
-    transformers=[
-        ('cat', OneHotEncoder(handle_unknown='ignore', sparse_output=False), categorical_features_for_preprocessor)
-    ],
-    remainder='passthrough' # Manter colunas numéricas
-)
-
-# 7. Criação do Pipeline: Pré-processamento + Modelo
-    #Abaixo estão os parâmetros mais importantes para deixar o modelo mais forte:
-    #a) n_estimators (quantidade de árvores)
-    #   Aumentar → melhora a previsão, mas deixa mais lento. Valor recomendado para testar: 200, 300, 500
-    #b) learning_rate (passo de aprendizado)
-    #   Muito alto → overfitting
-    #   Muito baixo → modelo lento para aprender, mas mais preciso. Recomendado testar: 0.05, 0.02, 0.01
-    #c) max_depth (profundidade das árvores)
-    #   Controla a capacidade de aprender padrões.
-    #   Profundidades menores reduzem overfitting. Testar: 3, 4, 5
-    #d) min_samples_split e min_samples_leaf
-    #   Controlam o mínimo de dados por divisão/folha.
-    #   Ajudam muito contra overfitting.
-    #
-    # Overfitting é quando o modelo “decorou” os dados de treino em vez de aprender o padrão real. 
-    # Ele fica ótimo no treino, mas vai mal em dados novos porque não generaliza.
-
-model = Pipeline(steps=[
-    ('preprocessor', preprocessor),
-    ('regressor', GradientBoostingRegressor(n_estimators=300, learning_rate=0.05, max_depth=4, random_state=42))
-])
-
-# 8. Treinamento do modelo (usando todos os dados disponíveis para um modelo final)
-model.fit(X, y)
-
-# 9. Avaliação (apenas para fins de demonstração no console)
-y_pred = model.predict(X)
-mae = mean_absolute_error(y, y_pred)
-r2 = r2_score(y, y_pred)
-
-print(f"\nTreinamento concluído.")
-print(f"Métricas de avaliação (no conjunto de treinamento):")
-print(f"MAE (Erro Absoluto Médio): {mae:.2f} dias")
-print(f"R-quadrado: {r2:.2f}")
-
-# 10. Salvar o modelo treinado e a lista de features
-joblib.dump(model, 'modelo_fechamento.pkl')
-joblib.dump(existing_features, 'features_list.pkl')
-
-print("\nModelo e artefatos salvos: 'modelo_fechamento.pkl' e 'features_list.pkl'.")
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Treina o modelo de previsão de fechamento.")
+    parser.add_argument('--model', choices=['gbr', 'hgb'], default=MODEL_TYPE,
+                        help="'gbr' (OneHot + GradientBoosting) ou 'hgb' (HistGradientBoosting com categorias nativas).")
+    parser.add_argument('--input', default=FILE_PATH, help="Planilha de vendas (.xlsx, .csv ou .parquet).")
+    parser.add_argument('--from-stage', choices=STAGES,
+                        help="Executa novamente a partir desta etapa, mesmo com checkpoints válidos.")
+    parser.add_argument('--only', choices=STAGES,
+                        help="Executa apenas esta etapa (as anteriores são lidas dos checkpoints).")
+    parser.add_argument('--checkpoint-dir', default=CHECKPOINT_DIR, help="Diretório dos checkpoints das etapas.")
+    parser.add_argument('--tune', action='store_true',
+                        help="Busca os hiperparâmetros com validação cruzada temporal antes de treinar.")
+    parser.add_argument('--candidates', type=int, default=TUNING_CANDIDATES,
+                        help="Número de combinações sorteadas na busca (--tune).")
+    parser.add_argument('--cv-splits', type=int, default=CV_SPLITS, help="Dobras da validação cruzada temporal (--tune).")
+    parser.add_argument('--quantiles', action='store_true',
+                        help=f"Treina também os modelos de quantis (P10/P50/P90) e salva em {QUANTILE_MODELS_PATH}.")
+    parser.add_argument('--incremental', action='store_true',
+                        help="Atualiza o modelo salvo só com as vendas novas (warm start), em vez de treinar do zero.")
+    parser.add_argument('--n-jobs', type=int, default=-1, help="Processos da busca (-1 = todos os núcleos).")
+    parser.add_argument('--metrics', metavar='ARQUIVO',
+                        help="Mede as etapas (tempo, linhas, memória), registra em JSON no stderr e grava os "
+                             "acumulados no formato do Prometheus neste arquivo (ex: metricas_treino.prom).")
+    args = parser.parse_args(argv)
+
+    if args.metrics or env_enabled():
+        enable()
+        configure_logging()
+        start_run()
 
+    pipeline = StagedPipeline(build_stages(args), checkpoint_dir=args.checkpoint_dir)
+    try:
+        pipeline.run(from_stage=args.from_stage, only=args.only)
+    except Exception as e:
+        print(f"Erro fatal durante o processamento: {e}")
+        sys.exit(1)  # Status diferente de zero: agendadores e scripts percebem a falha
+    finally:
+        if run_records():
+            print(f"\nTempos por etapa:\n{summary_table(run_records())}")
+        if args.metrics:
+            write_prometheus(args.metrics)
+            print(f"Métricas salvas em: {args.metrics}")
 
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,235 @@
+import atexit
+import multiprocessing
+import os
+import shutil
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date
+from multiprocessing import shared_memory
+
+import joblib
+import numpy as np
+import pyarrow as pa
+
+from compiled_model import try_compile
+from data_io import concat_parts, file_format, part_suffix, read_row_groups, row_group_sizes, write_part
+from model_bundle import read_manifest
+from scoring import FEATURES_PATH, load_model, predict_closing_days, preprocess_data
+
+# --- Pontuação em Paralelo (processos) ---
+#
+# Cada processo carrega o modelo uma única vez (no inicializador); com o pacote
+# (.bundle), os arrays do modelo são mapeados do arquivo e as páginas ficam
+# compartilhadas entre os processos pelo cache do sistema.
+#
+# Arquivos (`score_file`): o arquivo .parquet é dividido pelos row groups, e cada
+# processo lê os seus direto do arquivo (mapeado em memória), pré-processa, prevê e
+# grava a sua parte da saída (Arrow IPC, ou o próprio CSV). O processo principal não
+# lê nem pré-processa os dados: distribui os row groups e anexa cada parte à saída,
+# na ordem original, assim que ela fica pronta (enquanto as seguintes são pontuadas).
+#
+# DataFrames já em memória (`predict`, usado com o armazenamento de previsões para as
+# linhas novas ou alteradas): as fatias vão no formato Arrow IPC, gravadas em um único
+# segmento de memória compartilhada que os processos leem sem cópia.
+
+SHARD_ROWS = 50_000   # Linhas por tarefa (no máximo); com poucas linhas, uma tarefa por processo
+START_METHOD = 'spawn'  # Processos novos: seguro mesmo quando o processo pai tem threads (ex: Streamlit)
+
+# --- Lado dos Processos ---
+
+_worker = {}
+
+def _init_worker(model_path, features_path, compile_model):
+    model, features_list = load_model(model_path, features_path)
+    _worker['model'] = try_compile(model) if compile_model else model
+    _worker['features'] = features_list
+    _worker['segments'] = {}
+
+def _attach(name):
+    """Segmento de memória compartilhada `name` (aberto uma vez; os anteriores são fechados)."""
+    segments = _worker['segments']
+    if name not in segments:
+        for old in list(segments):
+            try:
+                segments.pop(old).close()
+            except BufferError:
+                pass  # Ainda referenciado: fecha quando o processo terminar
+        segments[name] = shared_memory.SharedMemory(name=name)
+    return segments[name]
+
+def _read_shard(name, offset, length):
+    buffer = pa.py_buffer(_attach(name).buf).slice(offset, length)
+    return pa.ipc.open_stream(buffer).read_all().to_pandas()
+
+def _ping(delay):
+    time.sleep(delay)
+    return os.getpid()
+
+def _predict_shard(name, offset, length):
+    """Previsões do modelo para uma fatia de features já pré-processadas."""
+    start = time.process_time()
+    X = _read_shard(name, offset, length)
+    predictions = np.asarray(_worker['model'].predict(X[_worker['features']]))
+    return predictions, time.process_time() - start
+
+def _score_row_groups(path, groups, columns, today, part_path):
+    """Lê os row groups `groups` de `path`, pontua as oportunidades em aberto e grava em `part_path`.
+
+    Retorna (linhas lidas, linhas pontuadas, tempo de CPU).
+    """
+    start = time.process_time()
+    chunk = read_row_groups(path, groups, columns)
+    df_abertas = preprocess_data(chunk, _worker['features'])
+    if not df_abertas.empty:
+        df_results = predict_closing_days(df_abertas, _worker['model'], _worker['features'], today=today)
+        write_part(df_results, part_path)
+    return len(chunk), len(df_abertas), time.process_time() - start
+
+# --- Lado do Processo Principal ---
+
+def _features_of(model_path, features_path):
+    """Lista de features sem desserializar o modelo."""
+    if str(model_path).endswith('.bundle'):
+        return read_manifest(model_path)['features']
+    return joblib.load(features_path)
+
+def _write_shards(segment, table, shards, sizes):
+    """Grava cada fatia de `table` como um stream Arrow IPC no segmento; retorna o início de cada uma.
+
+    As mensagens do Arrow têm tamanho múltiplo de 8, então as fatias ficam alinhadas.
+    (Em uma função à parte para que as referências ao segmento terminem no retorno.)
+    """
+    memory = np.frombuffer(segment.buf, dtype=np.uint8)
+    offsets = np.concatenate([[0], np.cumsum(sizes)[:-1]]).astype(int)
+    for (start, length), offset, size in zip(shards, offsets, sizes):
+        sink = pa.FixedSizeBufferWriter(pa.py_buffer(memory[offset:offset + size]))
+        with pa.ipc.new_stream(sink, table.schema) as writer:
+            writer.write_table(table.slice(start, length))
+    return offsets
+
+class ParallelScorer:
+    """Pool de processos para pontuar grandes volumes de oportunidades.
+
+    `score_file(entrada, saída)` pontua um arquivo .parquet inteiro nos processos.
+    `predict(X)` tem a mesma interface do modelo (pode ser passado a predict_days,
+    predict_closing_days ou predict_days_delta). `stats` acumula o tempo de CPU gasto
+    nos processos e o tempo do processo principal.
+    """
+
+    def __init__(self, model_path, features_path=FEATURES_PATH, workers=None, compile_model=True,
+                 shard_rows=SHARD_ROWS, start_method=START_METHOD):
+        self.workers = workers or os.cpu_count() or 1
+        self.shard_rows = shard_rows
+        self.features_list = list(_features_of(model_path, features_path))
+        self.executor = ProcessPoolExecutor(
+            self.workers, mp_context=multiprocessing.get_context(start_method),
+            initializer=_init_worker, initargs=(model_path, features_path, compile_model))
+        self.stats = {'shards': 0, 'rows': 0, 'worker_cpu_seconds': 0.0, 'main_seconds': 0.0}
+        atexit.register(self.close)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        if self.executor is not None:
+            self.executor.shutdown()
+            self.executor = None
+
+    def warm_up(self):
+        """Sobe todos os processos (e carrega o modelo em cada um) antes da primeira fatia."""
+        futures = [self.executor.submit(_ping, 0.2) for _ in range(self.workers)]
+        return len({future.result() for future in futures})
+
+    def _shards(self, n_rows):
+        size = max(1, min(self.shard_rows, -(-n_rows // self.workers)))
+        return [(start, min(size, n_rows - start)) for start in range(0, n_rows, size)]
+
+    def _run(self, df, columns, task):
+        """Grava as fatias de `df[columns]` em memória compartilhada e executa `task` em cada uma, em ordem."""
+        main_start = time.perf_counter()
+        table = pa.Table.from_pandas(df[columns], preserve_index=False)
+        shards = self._shards(table.num_rows)
+        sizes = []
+        for start, length in shards:
+            sink = pa.MockOutputStream()
+            with pa.ipc.new_stream(sink, table.schema) as writer:
+                writer.write_table(table.slice(start, length))
+            sizes.append(sink.size())
+
+        segment = shared_memory.SharedMemory(create=True, size=max(1, sum(sizes)))
+        try:
+            offsets = _write_shards(segment, table, shards, sizes)
+            self.stats['main_seconds'] += time.perf_counter() - main_start
+            futures = [self.executor.submit(task, segment.name, int(offset), int(size))
+                       for offset, size in zip(offsets, sizes)]
+            results = [future.result() for future in futures]
+        finally:
+            segment.close()
+            segment.unlink()
+        self.stats['shards'] += len(shards)
+        self.stats['rows'] += table.num_rows
+        self.stats['worker_cpu_seconds'] += sum(result[-1] for result in results)
+        return shards, results
+
+    def predict(self, X):
+        """Previsões do modelo para `X` (features pré-processadas), na ordem das linhas."""
+        if len(X) == 0:
+            return np.empty(0)
+        _, results = self._run(X, list(X.columns), _predict_shard)
+        return np.concatenate([predictions for predictions, _ in results])
+
+    def _row_group_shards(self, sizes):
+        """Row groups consecutivos agrupados em tarefas de até `shard_rows` linhas (um row group nunca é dividido)."""
+        target = max(1, min(self.shard_rows, -(-sum(sizes) // self.workers)))
+        shards, current, rows = [], [], 0
+        for i, size in enumerate(sizes):
+            if current and rows + size > target:
+                shards.append(current)
+                current, rows = [], 0
+            current.append(i)
+            rows += size
+        if current:
+            shards.append(current)
+        return shards
+
+    def score_file(self, input_path, output_path, today=None, columns=None):
+        """Pontua as oportunidades em aberto de um arquivo .parquet e grava em `output_path` (.csv ou .parquet).
+
+        Cada processo lê os próprios row groups e grava a sua parte; as partes são
+        juntadas na ordem do arquivo (mesmo resultado de score_cli.score_file). Como
+        um row group não é dividido, o arquivo precisa de pelo menos um row group por
+        processo (`data_io.convert` grava blocos de CHUNK_SIZE linhas). Retorna um
+        dicionário com linhas lidas, linhas pontuadas e tarefas; em `stats`, o tempo do
+        processo principal é o de CPU (a espera pelos processos não conta).
+        """
+        main_start = time.process_time()
+        if file_format(input_path) != '.parquet':
+            raise ValueError("A pontuação em paralelo lê arquivos .parquet (converta com data_io.convert).")
+        today = today or date.today()  # A mesma data de referência em todos os processos
+        shards = self._row_group_shards(row_group_sizes(input_path))
+        suffix = part_suffix(output_path)
+        parts_dir = tempfile.mkdtemp(prefix='.partes_', dir=os.path.dirname(os.path.abspath(output_path)))
+        results = []
+
+        def finished_parts(futures, parts):
+            for future, part in zip(futures, parts):
+                results.append(future.result())
+                if os.path.exists(part):  # Sem oportunidades em aberto, a parte não é gravada
+                    yield part
+        try:
+            parts = [os.path.join(parts_dir, f"parte_{i:05d}{suffix}") for i in range(len(shards))]
+            futures = [self.executor.submit(_score_row_groups, input_path, groups, columns, today, part)
+                       for groups, part in zip(shards, parts)]
+            concat_parts(finished_parts(futures, parts), output_path)
+        finally:
+            shutil.rmtree(parts_dir, ignore_errors=True)
+        self.stats['main_seconds'] += time.process_time() - main_start
+        self.stats['shards'] += len(shards)
+        self.stats['rows'] += sum(result[0] for result in results)
+        self.stats['worker_cpu_seconds'] += sum(result[-1] for result in results)
+        return {'rows_read': sum(result[0] for result in results),
+                'rows_scored': sum(result[1] for result in results), 'chunks': len(shards)}
@@ -0,0 +1,130 @@
+import hashlib
+import json
+import os
+import time
+
+import joblib
+
+from instrumentation import timed
+
+# --- Variáveis de Configuração ---
+CHECKPOINT_DIR = 'checkpoints_treino'
+
+def file_sha256(path, block_size=1 << 20):
+    """Hash do conteúdo de um arquivo, lido em blocos."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+class Stage:
+    """Uma etapa do pipeline.
+
+    `func(inputs)` recebe {nome da dependência: resultado} e retorna o resultado da etapa.
+    `config` (valores serializáveis em JSON) e o conteúdo dos arquivos em `files` entram
+    na impressão digital da etapa; `outputs` são arquivos que a etapa grava e que,
+    se estiverem faltando, obrigam a etapa a rodar de novo.
+    """
+
+    def __init__(self, name, func, deps=(), config=None, files=(), outputs=()):
+        self.name = name
+        self.func = func
+        self.deps = list(deps)
+        self.config = config or {}
+        self.files = list(files)
+        self.outputs = list(outputs)
+
+class StagedPipeline:
+    """Executa etapas em ordem, com checkpoints em disco e retomada.
+
+    Cada etapa grava seu resultado (joblib) junto com a impressão digital das suas
+    entradas: configuração, arquivos lidos e impressões digitais das dependências.
+    Em uma nova execução, as etapas com a mesma impressão digital são puladas e o
+    resultado só é carregado do disco se alguma etapa seguinte precisar dele.
+    """
+
+    def __init__(self, stages, checkpoint_dir=CHECKPOINT_DIR, log=print):
+        self.stages = {stage.name: stage for stage in stages}
+        self.order = [stage.name for stage in stages]
+        self.checkpoint_dir = checkpoint_dir
+        self.log = log or (lambda message: None)
+        self._results = {}
+
+    def _paths(self, name):
+        base = os.path.join(self.checkpoint_dir, name)
+        return f"{base}.joblib", f"{base}.json"
+
+    def fingerprints(self):
+        """Impressão digital de cada etapa (não depende dos resultados, só das entradas)."""
+        fingerprints = {}
+        for name in self.order:
+            stage = self.stages[name]
+            payload = {
+                'stage': name,
+                'config': stage.config,
+                'files': {path: file_sha256(path) for path in stage.files},
+                'deps': {dep: fingerprints[dep] for dep in stage.deps},
+            }
+            encoded = json.dumps(payload, sort_keys=True, default=repr).encode('utf-8')
+            fingerprints[name] = hashlib.sha256(encoded).hexdigest()
+        return fingerprints
+
+    def _is_current(self, name, fingerprint):
+        data_path, meta_path = self._paths(name)
+        if not (os.path.exists(data_path) and os.path.exists(meta_path)):
+            return False
+        if not all(os.path.exists(path) for path in self.stages[name].outputs):
+            return False
+        with open(meta_path, encoding='utf-8') as f:
+            return json.load(f).get('fingerprint') == fingerprint
+
+    def _load(self, name):
+        if name not in self._results:
+            data_path, _ = self._paths(name)
+            if not os.path.exists(data_path):
+                raise FileNotFoundError(f"Checkpoint da etapa '{name}' não encontrado em {data_path}. "
+                                        f"Execute as etapas anteriores primeiro.")
+            self._results[name] = joblib.load(data_path)
+        return self._results[name]
+
+    def _save(self, name, result, fingerprint, seconds):
+        os.makedirs(self.checkpoint_dir, exist_ok=True)
+        data_path, meta_path = self._paths(name)
+        joblib.dump(result, data_path)
+        # Metadados gravados por último: um checkpoint interrompido nunca parece válido
+        with open(meta_path, 'w', encoding='utf-8') as f:
+            json.dump({'fingerprint': fingerprint, 'created_at': time.time(), 'seconds': seconds}, f)
+
+    def run(self, from_stage=None, only=None):
+        """Executa o pipeline e retorna {etapa: resultado} das etapas executadas.
+
+        `from_stage` força a execução dessa etapa e de todas as seguintes; `only`
+        executa apenas a etapa indicada, carregando as dependências dos checkpoints.
+        """
+        for name in (from_stage, only):
+            if name is not None and name not in self.stages:
+                raise ValueError(f"Etapa desconhecida: '{name}'. Use uma de {', '.join(self.order)}.")
+
+        fingerprints = self.fingerprints()
+        forced = set(self.order[self.order.index(from_stage):]) if from_stage else set()
+        selected = [only] if only else self.order
+        executed = {}
+
+        for name in selected:
+            stage = self.stages[name]
+            stale = any(dep in executed for dep in stage.deps)
+            if not (name == only or name in forced or stale or not self._is_current(name, fingerprints[name])):
+                self.log(f"[{name}] checkpoint válido, etapa pulada.")
+                continue
+
+            inputs = {dep: self._load(dep) for dep in stage.deps}
+            self.log(f"[{name}] executando...")
+            start = time.perf_counter()
+            with timed(f"etapa.{name}"):
+                result = stage.func(inputs)
+            seconds = time.perf_counter() - start
+            self._save(name, result, fingerprints[name], seconds)
+            self._results[name] = executed[name] = result
+            self.log(f"[{name}] concluída em {seconds:.1f} s.")
+        return executed
@@ -0,0 +1,113 @@
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+# --- Grid de Resultados (paginado no servidor) ---
+#
+# As colunas continuam tipadas (datas como datetime64, valores como número): ordenar
+# e filtrar usam os valores nativos, e só a página visível vai para o navegador, onde
+# o `column_config` formata valores e datas. A ordem de cada coluna é calculada uma
+# única vez (argsort estável) e o resultado do último filtro fica guardado, então
+# trocar de página custa só o recorte da página.
+
+# Colunas do grid (já padronizadas) e como aparecem na tela, na ordem de exibição
+GRID_COLUMNS = {
+    'NOME_DA_OPORTUNIDADE': 'Oportunidade',
+    'ETAPA_ATUAL': 'Etapa',
+    'ESN': 'ESN',
+    'VALOR_SUGERIDO': 'Valor Sugerido',
+    'DIAS_PREVISTOS': 'Dias Previstos (IA)',
+    'DATA_PROVAVEL_FECHAMENTO': 'Data Provável Fechamento',
+    'PREVISAO_DE_FECHAMENTO': 'Previsão Humana',
+    'FEELING_FECHAMENTO': 'Feeling Humano (%)',
+}
+FILTER_COLUMNS = ['ETAPA_ATUAL', 'ESN']
+DEFAULT_SORT = 'DATA_PROVAVEL_FECHAMENTO'
+PAGE_SIZES = (25, 50, 100, 250)
+PAGE_SIZE = 50
+
+def column_config(columns):
+    """Formatação de cada coluna no navegador (os dados enviados continuam tipados)."""
+    formats = {
+        'VALOR_SUGERIDO': st.column_config.NumberColumn(format='R$ %,.2f'),
+        'DIAS_PREVISTOS': st.column_config.NumberColumn(format='%d'),
+        'DATA_PROVAVEL_FECHAMENTO': st.column_config.DateColumn(format='DD/MM/YYYY'),
+        'PREVISAO_DE_FECHAMENTO': st.column_config.DateColumn(format='DD/MM/YYYY'),
+        'FEELING_FECHAMENTO': st.column_config.NumberColumn(format='%.0f'),
+    }
+    config = {}
+    for col in columns:
+        option = formats.get(col, st.column_config.Column())
+        option['label'] = GRID_COLUMNS[col]
+        config[col] = option
+    return config
+
+class ResultsGrid:
+    """Oportunidades com previsão, paginadas no servidor.
+
+    `page(...)` aplica os filtros e a ordenação sobre os valores nativos e retorna
+    (página do DataFrame, total de linhas após o filtro). Montado uma vez por upload.
+    """
+
+    def __init__(self, df_results):
+        self.columns = [col for col in GRID_COLUMNS if col in df_results.columns]
+        self.frame = df_results[self.columns].reset_index(drop=True)
+        for col in ('DATA_PROVAVEL_FECHAMENTO', 'PREVISAO_DE_FECHAMENTO'):
+            if col in self.frame.columns:
+                self.frame[col] = pd.to_datetime(self.frame[col], errors='coerce')
+        self.filter_columns = [col for col in FILTER_COLUMNS if col in self.columns]
+        for col in self.filter_columns:
+            if not isinstance(self.frame[col].dtype, pd.CategoricalDtype):
+                self.frame[col] = self.frame[col].astype('category')
+        self._orders = {}
+        self._last = None
+
+    def __len__(self):
+        return len(self.frame)
+
+    def options(self, col):
+        """Valores de um filtro, em ordem alfabética."""
+        return sorted(str(value) for value in self.frame[col].cat.categories)
+
+    def _order(self, col, ascending):
+        """Posições das linhas ordenadas por `col` (vazios por último), calculadas uma vez por coluna."""
+        key = (col, ascending)
+        if key not in self._orders:
+            values = self.frame[col]
+            if isinstance(values.dtype, pd.CategoricalDtype):
+                # Ordem alfabética dos rótulos, não a ordem em que as categorias apareceram
+                values = values.cat.reorder_categories(sorted(values.cat.categories, key=str), ordered=True)
+            ordered = values.reset_index(drop=True).sort_values(ascending=ascending, na_position='last',
+                                                                 kind='stable')
+            self._orders[key] = ordered.index.to_numpy()
+        return self._orders[key]
+
+    def _mask(self, filters):
+        mask = np.ones(len(self.frame), dtype=bool)
+        for col, selected in filters.items():
+            if not selected:
+                continue
+            values = self.frame[col]
+            codes = values.cat.categories.astype(str).get_indexer([str(value) for value in selected])
+            mask &= np.isin(values.cat.codes.to_numpy(), codes[codes >= 0])
+        return mask
+
+    def positions(self, sort_by=DEFAULT_SORT, ascending=True, filters=None):
+        """Posições das linhas após filtro e ordenação (o resultado da última combinação fica guardado)."""
+        filters = {col: tuple(sorted(map(str, values))) for col, values in (filters or {}).items() if values}
+        key = (sort_by, ascending, tuple(sorted(filters.items())))
+        if self._last is None or self._last[0] != key:
+            order = self._order(sort_by, ascending)
+            if filters:
+                order = order[self._mask(filters)[order]]
+            self._last = (key, order)
+        return self._last[1]
+
+    def page(self, number=1, size=PAGE_SIZE, sort_by=DEFAULT_SORT, ascending=True, filters=None):
+        """Página `number` (a partir de 1) e o total de linhas após o filtro."""
+        positions = self.positions(sort_by, ascending, filters)
+        start = (max(1, number) - 1) * size
+        return self.frame.take(positions[start:start + size]), len(positions)
+
+def page_count(total, size=PAGE_SIZE):
+    return max(1, -(-total // size))
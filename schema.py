@@ -0,0 +1,91 @@
+import functools
+import unicodedata
+
+import numpy as np
+import pandas as pd
+
+# --- Esquema das Colunas (nomes já padronizados) ---
+
+# Features usadas pelo modelo
+CATEGORICAL_FEATURES = [
+    'ORIGEM', 'ETAPA_ATUAL', 'ESN', 'GSN', 'TIPO_DE_ATUACAO',
+    'PRODUTO_DA_OPORTUNIDADE', 'PRODUTO_SUGERIDO',
+    'CNAE_FISCAL', 'PORTE', 'NATUREZA_JURIDICA', 'SITUACAO_CADASTRAL', 'UF', 'MUNICIPIO'
+]
+NUMERICAL_FEATURES = ['VALOR_SUGERIDO']
+ALL_FEATURES = CATEGORICAL_FEATURES + NUMERICAL_FEATURES
+
+DATE_COLUMNS = ['DATA_CICLO_DE_BUSCA', 'DATA_DA_VENDA', 'PREVISAO_DE_FECHAMENTO']
+FLOAT32_COLUMNS = ['VALOR_SUGERIDO']  # Árvores do scikit-learn já trabalham em float32
+FLOAT_COLUMNS = ['VALOR_VENDIDO', 'FEELING_FECHAMENTO']
+
+# --- Padronização dos Nomes das Colunas ---
+
+def normalize_column_name(name):
+    """Padroniza um nome de coluna: sem acentos (qualquer letra), espaços viram '_' e maiúsculas.
+
+    Usa a decomposição Unicode (NFKD) e descarta as marcas combinantes, então
+    'Tipo de Atuação', 'TIPO DE ATUAÇÃO' e 'TIPO DE ATUACAO' resultam no mesmo nome.
+    """
+    decomposed = unicodedata.normalize('NFKD', str(name))
+    without_marks = ''.join(ch for ch in decomposed if not unicodedata.combining(ch))
+    return without_marks.strip().replace(' ', '_').upper()
+
+@functools.lru_cache(maxsize=256)
+def _normalized_header(header):
+    return tuple(normalize_column_name(name) for name in header)
+
+def normalize_column_names(columns):
+    """Padroniza uma sequência de nomes; o resultado é memorizado por cabeçalho."""
+    return list(_normalized_header(tuple(columns)))
+
+def normalize_columns(df):
+    """Padroniza os nomes das colunas do DataFrame (in-place)."""
+    df.columns = normalize_column_names(df.columns)
+    return df
+
+# --- Tipos das Colunas ---
+
+def _category_label(value):
+    """Rótulo de texto de uma categoria; códigos numéricos (ex: CNAE_FISCAL) ficam sem casas decimais."""
+    if isinstance(value, (int, np.integer)) and not isinstance(value, bool):
+        return str(int(value))
+    if isinstance(value, (float, np.floating)) and float(value).is_integer():
+        return str(int(value))
+    return str(value)
+
+def as_category(series):
+    """Converte uma coluna em `category` com rótulos de texto.
+
+    Valores numéricos e textuais do mesmo código (6201501, 6201501.0, '6201501') viram
+    a mesma categoria, e uma coluna totalmente vazia continua sendo de texto, para que
+    o encoder do modelo compare sempre textos com textos. A conversão é feita apenas
+    sobre os valores distintos (`pd.factorize`).
+    """
+    codes, uniques = pd.factorize(series, use_na_sentinel=True)
+    labels = [_category_label(value) for value in uniques]
+    categories = pd.Index(pd.unique(np.asarray(labels, dtype=object)), dtype=object)
+    remap = np.append(categories.get_indexer(labels), -1)
+    return pd.Series(pd.Categorical.from_codes(remap[codes], categories=categories),
+                     index=series.index, name=series.name)
+
+def apply_dtypes(df, categories=True):
+    """Converte as colunas conhecidas para tipos compactos.
+
+    Datas viram datetime64, VALOR_SUGERIDO vira float32, os demais valores numéricos
+    float64 e, se `categories` for verdadeiro, as features categóricas viram `category`.
+    """
+    for col in DATE_COLUMNS:
+        if col in df.columns:
+            df[col] = pd.to_datetime(df[col], errors='coerce')
+    for col in FLOAT32_COLUMNS:
+        if col in df.columns:
+            df[col] = pd.to_numeric(df[col], errors='coerce').astype('float32')
+    for col in FLOAT_COLUMNS:
+        if col in df.columns:
+            df[col] = pd.to_numeric(df[col], errors='coerce').astype('float64')
+    if categories:
+        for col in CATEGORICAL_FEATURES:
+            if col in df.columns:
+                df[col] = as_category(df[col])
+    return df
@@ -0,0 +1,133 @@
+import argparse
+import os
+import tempfile
+import time
+from datetime import date
+
+from compiled_model import try_compile
+from data_io import CHUNK_SIZE, ChunkWriter, convert, file_format, iter_chunks
+from parallel_scoring import ParallelScorer
+from prediction_store import STORE_PATH, PredictionStore, delta_summary, model_key
+from schema import DATE_COLUMNS
+from scoring import FEATURES_PATH, default_model_path, load_model, predict_closing_days, preprocess_data
+
+# Colunas de identificação mantidas na saída quando a leitura é projetada
+KEY_COLUMNS = ['ID', 'NOME_DA_OPORTUNIDADE', 'CNPJ']
+
+def scoring_columns(features_list):
+    """Colunas (padronizadas) necessárias para pontuar: identificação, features e datas."""
+    return list(dict.fromkeys(KEY_COLUMNS + list(features_list) + DATE_COLUMNS))
+
+def score_file(input_path, output_path, model, features_list, chunksize=CHUNK_SIZE, today=None,
+               columns=None, store=None, scorer=None):
+    """Pontua as oportunidades em aberto de `input_path`, bloco a bloco, gravando em `output_path`.
+
+    `columns` (nomes padronizados) restringe as colunas lidas da entrada. Com `store`
+    (prediction_store.PredictionStore), só as linhas novas ou alteradas vão ao modelo, e o
+    armazenamento é gravado uma vez, ao final do arquivo.
+    Com `scorer` (parallel_scoring.ParallelScorer), as linhas a prever de cada bloco são
+    divididas entre os processos (sem `store`, use score_file_parallel).
+    Retorna um dicionário com o total de linhas lidas, linhas pontuadas, blocos processados
+    e, com `store`, linhas reaproveitadas, novas e alteradas.
+    """
+    stats = {'rows_read': 0, 'rows_scored': 0, 'chunks': 0}
+    delta = {'reused': 0, 'new': 0, 'changed': 0}
+    with ChunkWriter(output_path) as writer:
+        for chunk in iter_chunks(input_path, chunksize, columns=columns):
+            stats['rows_read'] += len(chunk)
+            stats['chunks'] += 1
+            df_abertas = preprocess_data(chunk, features_list)
+            if df_abertas.empty:
+                continue
+            # Com o pool, só as linhas a prever (novas ou alteradas) são divididas entre os processos
+            df_results = predict_closing_days(df_abertas, scorer or model, features_list, today=today,
+                                              store=store)
+            if store is not None:
+                for name, count in store.last_stats.items():
+                    delta[name] += count
+            writer.write(df_results)
+            stats['rows_scored'] += len(df_results)
+            print(f"Bloco {stats['chunks']}: {stats['rows_read']} linhas lidas, "
+                  f"{stats['rows_scored']} oportunidades em aberto pontuadas.")
+    if store is not None:
+        # Uma única gravação por arquivo; remove as oportunidades que saíram da exportação
+        store.save()
+        stats.update(delta)
+    return stats
+
+def score_file_parallel(input_path, output_path, scorer, chunksize=CHUNK_SIZE, today=None, columns=None):
+    """Como score_file, mas cada processo de `scorer` lê, pontua e grava os próprios row groups.
+
+    Entradas .xlsx e .csv são antes convertidas para um .parquet temporário (no processo
+    principal, com row groups de `chunksize` linhas).
+    """
+    if file_format(input_path) == '.parquet':
+        return scorer.score_file(input_path, output_path, today=today, columns=columns)
+    fd, parquet_path = tempfile.mkstemp(suffix='.parquet', dir=os.path.dirname(os.path.abspath(output_path)))
+    os.close(fd)
+    try:
+        start = time.perf_counter()
+        convert(input_path, parquet_path, chunksize)
+        print(f"Entrada convertida para Parquet em {time.perf_counter() - start:.1f}s.")
+        return scorer.score_file(parquet_path, output_path, today=today, columns=columns)
+    finally:
+        os.remove(parquet_path)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Pontuação em lote (sem interface) das oportunidades em aberto."
+    )
+    parser.add_argument('input', help="Arquivo de entrada (.xlsx, .csv ou .parquet).")
+    parser.add_argument('output', help="Arquivo de saída (.csv ou .parquet).")
+    parser.add_argument('--chunksize', type=int, default=CHUNK_SIZE, help="Linhas por bloco.")
+    parser.add_argument('--model', default=default_model_path(),
+                        help="Caminho do modelo treinado (.bundle ou .pkl; padrão: o pacote, se existir).")
+    parser.add_argument('--features', default=FEATURES_PATH, help="Caminho da lista de features (ignorado com .bundle).")
+    parser.add_argument('--today', type=date.fromisoformat, default=None,
+                        help="Data de referência AAAA-MM-DD (padrão: hoje).")
+    parser.add_argument('--all-columns', action='store_true',
+                        help="Lê e grava todas as colunas (padrão: identificação, features e datas).")
+    parser.add_argument('--no-compile', action='store_true',
+                        help="Usa o Pipeline do scikit-learn em vez do modelo compilado (mesmas previsões).")
+    parser.add_argument('--store', default=STORE_PATH,
+                        help="Armazenamento (SQLite) das previsões: só as linhas novas ou alteradas vão ao modelo.")
+    parser.add_argument('--no-store', action='store_true', help="Pontua todas as linhas, sem o armazenamento.")
+    parser.add_argument('--workers', type=int, default=1,
+                        help="Processos para pontuar em paralelo (padrão: 1, no próprio processo).")
+    args = parser.parse_args(argv)
+
+    if args.workers > 1:
+        # O modelo é carregado só nos processos
+        scorer = ParallelScorer(args.model, args.features, workers=args.workers, compile_model=not args.no_compile)
+        model, features_list = None, scorer.features_list
+    else:
+        scorer = None
+        model, features_list = load_model(args.model, args.features)
+        if not args.no_compile:
+            model = try_compile(model)
+    columns = None if args.all_columns else scoring_columns(features_list)
+    start = time.perf_counter()
+    store = None
+    if not args.no_store:
+        store = PredictionStore(args.store, model_key=model_key(args.model, args.features))
+        if store.invalidated:
+            print(f"Modelo alterado: previsões anteriores em {args.store} descartadas.")
+    try:
+        if scorer is not None and store is None:
+            stats = score_file_parallel(args.input, args.output, scorer, args.chunksize, args.today, columns)
+        else:
+            stats = score_file(args.input, args.output, model, features_list, args.chunksize, args.today,
+                               columns, store, scorer)
+    finally:
+        if store is not None:
+            store.close()
+        if scorer is not None:
+            scorer.close()
+    print(f"Concluído em {time.perf_counter() - start:.1f}s: {stats['rows_scored']} de "
+          f"{stats['rows_read']} linhas pontuadas, salvas em {args.output}.")
+    if store is not None:
+        print(f"Previsões: {delta_summary(stats)}.")
+    return stats
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,161 @@
+import os
+import pandas as pd
+import joblib
+import numpy as np
+from instrumentation import timed
+from model_bundle import check_schema, load_bundle
+from prediction_store import features_hash, opportunity_identity
+from projection import MONTHS, closing_dates, forecast
+from schema import apply_dtypes, normalize_columns
+
+# --- Variáveis de Configuração ---
+MODEL_PATH = 'modelo_fechamento.pkl'
+FEATURES_PATH = 'features_list.pkl'
+BUNDLE_PATH = 'modelo_fechamento.bundle' # Pacote único (modelo, features, esquema e métricas) gerado pelo treinamento
+QUANTILE_MODELS_PATH = 'modelos_quantis.pkl' # Opcional: gerado com `model_trainer2.py --quantiles`
+
+def default_model_path():
+    """Caminho do modelo padrão: o pacote, se existir; senão, o pickle."""
+    return BUNDLE_PATH if os.path.exists(BUNDLE_PATH) else MODEL_PATH
+
+def load_model(model_path=MODEL_PATH, features_path=FEATURES_PATH):
+    """Carrega o modelo treinado e a lista de features.
+
+    Se `model_path` for um pacote (.bundle), a lista de features vem do próprio pacote
+    e o esquema gravado no treino é conferido contra o que preprocess_data produz.
+    """
+    if str(model_path).endswith('.bundle'):
+        bundle = load_bundle(model_path)
+        validate_schema(bundle.manifest)
+        return bundle.model, bundle.features
+    return joblib.load(model_path), joblib.load(features_path)
+
+def load_quantile_models(path=QUANTILE_MODELS_PATH):
+    """Carrega os modelos de quantis ({quantil: Pipeline})."""
+    return joblib.load(path)
+
+# --- Funções de Pré-processamento e Previsão ---
+
+def preprocess_data(df, features_list):
+    """Padroniza nomes de colunas e filtra oportunidades em aberto."""
+    # Padronizar nomes das colunas
+    normalize_columns(df)
+
+    # Filtrar oportunidades em aberto (DATA_DA_VENDA nula)
+    df_abertas = df[df['DATA_DA_VENDA'].isna()].copy()
+
+    # Garantir que as colunas de feature existam
+    missing_cols = [col for col in features_list if col not in df_abertas.columns]
+    if missing_cols:
+        # Adicionar colunas faltantes com valor padrão (pode ser necessário um tratamento mais robusto)
+        for col in missing_cols:
+            df_abertas[col] = np.nan # Adiciona NaN para colunas faltantes
+
+    # Garantir tipos compactos: features categóricas como category e VALOR_SUGERIDO numérico (float32)
+    apply_dtypes(df_abertas)
+
+    return df_abertas
+
+def validate_schema(manifest):
+    """Lança ValueError se as features pré-processadas não tiverem os tipos usados no treino."""
+    columns = list(dict.fromkeys(manifest['features'] + ['DATA_DA_VENDA']))
+    probe = preprocess_data(pd.DataFrame({col: pd.Series(dtype=object) for col in columns}), manifest['features'])
+    problems = check_schema(manifest, probe)
+    if problems:
+        raise ValueError("Modelo incompatível com o pré-processamento atual: " + '; '.join(problems))
+
+def predict_days(df_abertas, model, features_list):
+    """Dias previstos até o fechamento (inteiros, no mínimo 1)."""
+    X_predict = df_abertas[features_list]
+
+    # O modelo é um Pipeline que inclui o pré-processamento (OneHotEncoder)
+    # Ele tratará as novas categorias automaticamente (handle_unknown='ignore')
+    predicted_days = model.predict(X_predict)
+
+    # Garantir que os dias sejam inteiros e não negativos
+    return np.maximum(1, np.round(predicted_days)).astype(int)
+
+def predict_days_delta(df_abertas, model, features_list, store):
+    """Dias previstos reaproveitando as previsões do `store` (prediction_store.PredictionStore):
+    só as oportunidades novas ou com features alteradas vão ao modelo.
+
+    Retorna (dias previstos na ordem de `df_abertas`, estatísticas {'reused', 'new', 'changed'}).
+    """
+    stats = store.last_stats = {'reused': 0, 'new': 0, 'changed': 0}
+    if df_abertas.empty:
+        return np.empty(0, dtype=int), stats
+
+    with timed('delta.chaves', rows=len(df_abertas)):
+        identities = opportunity_identity(df_abertas)
+        hashes = features_hash(df_abertas, features_list)
+        known = store.get_many(identities)
+        # Mesma identidade e mesmas features: reaproveita os dias; identidade conhecida com
+        # outras features: alterada; identidade desconhecida: nova
+        rows = pd.DataFrame({'identity': identities, 'features_hash': hashes})
+        matched = rows.merge(known.drop_duplicates(['identity', 'features_hash']),
+                             on=['identity', 'features_hash'], how='left')['days'].to_numpy()
+    reused = ~np.isnan(matched)
+    seen = np.isin(identities, known['identity'].to_numpy())
+    days = np.empty(len(df_abertas), dtype=int)
+    days[reused] = matched[reused]
+    stats.update(reused=int(reused.sum()), changed=int((seen & ~reused).sum()), new=int((~seen).sum()))
+
+    pending = ~reused
+    if pending.any():
+        days[pending] = predict_days(df_abertas[pending], model, features_list)
+        store.put_many(identities[pending], hashes[pending], days[pending])
+    return days, stats
+
+def _predict(df_abertas, model, features_list, store=None):
+    if store is not None:
+        return predict_days_delta(df_abertas, model, features_list, store)[0]
+    if df_abertas.empty:
+        return np.empty(0, dtype=int)
+    return predict_days(df_abertas, model, features_list)
+
+def predict_closing_days(df_abertas, model, features_list, today=None, store=None):
+    """Faz a previsão dos dias para fechamento e calcula a data provável.
+
+    `today` permite fixar a data de referência (padrão: data atual). Com `store`, só as
+    linhas novas ou alteradas vão ao modelo (ver predict_days_delta).
+    """
+    if df_abertas.empty:
+        return df_abertas
+
+    # 1. Fazer a previsão
+    df_abertas['DIAS_PREVISTOS'] = _predict(df_abertas, model, features_list, store)
+
+    # 2. Calcular a Data Provável de Fechamento (data atual + dias, sobre o vetor inteiro)
+    df_abertas['DATA_PROVAVEL_FECHAMENTO'] = closing_dates(df_abertas['DIAS_PREVISTOS'], today)
+
+    return df_abertas
+
+def predict_and_project(df_abertas, model, features_list, today=None, months=MONTHS, store=None):
+    """Previsão e projeção mensal do VALOR_SUGERIDO em uma única passada.
+
+    Retorna (df_abertas com DIAS_PREVISTOS e DATA_PROVAVEL_FECHAMENTO, projeção de `months` meses).
+    Com `store`, só as linhas novas ou alteradas vão ao modelo; as contagens ficam em `store.last_stats`.
+    """
+    with timed('model.predict', rows=len(df_abertas)):
+        days = _predict(df_abertas, model, features_list, store)
+    with timed('projecao', rows=len(df_abertas)):
+        dates, projection = forecast(days, df_abertas['VALOR_SUGERIDO'], today, months)
+    df_abertas['DIAS_PREVISTOS'] = days
+    df_abertas['DATA_PROVAVEL_FECHAMENTO'] = dates
+    return df_abertas, projection
+
+def predict_quantiles(df_abertas, quantile_models):
+    """Dias previstos para cada quantil: matriz (quantis em ordem crescente, oportunidades).
+
+    Cada modelo usa as features com que foi treinado (`feature_names_in_`), que podem
+    ser diferentes das do modelo principal; as que faltarem na planilha ficam vazias.
+    As previsões são ordenadas por oportunidade, para que os quantis nunca se cruzem, e
+    limitadas a no mínimo 1 dia.
+    """
+    predictions = []
+    for quantile in sorted(quantile_models):
+        model = quantile_models[quantile]
+        X_predict = apply_dtypes(df_abertas.reindex(columns=list(model.feature_names_in_)))
+        predictions.append(model.predict(X_predict))
+    predictions = np.stack(predictions)
+    return np.maximum(1, np.sort(predictions, axis=0))
@@ -0,0 +1,286 @@
+import argparse
+import asyncio
+import collections
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+from aiohttp import web
+
+from compiled_model import try_compile
+from schema import normalize_columns
+from scoring import FEATURES_PATH, default_model_path, load_model, predict_closing_days, preprocess_data
+
+# --- Serviço HTTP de Previsão ---
+#
+#   POST /predict        uma oportunidade (objeto JSON com as colunas da planilha)
+#   POST /predict/batch  várias oportunidades ({"oportunidades": [...]} ou uma lista)
+#   GET  /metrics        latência p50/p99, vazão e tamanho médio dos lotes
+#   GET  /health         modelo carregado
+#
+# O modelo é carregado uma vez na subida. As requisições concorrentes entram em uma
+# fila e são pontuadas juntas (micro-lotes): um único DataFrame e uma única chamada
+# ao model.predict por lote, em vez de uma por requisição.
+
+# --- Variáveis de Configuração ---
+HOST = '127.0.0.1'
+PORT = 8080
+MAX_BATCH_ROWS = 256     # Máximo de oportunidades por chamada ao model.predict
+MAX_WAIT_MS = 2.0        # Espera máxima por mais requisições antes de fechar um lote (0 = só o que já estiver na fila)
+MAX_REQUEST_ROWS = 10_000  # Máximo de oportunidades em uma requisição /predict/batch
+LATENCY_WINDOW = 10_000  # Latências guardadas (janela móvel) para os percentis
+RATE_WINDOW_S = 10.0     # Janela da vazão recente (requisições por segundo)
+
+class ServiceStats:
+    """Contadores do serviço: requisições, oportunidades, lotes, erros e latências recentes."""
+
+    def __init__(self, window=LATENCY_WINDOW):
+        self.started = time.monotonic()
+        self.latencies = collections.deque(maxlen=window)
+        self.finished = collections.deque(maxlen=window)
+        self.requests = 0
+        self.rows = 0
+        self.errors = 0
+        self.batches = 0
+        self.batch_rows = 0
+
+    def record_request(self, seconds, rows):
+        self.requests += 1
+        self.rows += rows
+        self.latencies.append(seconds)
+        self.finished.append(time.monotonic())
+
+    def record_batch(self, rows):
+        self.batches += 1
+        self.batch_rows += rows
+
+    def snapshot(self):
+        now = time.monotonic()
+        uptime = now - self.started
+        p50, p99 = (np.percentile(self.latencies, [50, 99]) * 1000 if self.latencies else (None, None))
+        recent = sum(1 for t in self.finished if now - t <= RATE_WINDOW_S)
+        return {
+            'uptime_s': round(uptime, 1),
+            'requests': self.requests,
+            'rows': self.rows,
+            'errors': self.errors,
+            'batches': self.batches,
+            'avg_batch_rows': round(self.batch_rows / self.batches, 2) if self.batches else None,
+            'latency_p50_ms': None if p50 is None else round(float(p50), 3),
+            'latency_p99_ms': None if p99 is None else round(float(p99), 3),
+            'requests_per_s': round(self.requests / uptime, 1) if uptime else None,
+            'requests_per_s_recent': round(recent / min(uptime, RATE_WINDOW_S), 1) if uptime else None,
+        }
+
+def score_records(records, model, features_list, today=None):
+    """Pontua uma lista de oportunidades (dicionários com as colunas da planilha).
+
+    Usa o mesmo pré-processamento da aplicação (`preprocess_data`) e `predict_closing_days`,
+    apenas sobre as colunas que o modelo usa (as demais não entram na resposta).
+    Retorna uma lista do mesmo tamanho; oportunidades já fechadas (DATA_DA_VENDA preenchida) ficam None.
+    """
+    df = normalize_columns(pd.DataFrame.from_records(records, index=pd.RangeIndex(len(records))))
+    df = df.reindex(columns=list(dict.fromkeys(list(features_list) + ['DATA_DA_VENDA'])))
+    scored = predict_closing_days(preprocess_data(df, features_list), model, features_list, today=today)
+    if scored.empty:
+        return [None] * len(records)
+    days = scored['DIAS_PREVISTOS'].reindex(df.index)
+    dates = scored['DATA_PROVAVEL_FECHAMENTO'].reindex(df.index).dt.strftime('%Y-%m-%d')
+    return [None if pd.isna(d) else {'dias_previstos': int(d), 'data_provavel_fechamento': s}
+            for d, s in zip(days, dates)]
+
+def _resolve(future, result=None, error=None):
+    """Entrega o resultado (ou o erro) a uma requisição que ainda esteja esperando."""
+    if future.done():
+        return
+    if error is not None:
+        future.set_exception(error)
+    else:
+        future.set_result(result)
+
+class MicroBatcher:
+    """Junta as oportunidades de requisições concorrentes em uma única chamada ao modelo.
+
+    Cada lote leva o que já estiver na fila e espera até `max_wait_ms` por mais
+    requisições, até `max_rows` oportunidades. A previsão roda em uma thread dedicada,
+    para que o loop continue recebendo requisições (que formam o próximo lote). Se o
+    lote falhar (ex: uma oportunidade sem VALOR_SUGERIDO), cada requisição é pontuada
+    separadamente, para que só a inválida receba o erro.
+    """
+
+    def __init__(self, model, features_list, stats, max_rows=MAX_BATCH_ROWS, max_wait_ms=MAX_WAIT_MS, today=None):
+        self.model = model
+        self.features_list = features_list
+        self.stats = stats
+        self.max_rows = max_rows
+        self.max_wait = max_wait_ms / 1000
+        self.today = today
+        self.queue = asyncio.Queue()
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='scoring')
+
+    async def predict(self, records):
+        """Enfileira as oportunidades e aguarda as previsões do lote em que entrarem."""
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put((records, future))
+        return await future
+
+    async def _collect(self):
+        loop = asyncio.get_running_loop()
+        items = [await self.queue.get()]
+        rows = len(items[0][0])
+        deadline = loop.time() + self.max_wait
+        while rows < self.max_rows:
+            if self.queue.empty():
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self.queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+            else:
+                item = self.queue.get_nowait()
+            items.append(item)
+            rows += len(item[0])
+        return items, rows
+
+    async def _score(self, records):
+        return await asyncio.get_running_loop().run_in_executor(
+            self.executor, score_records, records, self.model, self.features_list, self.today)
+
+    async def run(self):
+        while True:
+            items, rows = await self._collect()
+            try:
+                results = await self._score([record for batch, _ in items for record in batch])
+            except Exception as e:
+                if len(items) == 1:
+                    _resolve(items[0][1], error=e)
+                else:
+                    await self._score_separately(items)
+                continue
+            self.stats.record_batch(rows)
+            start = 0
+            for batch, future in items:
+                _resolve(future, results[start:start + len(batch)])
+                start += len(batch)
+
+    async def _score_separately(self, items):
+        for batch, future in items:
+            try:
+                _resolve(future, await self._score(batch))
+            except Exception as e:
+                _resolve(future, error=e)
+            self.stats.record_batch(len(batch))
+
+    def close(self):
+        self.executor.shutdown(wait=False)
+
+# --- Rotas ---
+
+async def _read_json(request):
+    try:
+        return await request.json()
+    except (json.JSONDecodeError, UnicodeDecodeError):
+        raise web.HTTPBadRequest(text=json.dumps({'erro': "Corpo da requisição não é um JSON válido."}),
+                                 content_type='application/json')
+
+def _error(status, message):
+    return web.json_response({'erro': message}, status=status)
+
+async def _score(request, records):
+    stats = request.app['stats']
+    start = time.perf_counter()
+    try:
+        results = await request.app['batcher'].predict(records)
+    except ValueError as e:
+        # Dados que o modelo não aceita (ex: VALOR_SUGERIDO ausente)
+        stats.errors += 1
+        return None, _error(422, f"Oportunidade inválida: {e}")
+    except Exception as e:
+        stats.errors += 1
+        return None, _error(500, f"Erro na previsão: {e}")
+    stats.record_request(time.perf_counter() - start, len(records))
+    return results, None
+
+async def predict_one(request):
+    body = await _read_json(request)
+    if not isinstance(body, dict):
+        return _error(400, "Envie um objeto JSON com as colunas da oportunidade.")
+    results, error = await _score(request, [body])
+    if error is not None:
+        return error
+    if results[0] is None:
+        return _error(422, "Oportunidade já fechada (DATA_DA_VENDA preenchida).")
+    return web.json_response(results[0])
+
+async def predict_batch(request):
+    body = await _read_json(request)
+    records = body.get('oportunidades') if isinstance(body, dict) else body
+    if not isinstance(records, list) or not all(isinstance(record, dict) for record in records):
+        return _error(400, "Envie {\"oportunidades\": [...]} ou uma lista de objetos JSON.")
+    if len(records) > MAX_REQUEST_ROWS:
+        return _error(413, f"Máximo de {MAX_REQUEST_ROWS} oportunidades por requisição.")
+    if not records:
+        return web.json_response({'previsoes': []})
+    results, error = await _score(request, records)
+    if error is not None:
+        return error
+    return web.json_response({'previsoes': results})
+
+async def metrics(request):
+    return web.json_response(request.app['stats'].snapshot())
+
+async def health(request):
+    return web.json_response({'status': 'ok', 'modelo': request.app['model_path'],
+                              'features': request.app['batcher'].features_list})
+
+def create_app(model_path=None, features_path=FEATURES_PATH, max_rows=MAX_BATCH_ROWS, max_wait_ms=MAX_WAIT_MS,
+               today=None, compiled=True):
+    """Cria a aplicação aiohttp com o modelo já carregado.
+
+    Com `compiled`, modelos 'gbr' são compilados (compiled_model.py): mesmas previsões, sem o custo do Pipeline.
+    """
+    model_path = model_path or default_model_path()
+    model, features_list = load_model(model_path, features_path)
+    if compiled:
+        model = try_compile(model)
+    app = web.Application(client_max_size=64 * 1024 * 1024)
+    app['model_path'] = model_path
+    app['stats'] = ServiceStats()
+    app['batcher'] = MicroBatcher(model, features_list, app['stats'], max_rows, max_wait_ms, today)
+
+    async def start_batcher(app):
+        app['batcher_task'] = asyncio.create_task(app['batcher'].run())
+
+    async def stop_batcher(app):
+        app['batcher_task'].cancel()
+        app['batcher'].close()
+
+    app.on_startup.append(start_batcher)
+    app.on_cleanup.append(stop_batcher)
+    app.router.add_post('/predict', predict_one)
+    app.router.add_post('/predict/batch', predict_batch)
+    app.router.add_get('/metrics', metrics)
+    app.router.add_get('/health', health)
+    return app
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Serviço HTTP de previsão de fechamento de oportunidades.")
+    parser.add_argument('--host', default=HOST)
+    parser.add_argument('--port', type=int, default=PORT)
+    parser.add_argument('--model', default=None, help="Caminho do modelo (.bundle ou .pkl; padrão: o pacote, se existir).")
+    parser.add_argument('--features', default=FEATURES_PATH, help="Caminho da lista de features (ignorado com .bundle).")
+    parser.add_argument('--max-batch', type=int, default=MAX_BATCH_ROWS,
+                        help="Máximo de oportunidades por chamada ao modelo (1 desliga os micro-lotes).")
+    parser.add_argument('--max-wait-ms', type=float, default=MAX_WAIT_MS,
+                        help="Espera máxima por mais requisições antes de fechar um lote.")
+    parser.add_argument('--today', default=None, help="Data de referência (AAAA-MM-DD); padrão: hoje.")
+    parser.add_argument('--no-compile', action='store_true', help="Usa o Pipeline do scikit-learn em vez do modelo compilado.")
+    args = parser.parse_args()
+
+    web.run_app(create_app(args.model, args.features, args.max_batch, args.max_wait_ms, args.today,
+                           compiled=not args.no_compile),
+                host=args.host, port=args.port, print=lambda message: print(message, flush=True))
@@ -0,0 +1,19 @@
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+@pytest.fixture(scope='session')
+def vendas():
+    """Planilha de exemplo (vendas.xlsx), já padronizada e tipada."""
+    from data_io import read_table
+    return read_table(os.path.join(ROOT, 'vendas.xlsx'))
+
+@pytest.fixture(scope='session')
+def shipped_model():
+    """Modelo e lista de features entregues com o projeto (modelo_fechamento.pkl)."""
+    from scoring import load_model
+    return load_model(os.path.join(ROOT, 'modelo_fechamento.pkl'), os.path.join(ROOT, 'features_list.pkl'))
@@ -0,0 +1,90 @@
+import pytest
+
+from benchmarks.fake_llm import FakeToolChatModel
+from langchain_agent import MODEL_NAME, NO_AGENT, AgentSession, create_agent
+
+# Perguntas que o roteador não responde (vão ao agente)
+QUESTIONS = ["Quantos ESN existem?", "Qual cliente comprou antes de 2020?", "Explique a coluna ORIGEM"]
+
+class Factory:
+    """create_agent com o LLM falso; guarda os argumentos de cada agente criado."""
+
+    def __init__(self):
+        self.llm = FakeToolChatModel()
+        self.built = []
+
+    def __call__(self, df, openai_api_key, temperature, model):
+        self.built.append((openai_api_key, temperature, model))
+        return create_agent(df, openai_api_key, temperature, model=model, llm=self.llm)
+
+@pytest.fixture
+def factory():
+    return Factory()
+
+@pytest.fixture
+def df(vendas):
+    return vendas.head(200)
+
+def test_agent_reused_for_same_key(factory, df):
+    session = AgentSession(factory)
+    answers = [session.ask(df, question, 'chave', 0.0) for question in QUESTIONS]
+    assert all(origin == 'agente' for _, origin in answers)
+    assert answers[0][0] == f"Resultado da análise: {len(df)}"
+    assert session.builds == 1 and factory.built == [('chave', 0.0, MODEL_NAME)]
+    assert factory.llm.calls == 2 * len(QUESTIONS)  # Duas chamadas ao LLM por rodada do agente
+    agent = session.agent
+    assert session.get_agent(df, 'chave', 0.0) is agent
+
+@pytest.mark.parametrize('change', [
+    {'openai_api_key': 'outra chave'},
+    {'temperature': 0.7},
+    {'model': 'gpt-4o'},
+], ids=['chave', 'temperatura', 'modelo'])
+def test_agent_rebuilt_when_settings_change(factory, df, change):
+    session = AgentSession(factory)
+    settings = {'openai_api_key': 'chave', 'temperature': 0.0, 'model': MODEL_NAME}
+    first = session.get_agent(df, **settings)
+    settings.update(change)
+    second = session.get_agent(df, **settings)
+    assert second is not first and session.builds == 2
+    assert factory.built[-1] == (settings['openai_api_key'], settings['temperature'], settings['model'])
+    assert session.get_agent(df, **settings) is second and session.builds == 2
+
+def test_agent_rebuilt_when_data_changes(factory, df):
+    session = AgentSession(factory)
+    first = session.get_agent(df, 'chave', 0.0)
+    assert session.get_agent(df.copy(), 'chave', 0.0) is first  # Mesmo conteúdo, mesmo hash
+    assert session.get_agent(df.head(100), 'chave', 0.0) is not first and session.builds == 2
+
+def test_answer_cache_lru(factory, df):
+    session = AgentSession(factory, cache_size=2)
+    q1, q2, q3 = QUESTIONS
+    assert session.ask(df, q1, 'chave', 0.0)[1] == 'agente'
+    assert session.ask(df, q2, 'chave', 0.0)[1] == 'agente'
+    # Mesma pergunta com outra caixa, espaços e pontuação: acerto no cache, sem chamar o LLM
+    calls = factory.llm.calls
+    assert session.ask(df, '  quantos esn   EXISTEM ', 'chave', 0.0)[1] == 'cache'
+    assert factory.llm.calls == calls
+    assert session.ask(df, q3, 'chave', 0.0)[1] == 'agente'   # Remove q2 (a menos usada)
+    assert session.ask(df, q1, 'chave', 0.0)[1] == 'cache'
+    assert session.ask(df, q2, 'chave', 0.0)[1] == 'agente'
+    stats = session.answers.stats()
+    assert (stats['hits'], stats['misses'], stats['size']) == (2, 4, 2)
+    # Outros dados: outra chave no cache
+    assert session.ask(df.head(100), q1, 'chave', 0.0)[1] == 'agente'
+    assert session.builds == 2
+
+def test_errors_not_cached(df):
+    class FailingAgent:
+        def invoke(self, *args, **kwargs):
+            raise RuntimeError("falha")
+
+    session = AgentSession(lambda *args, **kwargs: FailingAgent())
+    for _ in range(2):
+        answer, origin = session.ask(df, QUESTIONS[0], 'chave', 0.0)
+        assert origin == 'agente' and 'falha' in answer
+    assert len(session.answers) == 0 and session.answers.hits == 0
+
+def test_without_api_key(df):
+    session = AgentSession()
+    assert session.ask(df, QUESTIONS[0], None, 0.0) == (NO_AGENT, 'agente')
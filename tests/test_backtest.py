@@ -0,0 +1,35 @@
+import pandas as pd
+
+import model_trainer2
+from backtest import cutoff_dates, prepare_history, run_backtest, walk_forward
+from compiled_model import try_compile
+
+def test_walk_forward_trains_only_on_past_sales(vendas, monkeypatch):
+    trained = []
+    original = model_trainer2.prepare_training_data
+
+    def recording(df):
+        trained.append(df['DATA_DA_VENDA'].max())
+        return original(df)
+    monkeypatch.setattr(model_trainer2, 'prepare_training_data', recording)
+
+    cutoffs = cutoff_dates(vendas, 14)
+    metrics, projection = walk_forward(vendas, cutoffs, refit_days=60)
+    assert len(metrics) > 0 and set(metrics['CORTE']) <= set(cutoffs)
+    assert (metrics['TREINO_ATE'] <= metrics['CORTE']).all()
+    assert all(last <= start for last, start in zip(trained, sorted(metrics['TREINO_ATE'].unique())))
+    assert set(projection['CORTE']) == set(metrics['CORTE'])
+
+def test_walk_forward_matches_run_backtest_with_window_model(vendas):
+    cutoffs = cutoff_dates(vendas, 14, start=vendas['DATA_DA_VENDA'].median())
+    metrics, _ = walk_forward(vendas, cutoffs, refit_days=10_000)  # Uma única janela
+    assert len(metrics) == len(cutoffs)
+    start = metrics['TREINO_ATE'].iloc[0]
+    X, y, features = model_trainer2.prepare_training_data(vendas[vendas['DATA_DA_VENDA'] <= start])
+    model = try_compile(model_trainer2.build_pipeline(features).fit(X, y))
+    expected, _ = run_backtest(prepare_history(vendas, model, features), metrics['CORTE'])
+    pd.testing.assert_frame_equal(metrics.drop(columns='TREINO_ATE'), expected)
+
+def test_walk_forward_without_enough_sales(vendas):
+    metrics, projection = walk_forward(vendas, cutoff_dates(vendas, 14), min_rows=10**6)
+    assert metrics.empty and projection.empty and 'TREINO_ATE' in metrics.columns
@@ -0,0 +1,86 @@
+import os
+
+import pandas as pd
+import pytest
+
+from cnpj_cache import DAY, CnpjCache
+from cnpj_enrichment import enrich_data
+
+RECORD = {'CNAE_FISCAL': 6201501, 'PORTE': 'DEMAIS', 'UF': 'SP'}
+
+class Clock:
+    def __init__(self, now=1_700_000_000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+    def advance(self, days):
+        self.now += days * DAY
+
+@pytest.fixture
+def clock():
+    return Clock()
+
+@pytest.fixture
+def cache(tmp_path, clock):
+    with CnpjCache(str(tmp_path / 'cnpj_cache.sqlite'), clock=clock) as cache:
+        yield cache
+
+def test_positive_entries_expire_after_30_days(cache, clock):
+    cache.put_many({'11222333000181': RECORD})
+    clock.advance(29.9)
+    assert cache.get_many(['11222333000181']) == {'11222333000181': RECORD}
+    clock.advance(0.2)
+    assert cache.get_many(['11222333000181']) == {}
+
+def test_negative_entries_expire_after_3_days(cache, clock):
+    cache.put_many({'11222333000100': None, '11222333000181': RECORD})
+    clock.advance(2.9)
+    assert cache.get_many(['11222333000100', '11222333000181']) == {'11222333000100': None,
+                                                                    '11222333000181': RECORD}
+    clock.advance(0.2)
+    # O "não encontrado" vence antes; o registro encontrado continua válido
+    assert cache.get_many(['11222333000100', '11222333000181']) == {'11222333000181': RECORD}
+    assert cache.purge_expired() == 1 and len(cache) == 1
+
+def test_put_many_keeps_newer_entry(cache, clock):
+    cache.put_many({'11222333000181': RECORD})
+    cache.put_many({'11222333000181': None}, fetched_at=clock.now - DAY)  # Consulta mais antiga
+    assert cache.get_many(['11222333000181']) == {'11222333000181': RECORD}
+
+def test_warm_from_csv(cache, clock, tmp_path):
+    path = tmp_path / 'vendas_enriquecidas.csv'
+    pd.DataFrame({
+        'CNPJ': ['11.222.333/0001-81', '11222333000181', '44.555.666/0001-99', '123', '77.888.999/0001-00'],
+        'CNAE_FISCAL': [4751201.0, 6201501.0, 8599604.0, 6202300.0, None],
+        'PORTE': ['DEMAIS', 'DEMAIS', 'MICRO EMPRESA', 'DEMAIS', 'DEMAIS'],
+        'UF': ['RS', 'SP', 'SC', 'SP', 'PR'],
+        'MUNICIPIO': ['PORTO ALEGRE', 'SAO PAULO', None, 'SAO PAULO', 'CURITIBA'],
+        'ORIGEM': ['Indicação'] * 5,
+    }).to_csv(path, index=False)
+    modified = clock.now - 10 * DAY
+    os.utime(path, (modified, modified))
+    # CNPJ inválido e linha sem CNAE_FISCAL ficam de fora; do CNPJ repetido, vale a última linha
+    assert cache.warm_from_csv(str(path)) == 2
+    cached = cache.get_many(['11222333000181', '44555666000199', '77888999000100'])
+    assert cached == {
+        '11222333000181': {'CNAE_FISCAL': 6201501, 'PORTE': 'DEMAIS', 'UF': 'SP', 'MUNICIPIO': 'SAO PAULO'},
+        '44555666000199': {'CNAE_FISCAL': 8599604, 'PORTE': 'MICRO EMPRESA', 'UF': 'SC', 'MUNICIPIO': None},
+    }
+    # A idade das entradas é a do arquivo: vencem 20 dias depois, não 30
+    clock.advance(20.1)
+    assert cache.get_many(['11222333000181']) == {}
+
+def test_enrich_data_uses_warm_cache(cache, tmp_path):
+    path = tmp_path / 'vendas_enriquecidas.csv'
+    pd.DataFrame({'CNPJ': ['11.222.333/0001-81'], 'CNAE_FISCAL': [6201501], 'UF': ['SP']}).to_csv(path, index=False)
+    cache.warm_from_csv(str(path), fetched_at=cache._clock())
+
+    class NoFetcher:
+        def fetch_many(self, cnpjs):
+            raise AssertionError(f"consulta inesperada: {cnpjs}")
+
+    df = enrich_data(pd.DataFrame({'CNPJ': ['11222333000181', '11.222.333/0001-81']}), fetcher=NoFetcher(),
+                     cache=cache)
+    assert df['CNAE_FISCAL'].tolist() == [6201501, 6201501] and df['UF'].tolist() == ['SP', 'SP']
@@ -0,0 +1,70 @@
+import pytest
+
+from benchmarks.stub_brasilapi import StubBrasilAPI
+from cnpj_enrichment import CnpjFetcher, get_cnpj_data
+
+# CNPJs terminados em '00' respondem 404 no stub
+CNPJS = [f"{11222333000100 + i * 7919:014d}" for i in range(12)] + ['11222333000100', '44555666000100']
+
+def make_fetcher(url, **options):
+    options = {'max_workers': 4, 'rate': 1000.0, 'backoff_base': 0.001, 'backoff_max': 0.05,
+               'timeout': 5, 'progress': None, **options}
+    return CnpjFetcher(api_url=url, **options)
+
+@pytest.fixture(scope='module')
+def reference():
+    """Resultado de get_cnpj_data (caminho antigo, uma consulta por vez) sem erros injetados."""
+    with StubBrasilAPI() as stub:
+        return {cnpj: get_cnpj_data(cnpj, stub.url) for cnpj in CNPJS}
+
+def test_matches_get_cnpj_data(reference):
+    assert any(data is None for data in reference.values())  # 404 incluídos
+    with StubBrasilAPI() as stub:
+        fetcher = make_fetcher(stub.url)
+        assert fetcher.fetch_many(CNPJS) == reference
+    assert fetcher.failed == set()
+    assert fetcher.stats['not_found'] == sum(data is None for data in reference.values())
+
+def test_other_2xx_is_parsed(reference):
+    with StubBrasilAPI(ok_status=203) as stub:
+        results = make_fetcher(stub.url).fetch_many(CNPJS)
+        assert results == {cnpj: get_cnpj_data(cnpj, stub.url) for cnpj in CNPJS} == reference
+
+def test_429_backoff_recovers(reference, monkeypatch):
+    pauses = []
+    with StubBrasilAPI(error_rate=0.4, retry_after=0.01, seed=3) as stub:
+        fetcher = make_fetcher(stub.url, max_attempts=20, retry_budget_ratio=20)
+        original = CnpjFetcher._backoff
+        monkeypatch.setattr(CnpjFetcher, '_backoff',
+                            lambda self, attempt, retry_after=None: pauses.append(retry_after)
+                            or original(self, attempt, retry_after))
+        results = fetcher.fetch_many(CNPJS)
+    assert results == reference and fetcher.failed == set()
+    assert stub.errors > 0 and fetcher.stats['retries'] == stub.errors == len(pauses)
+    assert set(pauses) == {0.01}  # Retry-After lido de cada resposta 429
+
+def test_backoff_respects_retry_after():
+    fetcher = make_fetcher('http://localhost/', backoff_base=0.001, backoff_max=10)
+    assert all(fetcher._backoff(attempt, retry_after=2.0) >= 2.0 for attempt in range(5))
+    assert fetcher._backoff(0, retry_after=60.0) == 10  # Limitado a backoff_max
+
+def test_retry_budget_exhausted():
+    cnpjs = [cnpj for cnpj in CNPJS if not cnpj.endswith('00')][:6]
+    with StubBrasilAPI(error_rate=1.0, error_status=503) as stub:
+        fetcher = make_fetcher(stub.url, max_workers=2, max_attempts=5, retry_budget_ratio=0.5)
+        results = fetcher.fetch_many(cnpjs)
+        # Orçamento: max(max_attempts, 50% dos CNPJs) = 5 novas tentativas no total
+        assert fetcher.stats['retries'] == 5 and stub.requests == len(cnpjs) + 5
+        assert results == {cnpj: get_cnpj_data(cnpj, stub.url) for cnpj in cnpjs}
+    assert all(data is None for data in results.values())
+    assert fetcher.failed == set(cnpjs) and fetcher.stats['failed'] == len(cnpjs)
+
+@pytest.mark.parametrize('status', [403, 500])
+def test_error_responses_match_get_cnpj_data(status):
+    with StubBrasilAPI(error_rate=1.0, error_status=status) as stub:
+        fetcher = make_fetcher(stub.url, max_attempts=2)
+        results = fetcher.fetch_many(CNPJS[:4])
+        assert results == {cnpj: get_cnpj_data(cnpj, stub.url) for cnpj in CNPJS[:4]}
+    assert fetcher.failed == set(CNPJS[:4])
+    # Erros que não são temporários (403) não são tentados de novo; 500 gasta o orçamento (max(2, 50% de 4))
+    assert fetcher.stats['retries'] == (0 if status == 403 else 2)
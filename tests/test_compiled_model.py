@@ -0,0 +1,66 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from compiled_model import compile_model
+from scoring import preprocess_data
+
+@pytest.fixture(scope='module')
+def models(shipped_model):
+    model, features_list = shipped_model
+    return model, compile_model(model), features_list
+
+@pytest.fixture(scope='module')
+def features(vendas, shipped_model):
+    """Features das oportunidades em aberto da planilha de exemplo (categorias como texto)."""
+    _, features_list = shipped_model
+    X = preprocess_data(vendas, features_list)[features_list].reset_index(drop=True)
+    categorical = [col for col in features_list if col != 'VALOR_SUGERIDO']
+    X[categorical] = X[categorical].astype(object)
+    return X
+
+def categorical_columns(X):
+    return [col for col in X.columns if col != 'VALOR_SUGERIDO']
+
+def sample(X, n_rows, seed=0):
+    """`n_rows` linhas sorteadas da planilha, com valores sugeridos novos."""
+    rng = np.random.default_rng(seed)
+    batch = X.iloc[rng.integers(0, len(X), n_rows)].reset_index(drop=True)
+    batch['VALOR_SUGERIDO'] = rng.uniform(0, 500_000, n_rows).astype(np.float32)
+    return batch
+
+def assert_same_predictions(models, X):
+    model, compiled, _ = models
+    assert np.array_equal(compiled.predict(X), model.predict(X))
+    # Mesmo resultado com as features categóricas tipadas como na leitura (category)
+    typed = X.astype({col: 'category' for col in categorical_columns(X)})
+    assert np.array_equal(compiled.predict(typed), model.predict(typed))
+
+@pytest.mark.parametrize('n_rows', [1, 100, 100_000])
+def test_batch_sizes(models, features, n_rows):
+    assert_same_predictions(models, sample(features, n_rows))
+
+def test_unseen_categories(models, features):
+    X = sample(features, 1_000, seed=1)
+    rng = np.random.default_rng(1)
+    for col in categorical_columns(X):
+        rows = rng.random(len(X)) < 0.3
+        X.loc[rows, col] = f"{col} nova"
+    X.loc[0, categorical_columns(X)] = 'Nunca vista'
+    assert_same_predictions(models, X)
+
+@pytest.mark.parametrize('missing', [None, np.nan], ids=['None', 'NaN'])
+def test_missing_categoricals(models, features, missing):
+    X = sample(features, 1_000, seed=2)
+    rng = np.random.default_rng(2)
+    for col in categorical_columns(X):
+        X.loc[rng.random(len(X)) < 0.3, col] = missing
+    X.loc[0, categorical_columns(X)] = missing
+    assert_same_predictions(models, X)
+
+def test_missing_value_rejected(models, features):
+    _, compiled, _ = models
+    X = sample(features, 10, seed=3)
+    X.loc[4, 'VALOR_SUGERIDO'] = np.nan
+    with pytest.raises(ValueError, match='VALOR_SUGERIDO'):
+        compiled.predict(X)
@@ -0,0 +1,63 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from benchmarks.bench_enrichment_writeback import legacy_write_back
+from cnpj_enrichment import ENRICHMENT_COLUMNS, apply_enrichment, clean_cnpj, enrich_data
+
+RECORDS = {
+    '11222333000181': {'CNAE_FISCAL': 6201501, 'PORTE': 'DEMAIS', 'UF': 'SP', 'MUNICIPIO': 'SAO PAULO'},
+    # Campos vazios não sobrescrevem o que já está na planilha
+    '44555666000199': {'CNAE_FISCAL': 8599604, 'PORTE': '', 'UF': None, 'MUNICIPIO': 'CURITIBA'},
+    '77888999000100': None,  # Não encontrado (404)
+    '22333444000155': {'CNAE_FISCAL': None, 'PORTE': None, 'UF': None, 'MUNICIPIO': None},
+}  # 99888777000166 fica sem registro (falha na consulta)
+
+@pytest.fixture
+def sheet():
+    cnpjs = ['11.222.333/0001-81', '44555666000199', '11222333000181', '77.888.999/0001-00', None,
+             '44.555.666/0001-99', '22333444000155', '99888777000166', '11222333000181']
+    df = pd.DataFrame({'CNPJ': cnpjs, 'VALOR': np.arange(len(cnpjs), dtype=float)})
+    for col in ENRICHMENT_COLUMNS:
+        df[col] = pd.Series(None, index=df.index, dtype=object)
+    df.loc[[1, 5], 'UF'] = 'RS'                  # Já preenchidos na planilha
+    df.loc[[1, 6], 'PORTE'] = 'MICRO EMPRESA'
+    df['CNPJ_CLEAN'] = df['CNPJ'].map(clean_cnpj)
+    return df
+
+def as_values(df):
+    """Valores comparáveis independente do tipo da coluna (category/object) e do tipo de vazio."""
+    values = df.astype(object)
+    return values.where(values.notna(), None)
+
+def expected(sheet):
+    return legacy_write_back(sheet.copy(), RECORDS, list(RECORDS))
+
+def test_matches_row_wise_loop(sheet):
+    result = apply_enrichment(sheet.copy(), RECORDS)
+    pd.testing.assert_frame_equal(as_values(result), as_values(expected(sheet)))
+    # CNPJ repetido: todas as linhas recebem os dados; sem consulta válida, nada muda
+    assert result.loc[[0, 2, 8], 'CNAE_FISCAL'].tolist() == [6201501] * 3
+    assert result.loc[[3, 4, 6, 7], 'CNAE_FISCAL'].isna().all()
+    assert result.loc[[1, 5], 'UF'].tolist() == ['RS', 'RS'] and result.loc[1, 'PORTE'] == 'MICRO EMPRESA'
+
+def test_category_columns(sheet):
+    typed = sheet.copy()
+    for col in ['PORTE', 'UF', 'MUNICIPIO']:
+        typed[col] = typed[col].astype('category')
+    result = apply_enrichment(typed, RECORDS)
+    pd.testing.assert_frame_equal(as_values(result), as_values(expected(sheet)))
+
+def test_no_valid_records(sheet):
+    result = apply_enrichment(sheet.copy(), {'77888999000100': None})
+    pd.testing.assert_frame_equal(result, sheet)
+
+def test_already_enriched_drops_temporary_column(sheet):
+    class NoFetcher:
+        def fetch_many(self, cnpjs):
+            raise AssertionError(f"consulta inesperada: {cnpjs}")
+
+    df = sheet.drop(columns=['CNPJ_CLEAN']).assign(CNAE_FISCAL=6201501)
+    columns = df.columns.tolist()
+    result = enrich_data(df, fetcher=NoFetcher())
+    assert result.columns.tolist() == columns
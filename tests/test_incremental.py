@@ -0,0 +1,81 @@
+import hashlib
+import os
+
+import joblib
+import numpy as np
+import pandas as pd
+import pytest
+
+import model_trainer2 as trainer
+from model_bundle import load_bundle
+from tests.test_trainer import stage_args
+
+CUTOFF = pd.Timestamp('2025-06-30')  # Vendas depois desta data são as "novas"
+
+def file_hash(path):
+    with open(path, 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+@pytest.fixture
+def data(vendas):
+    return trainer.build_features(vendas)
+
+@pytest.fixture
+def trained(tmp_path, monkeypatch, vendas):
+    """Modelo e quantis salvos (no diretório temporário) com as vendas até CUTOFF."""
+    monkeypatch.chdir(tmp_path)
+    old = trainer.build_features(vendas[~(vendas['DATA_DA_VENDA'] > CUTOFF)])
+    template = trainer.build_pipeline(old['features'], 'gbr').set_params(regressor__n_estimators=50)
+    model, mae = trainer.full_refit(template, 'gbr', old)
+    base_estimators = model.get_params()[trainer.stages_param('gbr')]
+    trainer.save_model(model, old, trainer.build_metadata(model, 'gbr', old, 'full', mae, None, base_estimators))
+    trainer.fit_quantiles(template, 'gbr', old)
+    return trainer.load_metadata()
+
+def test_too_few_new_rows_keeps_model(trained, data, monkeypatch):
+    monkeypatch.setattr(trainer, 'MIN_NEW_ROWS', 10_000)
+    bundle, quantiles = file_hash(trainer.BUNDLE_PATH), file_hash(trainer.QUANTILE_MODELS_PATH)
+    assert trainer.incremental_update(data) == trained
+    assert file_hash(trainer.BUNDLE_PATH) == bundle and file_hash(trainer.QUANTILE_MODELS_PATH) == quantiles
+
+def test_warm_start(trained, data, monkeypatch):
+    monkeypatch.setattr(trainer, 'DRIFT_THRESHOLD', np.inf)
+    quantiles = file_hash(trainer.QUANTILE_MODELS_PATH)
+    metadata = trainer.incremental_update(data)
+    assert metadata['mode'] == 'incremental' and metadata['version'] == trained['version'] + 1
+    assert metadata['incremental_updates'] == 1
+    assert metadata['n_estimators'] == trained['base_estimators'] + trainer.INCREMENTAL_ESTIMATORS
+    assert metadata['high_water_mark'] > trained['high_water_mark']
+    assert metadata['baseline_mae'] == trained['baseline_mae']
+    # Os quantis continuam os do último treino completo
+    assert file_hash(trainer.QUANTILE_MODELS_PATH) == quantiles
+
+@pytest.mark.parametrize('settings', [
+    {'DRIFT_THRESHOLD': 0.0},
+    {'DRIFT_THRESHOLD': np.inf, 'FULL_REFIT_EVERY': 1},
+], ids=['deriva', 'a_cada_n'])
+def test_full_refit_rebuilds_quantiles(trained, data, monkeypatch, settings):
+    for name, value in settings.items():
+        monkeypatch.setattr(trainer, name, value)
+    metadata = trainer.incremental_update(data)
+    assert metadata['mode'] == 'full' and metadata['version'] == trained['version'] + 1
+    assert metadata['incremental_updates'] == 0 and metadata['n_estimators'] == trained['base_estimators']
+    model = load_bundle(trainer.BUNDLE_PATH).model
+    template = trainer.refit_template(model, metadata)
+    # Modelo principal e quantis treinados com os mesmos dados (todas as vendas, inclusive as novas)
+    X = data['X'].head(50)
+    np.testing.assert_array_equal(model.predict(X), template.fit(data['X'], data['y']).predict(X))
+    quantile_models = joblib.load(trainer.QUANTILE_MODELS_PATH)
+    expected = trainer.as_quantile(template, 'gbr', 0.9).fit(data['X'], data['y'])
+    np.testing.assert_array_equal(quantile_models[0.9].predict(X), expected.predict(X))
+
+def test_quantiles_stage_after_update(trained, data):
+    stages = trainer.build_stages(stage_args(incremental=True, quantiles=True))
+    assert [stage.name for stage in stages][-2:] == ['update', 'quantiles']
+    assert 'update' in stages[-1].deps
+    # Quantis já salvos: o treino completo da atualização cuida deles
+    assert stages[-1].func({'feature-build': data, 'update': trained}) is None
+    # Quantis ausentes: treinados depois da atualização, com os hiperparâmetros do modelo salvo
+    os.remove(trainer.QUANTILE_MODELS_PATH)
+    models = stages[-1].func({'feature-build': data, 'update': trained})
+    assert set(models) == set(joblib.load(trainer.QUANTILE_MODELS_PATH)) == set(trainer.QUANTILES)
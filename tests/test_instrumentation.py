@@ -0,0 +1,54 @@
+import threading
+
+import pytest
+
+import instrumentation
+
+@pytest.fixture(autouse=True)
+def clean_state():
+    instrumentation.reset()
+    instrumentation.enable(False)
+    yield
+    instrumentation.reset()
+    instrumentation.enable(instrumentation.env_enabled())
+
+def run_in_thread(enabled):
+    """Uma execução em outra thread (como um rerun de outra sessão do Streamlit); retorna os registros."""
+    result = {}
+
+    def target():
+        instrumentation.start_run(enabled=enabled)
+        with instrumentation.timed('etapa'):
+            pass
+        result['records'] = instrumentation.run_records()
+        result['enabled'] = instrumentation.is_enabled()
+    thread = threading.Thread(target=target)
+    thread.start()
+    thread.join()
+    return result
+
+def test_run_flag_does_not_leak_to_other_threads():
+    instrumentation.start_run(enabled=True)
+    other = run_in_thread(None)
+    assert other == {'records': [], 'enabled': False}
+    with instrumentation.timed('etapa'):
+        pass
+    assert [record['stage'] for record in instrumentation.run_records()] == ['etapa']
+    assert instrumentation.totals()['etapa']['calls'] == 1
+
+def test_run_flag_overrides_process_default():
+    instrumentation.enable()
+    assert run_in_thread(False)['records'] == []
+    assert len(run_in_thread(None)['records']) == 1
+
+def test_instrument_follows_run_flag():
+    @instrumentation.instrument('decorada', rows=len)
+    def load():
+        return [1, 2, 3]
+
+    instrumentation.start_run(enabled=False)
+    load()
+    assert instrumentation.run_records() == []
+    instrumentation.start_run(enabled=True)
+    load()
+    assert [(record['stage'], record['rows']) for record in instrumentation.run_records()] == [('decorada', 3)]
@@ -0,0 +1,60 @@
+import numpy as np
+import pytest
+
+from model_bundle import load_bundle, read_manifest, save_bundle
+from schema import CATEGORICAL_FEATURES
+from scoring import load_model, predict_days, preprocess_data
+
+def training_schema(features):
+    return {col: 'category' if col in CATEGORICAL_FEATURES else 'float32' for col in features}
+
+@pytest.fixture(scope='module')
+def abertas(vendas, shipped_model):
+    _, features_list = shipped_model
+    return preprocess_data(vendas.copy(), features_list)
+
+@pytest.fixture
+def bundle_path(tmp_path, shipped_model):
+    model, features_list = shipped_model
+    path = str(tmp_path / 'modelo.bundle')
+    save_bundle(path, model, features_list, schema=training_schema(features_list), metadata={'version': 3})
+    return path
+
+@pytest.mark.parametrize('writable', [False, True], ids=['mmap', 'writable'])
+def test_round_trip_same_predictions(bundle_path, shipped_model, abertas, writable):
+    model, features_list = shipped_model
+    bundle = load_bundle(bundle_path, writable=writable)
+    assert bundle.features == features_list and bundle.metadata == {'version': 3}
+    X = abertas[features_list]
+    np.testing.assert_array_equal(bundle.model.predict(X), model.predict(X))
+    # Arrays mapeados do arquivo são somente leitura; com `writable`, cópias em memória
+    regressor = bundle.model.named_steps['regressor']
+    assert regressor.train_score_.flags.writeable == writable
+
+def test_load_model_from_bundle(bundle_path, shipped_model, abertas):
+    model, features_list = shipped_model
+    loaded, loaded_features = load_model(bundle_path)
+    assert loaded_features == features_list
+    np.testing.assert_array_equal(predict_days(abertas, loaded, loaded_features),
+                                  predict_days(abertas, model, features_list))
+
+@pytest.mark.parametrize('column, dtype', [
+    ('ORIGEM', 'float32'),           # Feature categórica gravada como numérica
+    ('VALOR_SUGERIDO', 'category'),  # Feature numérica gravada como categórica
+])
+def test_load_model_rejects_schema_mismatch(tmp_path, shipped_model, column, dtype):
+    model, features_list = shipped_model
+    path = str(tmp_path / 'modelo.bundle')
+    save_bundle(path, model, features_list, schema={**training_schema(features_list), column: dtype})
+    with pytest.raises(ValueError, match=f"{column}: tipo .*, esperado {dtype}"):
+        load_model(path)
+
+def test_corrupted_bundle_rejected(bundle_path):
+    offset = read_manifest(bundle_path)['buffers'][0]['offset']
+    with open(bundle_path, 'r+b') as f:
+        f.seek(offset)
+        byte = f.read(1)
+        f.seek(offset)
+        f.write(bytes([byte[0] ^ 0xFF]))
+    with pytest.raises(ValueError, match='corrompido'):
+        load_bundle(bundle_path)
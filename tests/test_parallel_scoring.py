@@ -0,0 +1,73 @@
+import os
+from datetime import date
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from data_io import ChunkWriter, concat_parts, part_suffix, row_group_sizes, write_part
+from parallel_scoring import ParallelScorer
+from prediction_store import PredictionStore
+from score_cli import score_file, scoring_columns
+from scoring import predict_days, predict_days_delta, preprocess_data
+from tests.conftest import ROOT
+
+TODAY = date(2025, 10, 1)
+
+@pytest.fixture(scope='module')
+def scorer():
+    with ParallelScorer(os.path.join(ROOT, 'modelo_fechamento.pkl'), os.path.join(ROOT, 'features_list.pkl'),
+                        workers=2, compile_model=False, shard_rows=100) as scorer:
+        yield scorer
+
+@pytest.fixture(scope='module')
+def abertas(vendas, shipped_model):
+    _, features_list = shipped_model
+    # Ordem embaralhada: as previsões precisam voltar na ordem das linhas, não na dos processos
+    return preprocess_data(vendas.copy(), features_list).sample(frac=1, random_state=0)
+
+def test_predict_matches_serial(scorer, abertas, shipped_model):
+    model, features_list = shipped_model
+    X = abertas[features_list]
+    np.testing.assert_array_equal(scorer.predict(X), model.predict(X))
+    assert scorer.stats['shards'] >= 2
+    np.testing.assert_array_equal(predict_days(abertas, scorer, features_list),
+                                  predict_days(abertas, model, features_list))
+
+def test_predict_days_delta_matches_serial(scorer, abertas, shipped_model, tmp_path):
+    model, features_list = shipped_model
+    with PredictionStore(str(tmp_path / 'serial.sqlite'), model_key='teste') as serial_store, \
+            PredictionStore(str(tmp_path / 'paralelo.sqlite'), model_key='teste') as parallel_store:
+        expected, expected_stats = predict_days_delta(abertas, model, features_list, serial_store)
+        days, stats = predict_days_delta(abertas, scorer, features_list, parallel_store)
+    np.testing.assert_array_equal(days, expected)
+    assert stats == expected_stats
+
+@pytest.mark.parametrize('suffix', ['.csv', '.parquet'])
+def test_score_file_matches_serial(scorer, vendas, shipped_model, tmp_path, suffix):
+    model, features_list = shipped_model
+    input_path = str(tmp_path / 'vendas.parquet')
+    with ChunkWriter(input_path) as writer:
+        for start in range(0, len(vendas), 50):
+            writer.write(vendas.iloc[start:start + 50])
+    assert len(row_group_sizes(input_path)) > 2 * scorer.workers
+    columns = scoring_columns(features_list)
+    serial_path, parallel_path = str(tmp_path / f"serial{suffix}"), str(tmp_path / f"paralelo{suffix}")
+    expected = score_file(input_path, serial_path, model, features_list, today=TODAY, columns=columns)
+    stats = scorer.score_file(input_path, parallel_path, today=TODAY, columns=columns)
+    assert stats['chunks'] > scorer.workers
+    assert (stats['rows_read'], stats['rows_scored']) == (expected['rows_read'], expected['rows_scored'])
+    read = pd.read_csv if suffix == '.csv' else pd.read_parquet
+    pd.testing.assert_frame_equal(read(parallel_path), read(serial_path))
+    assert not [name for name in os.listdir(tmp_path) if name.startswith('.partes_')]  # Partes removidas
+
+@pytest.mark.parametrize('suffix', ['.csv', '.parquet'])
+def test_concat_parts_keeps_order(tmp_path, suffix):
+    df = pd.DataFrame({'ID': np.arange(100), 'VALOR': np.linspace(0, 1, 100)})
+    dst = str(tmp_path / f"saida{suffix}")
+    parts = [str(tmp_path / f"parte_{i}{part_suffix(dst)}") for i in range(4)]
+    for i in reversed(range(4)):  # Gravadas fora de ordem, como processos que terminam antes
+        write_part(df.iloc[i * 25:(i + 1) * 25], parts[i])
+    assert concat_parts(iter(parts), dst) == 4
+    read = pd.read_csv if suffix == '.csv' else pd.read_parquet
+    pd.testing.assert_frame_equal(read(dst), df)
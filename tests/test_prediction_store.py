@@ -0,0 +1,92 @@
+import numpy as np
+import pytest
+
+from prediction_store import PredictionStore, opportunity_identity
+from score_cli import score_file
+from scoring import predict_days, predict_days_delta, preprocess_data
+
+@pytest.fixture
+def abertas(vendas, shipped_model):
+    _, features_list = shipped_model
+    return preprocess_data(vendas.copy(), features_list)
+
+@pytest.fixture
+def store(tmp_path):
+    with PredictionStore(str(tmp_path / 'previsoes.sqlite'), model_key='teste') as store:
+        yield store
+
+def count_saves(store, monkeypatch):
+    calls = []
+    original = store._save
+    monkeypatch.setattr(store, '_save', lambda entries: (calls.append(len(entries)), original(entries)))
+    return calls
+
+def test_reuses_after_save(store, abertas, shipped_model):
+    model, features_list = shipped_model
+    reference = predict_days(abertas, model, features_list)
+    days, stats = predict_days_delta(abertas, model, features_list, store)
+    assert stats['new'] == len(abertas) and len(store) == 0  # Só gravado em save
+    store.save()
+    assert len(store) == len(abertas)
+    days_again, stats = predict_days_delta(abertas, model, features_list, store)
+    assert stats == {'reused': len(abertas), 'new': 0, 'changed': 0}
+    assert np.array_equal(days, reference) and np.array_equal(days_again, reference)
+
+def test_save_replaces_changed_keeps_absent(store, abertas, shipped_model):
+    model, features_list = shipped_model
+    predict_days_delta(abertas, model, features_list, store)
+    store.save()
+    # Semana seguinte: 50 oportunidades saíram da exportação e 10 mudaram de valor
+    week2 = abertas.iloc[50:].copy()
+    week2.loc[week2.index[:10], 'VALOR_SUGERIDO'] += 1000
+    _, stats = predict_days_delta(week2, model, features_list, store)
+    assert stats['changed'] == 10 and stats['new'] == 0
+    store.save()
+    entries = store.entries()
+    # Uma previsão por oportunidade; as ausentes do upload continuam guardadas
+    assert len(entries) == len(abertas)
+    assert set(entries['identity']) == set(opportunity_identity(abertas))
+
+def test_alternating_uploads_keep_each_other(store, abertas, shipped_model):
+    model, features_list = shipped_model
+    # Dois usuários com arquivos diferentes, enviados alternadamente
+    uploads = [abertas.iloc[:200], abertas.iloc[200:]]
+    for upload in uploads:
+        predict_days_delta(upload, model, features_list, store)
+        store.save()
+    for upload in uploads * 2:
+        _, stats = predict_days_delta(upload, model, features_list, store)
+        store.save()
+        assert stats == {'reused': len(upload), 'new': 0, 'changed': 0}
+
+def test_save_drops_expired(tmp_path, abertas, shipped_model):
+    model, features_list = shipped_model
+    now = [0.0]
+    with PredictionStore(str(tmp_path / 'previsoes.sqlite'), model_key='teste', clock=lambda: now[0],
+                         max_age_days=30) as store:
+        predict_days_delta(abertas.iloc[:100], model, features_list, store)
+        store.save()
+        now[0] += 31 * 86400
+        predict_days_delta(abertas.iloc[100:150], model, features_list, store)
+        store.save()
+        assert set(store.entries()['identity']) == set(opportunity_identity(abertas.iloc[100:150]))
+
+def test_save_without_lookups_keeps_entries(store, abertas, shipped_model):
+    model, features_list = shipped_model
+    predict_days_delta(abertas, model, features_list, store)
+    store.save()
+    assert store.save() == len(abertas)
+    _, stats = predict_days_delta(abertas.iloc[:0], model, features_list, store)
+    store.save()
+    assert len(store) == len(abertas)
+
+def test_score_file_saves_once(store, vendas, shipped_model, tmp_path, monkeypatch):
+    model, features_list = shipped_model
+    source = tmp_path / 'vendas.csv'
+    vendas.to_csv(source, index=False)
+    saves = count_saves(store, monkeypatch)
+    stats = score_file(str(source), str(tmp_path / 'saida.csv'), model, features_list, chunksize=100, store=store)
+    assert stats['chunks'] > 1 and stats['new'] == stats['rows_scored']
+    assert saves == [stats['rows_scored']]
+    stats = score_file(str(source), str(tmp_path / 'saida.csv'), model, features_list, chunksize=100, store=store)
+    assert stats['reused'] == stats['rows_scored'] and len(saves) == 1
@@ -0,0 +1,77 @@
+from datetime import date
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from projection import (MONTHS, closing_dates, forecast, month_offsets, monthly_totals, revenue_bands,
+                        simulate_revenue)
+
+TODAY = date(2025, 10, 17)
+
+@pytest.fixture
+def deals():
+    rng = np.random.default_rng(0)
+    n = 2_000
+    p50 = rng.integers(1, 300, n).astype(float)
+    days = np.stack([p50 * 0.6, p50, p50 * 1.8])
+    values = rng.uniform(1_000, 50_000, n)
+    feeling = rng.choice([np.nan, 20.0, 50.0, 90.0], n)
+    return days, values, feeling
+
+def test_bands_ordered_and_seeded(deals):
+    days, values, feeling = deals
+    totals = simulate_revenue(days, values, feeling, today=TODAY, n_draws=300, seed=42, batch_elements=50_000)
+    assert totals.shape == (300, MONTHS)
+    np.testing.assert_array_equal(
+        totals, simulate_revenue(days, values, feeling, today=TODAY, n_draws=300, seed=42, batch_elements=50_000))
+    bands = revenue_bands(totals, today=TODAY)
+    assert bands['MES_ANO_PROVAVEL'].iloc[0] == '2025-10' and len(bands) == MONTHS
+    assert (bands['P10'] <= bands['P50']).all() and (bands['P50'] <= bands['P90']).all()
+    assert (bands['P10'] < bands['P90']).any()  # Há incerteza de verdade
+    # Sem feeling, cada cenário soma no máximo o valor total; com feeling, a receita esperada cai
+    certain = simulate_revenue(days, values, today=TODAY, n_draws=50, seed=1)
+    assert certain.sum(axis=1).max() <= values.sum() + 1e-6
+    assert totals.sum(axis=1).mean() < certain.sum(axis=1).mean()
+
+@pytest.mark.parametrize('feeling', [None, 100.0], ids=['sem_feeling', 'feeling_100'])
+def test_zero_spread_matches_monthly_totals(deals, feeling):
+    _, values, _ = deals
+    rng = np.random.default_rng(1)
+    p50 = rng.integers(1, 500, len(values))  # Inclui oportunidades além do horizonte
+    expected = monthly_totals(month_offsets(closing_dates(p50, TODAY), TODAY), values)
+    totals = simulate_revenue(np.stack([p50, p50, p50]), values,
+                              None if feeling is None else np.full(len(values), feeling),
+                              today=TODAY, n_draws=20, seed=3, batch_elements=10_000)
+    np.testing.assert_allclose(totals, np.broadcast_to(expected, totals.shape))
+    bands = revenue_bands(totals, today=TODAY)
+    for column in ['MEDIA', 'P10', 'P50', 'P90']:
+        np.testing.assert_allclose(bands[column], expected)
+
+def test_zero_feeling_never_closes(deals):
+    days, values, _ = deals
+    totals = simulate_revenue(days, values, np.zeros(len(values)), today=TODAY, n_draws=20, seed=0)
+    assert not totals.any()
+
+@pytest.mark.parametrize('today', [date(2025, 10, 17), date(2025, 1, 31), date(2024, 2, 29)],
+                         ids=['meio_do_mes', 'fim_do_mes', 'bissexto'])
+def test_forecast_matches_pandas_groupby(today):
+    rng = np.random.default_rng(4)
+    days = rng.integers(1, 500, 3_000)
+    values = rng.uniform(1_000, 50_000, len(days))
+    values[::50] = np.nan
+    dates = pd.Timestamp(today) + pd.to_timedelta(days, unit='D')
+    # Sem oportunidades no 3º e no 7º mês do horizonte
+    periods = dates.to_period('M')
+    start = pd.Period(today, 'M')
+    empty = {start + 2, start + 6}
+    keep = ~periods.isin(list(empty))
+    days, values, dates, periods = days[keep], values[keep], dates[keep], periods[keep]
+
+    closing, projection = forecast(days, values, today=today)
+    np.testing.assert_array_equal(closing, dates.to_numpy())
+    months = pd.period_range(start, periods=MONTHS, freq='M')
+    expected = pd.Series(values).groupby(periods).sum().reindex(months, fill_value=0.0)
+    assert projection['MES_ANO_PROVAVEL'].tolist() == months.strftime('%Y-%m').tolist()
+    np.testing.assert_allclose(projection['VALOR_SUGERIDO'], expected.to_numpy())
+    assert (projection.loc[[2, 6], 'VALOR_SUGERIDO'] == 0).all()
@@ -0,0 +1,63 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from results_grid import ResultsGrid, page_count
+
+@pytest.fixture
+def results():
+    rng = np.random.default_rng(0)
+    n = 300
+    dates = pd.Timestamp('2025-10-01') + pd.to_timedelta(rng.integers(1, 400, n), unit='D')
+    df = pd.DataFrame({
+        'NOME_DA_OPORTUNIDADE': [f"Oportunidade {i}" for i in range(n)],
+        'ETAPA_ATUAL': rng.choice(['Proposta', 'Negociação', 'Qualificação'], n),
+        'ESN': rng.choice(['Ana', 'Bruno', 'Carla', 'Diego'], n),
+        'VALOR_SUGERIDO': rng.uniform(1_000, 100_000, n),
+        'DIAS_PREVISTOS': rng.integers(1, 400, n),
+        'DATA_PROVAVEL_FECHAMENTO': dates,
+    })
+    df.loc[[3, 50, 299], 'DATA_PROVAVEL_FECHAMENTO'] = pd.NaT
+    return df
+
+def test_default_sort_is_chronological(results):
+    grid = ResultsGrid(results)
+    page, total = grid.page(size=len(results))
+    dates = page['DATA_PROVAVEL_FECHAMENTO']
+    assert total == len(results)
+    assert dates.dropna().is_monotonic_increasing
+    # Ordenar o texto exibido (DD/MM/AAAA) daria outra ordem
+    shown = dates.dropna().dt.strftime('%d/%m/%Y')
+    assert shown.tolist() != sorted(shown)
+
+@pytest.mark.parametrize('ascending', [True, False])
+def test_missing_dates_last(results, ascending):
+    grid = ResultsGrid(results)
+    page, _ = grid.page(size=len(results), ascending=ascending)
+    dates = page['DATA_PROVAVEL_FECHAMENTO']
+    assert dates.iloc[-3:].isna().all() and dates.iloc[:-3].notna().all()
+    valid = dates.iloc[:-3]
+    assert valid.is_monotonic_increasing if ascending else valid.is_monotonic_decreasing
+
+def test_filter_order_does_not_matter(results):
+    grid = ResultsGrid(results)
+    filters = {'ETAPA_ATUAL': ['Proposta', 'Negociação'], 'ESN': ['Carla', 'Ana']}
+    reordered = {'ESN': ['Ana', 'Carla'], 'ETAPA_ATUAL': ['Negociação', 'Proposta']}
+    first, total = grid.page(2, size=25, filters=filters)
+    cached = grid._last
+    second, total_again = grid.page(2, size=25, filters=reordered)
+    assert grid._last is cached  # Mesma chave: o resultado guardado é reaproveitado
+    pd.testing.assert_frame_equal(first, second)
+    selected = results['ETAPA_ATUAL'].isin(filters['ETAPA_ATUAL']) & results['ESN'].isin(filters['ESN'])
+    assert total == total_again == selected.sum()
+    expected = results[selected].sort_values('DATA_PROVAVEL_FECHAMENTO', kind='stable', na_position='last')
+    assert first['NOME_DA_OPORTUNIDADE'].tolist() == expected['NOME_DA_OPORTUNIDADE'].iloc[25:50].tolist()
+
+def test_categorical_sort_alphabetical(results):
+    grid = ResultsGrid(results)
+    page, _ = grid.page(size=len(results), sort_by='ESN')
+    assert page['ESN'].astype(str).is_monotonic_increasing
+    assert grid.options('ETAPA_ATUAL') == ['Negociação', 'Proposta', 'Qualificação']
+
+def test_page_count():
+    assert page_count(0) == 1 and page_count(50, 50) == 1 and page_count(51, 50) == 2
@@ -0,0 +1,47 @@
+import pytest
+
+from analytics_cube import build_cube
+from langchain_agent import parse_question, route_question
+
+@pytest.fixture(scope='module')
+def cube(vendas):
+    return build_cube(vendas)
+
+@pytest.mark.parametrize('prompt', [
+    "Quantos ESN existem?",
+    "quantos vendedores temos?",
+    "quantas etapas existem?",
+    "Há quantas origens?",
+    "Quantos ESN?",
+    "quantos GSN tem na planilha?",
+    "Quais clientes têm mais oportunidades?",
+])
+def test_other_intents_go_to_the_agent(cube, prompt):
+    assert parse_question(prompt, cube) is None
+    assert route_question(prompt, cube) is None
+
+def test_count_with_filter(cube, vendas):
+    answer = route_question("Quantas oportunidades estão em negociação?", cube)
+    expected = int((vendas['ETAPA_ATUAL'] == 'Negociação').sum())
+    assert f"**{expected:,}**" in answer
+    assert "Calculado direto da planilha" in answer
+
+def test_count_by_dimension(cube, vendas):
+    intent = parse_question("Quantas oportunidades por ESN?", cube)
+    assert intent['measures'] == ['OPORTUNIDADES'] and intent['by'] == ['ESN']
+    answer = route_question("Quantas oportunidades por ESN?", cube)
+    for esn, count in vendas['ESN'].value_counts().items():
+        assert f"| {esn} | {count:,} |" in answer
+
+def test_total_value_by_stage(cube, vendas):
+    answer = route_question("Qual o valor total sugerido por etapa?", cube)
+    totals = vendas['VALOR_SUGERIDO'].astype('float64').groupby(vendas['ETAPA_ATUAL'], observed=True).sum()
+    stage = totals.idxmax()
+    assert f"| {stage} | R$ {totals[stage]:,.2f} |" in answer
+
+def test_ranking_accepts_verb(cube, vendas):
+    intent = parse_question("Qual GSN tem o maior valor em aberto?", cube)
+    assert intent == {'measures': ['VALOR_TOTAL'], 'by': ['GSN'], 'filters': {}, 'scope': 'abertas', 'rank': 'max'}
+    abertas = vendas[vendas['DATA_DA_VENDA'].isna()]
+    best = abertas.groupby('GSN', observed=True)['VALOR_SUGERIDO'].sum().idxmax()
+    assert f"**{best}**" in route_question("Qual GSN tem o maior valor em aberto?", cube)
@@ -0,0 +1,49 @@
+import pandas as pd
+import pytest
+
+from schema import _normalized_header, normalize_column_name, normalize_column_names, normalize_columns
+from scoring import preprocess_data
+
+@pytest.mark.parametrize('name, expected', [
+    ('DATA DA VENDA', 'DATA_DA_VENDA'),
+    ('Data da Venda', 'DATA_DA_VENDA'),
+    ('  data da venda ', 'DATA_DA_VENDA'),
+    ('ÉTAPA ATUAL', 'ETAPA_ATUAL'),
+    ('Etapa Atual', 'ETAPA_ATUAL'),
+    ('PRODUTO SUGERIDO', 'PRODUTO_SUGERIDO'),
+    ('Tipo de Atuação', 'TIPO_DE_ATUACAO'),
+    ('TIPO DE ATUAÇÃO', 'TIPO_DE_ATUACAO'),
+    ('Previsão de Fechamento', 'PREVISAO_DE_FECHAMENTO'),
+    ('Situação Cadastral', 'SITUACAO_CADASTRAL'),
+    ('Município', 'MUNICIPIO'),
+    ('NOME DA OPORTUNIDADE', 'NOME_DA_OPORTUNIDADE'),
+    ('ÓRGÃO', 'ORGAO'),           # Acentos fora da lista antiga ('Ó', 'Ã')
+    ('ﬁm', 'FIM'),                # Ligadura (compatibilidade NFKD)
+    ('VALOR_SUGERIDO', 'VALOR_SUGERIDO'),
+    (2024, '2024'),               # Cabeçalho numérico do Excel
+])
+def test_normalize_column_name(name, expected):
+    assert normalize_column_name(name) == expected
+
+def test_header_memoized_by_tuple():
+    header = ['Data da Venda', 'Étapa Atual', 'Valor Sugerido', 'Coluna de teste da memória']
+    _normalized_header.cache_clear()
+    first = normalize_column_names(header)
+    second = normalize_column_names(pd.Index(header))  # Mesmo cabeçalho, outro tipo de sequência
+    info = _normalized_header.cache_info()
+    assert (info.misses, info.hits) == (1, 1)
+    assert first == second == ['DATA_DA_VENDA', 'ETAPA_ATUAL', 'VALOR_SUGERIDO', 'COLUNA_DE_TESTE_DA_MEMORIA']
+    first.append('alterada')  # Cada chamada devolve uma lista nova
+    assert normalize_column_names(header) == second
+
+def test_preprocess_matches_variant_headers(vendas, shipped_model):
+    _, features_list = shipped_model
+    reference = preprocess_data(vendas.copy(), features_list)
+    # A mesma planilha com os cabeçalhos em minúsculas e com acentos
+    variant = vendas.copy()
+    variant.columns = [col.replace('_', ' ').title().replace('Etapa', 'Étapa').replace('Atuacao', 'Atuação')
+                       for col in vendas.columns]
+    assert normalize_columns(variant.copy()).columns.tolist() == vendas.columns.tolist()
+    result = preprocess_data(variant, features_list)
+    pd.testing.assert_frame_equal(result[features_list], reference[features_list])
+    assert result[features_list].notna().any().all()
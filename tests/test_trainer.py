@@ -0,0 +1,34 @@
+import argparse
+
+import pytest
+
+import model_trainer2
+from pipeline_stages import StagedPipeline
+
+def test_fatal_error_exits_with_status_1(tmp_path, capsys):
+    with pytest.raises(SystemExit) as exit_info:
+        model_trainer2.main(['--input', str(tmp_path / 'nao_existe.xlsx'),
+                             '--checkpoint-dir', str(tmp_path / 'checkpoints')])
+    assert exit_info.value.code == 1
+    assert "Erro fatal" in capsys.readouterr().out
+
+def test_ingest_reads_only_training_columns(tmp_path, vendas):
+    path = tmp_path / 'vendas.parquet'
+    vendas.assign(COLUNA_EXTRA=1).to_parquet(path)
+    df = model_trainer2.ingest(str(path))
+    assert set(df.columns) <= set(model_trainer2.INGEST_COLUMNS)
+    assert {'CNPJ', 'DATA_DA_VENDA', 'DATA_CICLO_DE_BUSCA', 'VALOR_SUGERIDO'} <= set(df.columns)
+    assert len(df) == len(vendas)
+
+def stage_args(**options):
+    return argparse.Namespace(**{'input': 'vendas.xlsx', 'model': 'gbr', 'tune': False, 'candidates': 8, 'cv_splits': 3,
+                                 'n_jobs': 1, 'quantiles': False, 'incremental': False, **options})
+
+def test_ingest_projection_in_fingerprint(monkeypatch, tmp_path):
+    def fingerprints():
+        return StagedPipeline(model_trainer2.build_stages(stage_args()), checkpoint_dir=str(tmp_path)).fingerprints()
+    before = fingerprints()
+    monkeypatch.setattr(model_trainer2, 'INGEST_COLUMNS', model_trainer2.INGEST_COLUMNS + ['ORIGEM_EXTRA'])
+    after = fingerprints()
+    # Outra projeção invalida a leitura e todas as etapas seguintes
+    assert all(before[name] != after[name] for name in before)